@@ -1,13 +1,117 @@
-from fastapi import APIRouter, Depends
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db, db_commit
 from app.core.analytics_aggregator import aggregate_analytics
+from app.core.usage_log_partitions import partition_manager
+from app.core.usage_archive import archive_usage_logs, query_archive
+from app.core.tracing import timing_summary, reset_timings
+from app.core.concurrency_limiter import limiter_stats
+from app.core.api_key_cache import backfill_api_key_hashes
+from app.auth.services import get_current_user
+from app.core.principal_cache import Principal
 
 router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
 
 
 @router.post("/aggregate")
 async def aggregate(db: AsyncSession = Depends(get_db)):
-    await aggregate_analytics(db)
-    return {"message": "Analytics aggregated successfully"}
+    result = await aggregate_analytics(db)
+    return {"data": result, "message": "Analytics aggregated successfully"}
+
+
+@router.post("/partitions/maintain")
+async def maintain_usage_log_partitions(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    result = await partition_manager.maintain(db)
+    return {"data": result, "message": "Usage log partitions maintained successfully"}
+
+
+@router.post("/partitions/convert")
+async def convert_usage_logs_to_partitioned(
+    drop_foreign_keys: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    # One-off migration; rewrites usage_logs, so it never runs on its own
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    try:
+        result = await partition_manager.partition_table(db, drop_foreign_keys=drop_foreign_keys)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"data": result, "message": "Usage logs partitioned successfully"}
+
+
+@router.post("/api-keys/backfill-hashes")
+async def backfill_key_hashes(
+    drop_raw_keys: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    # One-off migration; run once without drop_raw_keys, check that legacy
+    # keys still authenticate, then confirm with drop_raw_keys=true
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    result = await backfill_api_key_hashes(db, drop_raw_keys=drop_raw_keys)
+    return {"data": result, "message": "API key hashes backfilled successfully"}
+
+
+@router.post("/archive")
+async def archive_usage(
+    start: date,
+    end: date,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    segments = await archive_usage_logs(db, start, end)
+    return {"data": segments, "message": "Usage logs archived successfully"}
+
+
+@router.get("/archive/summary")
+async def read_archive_summary(
+    start: datetime,
+    end: datetime,
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    return {"data": await query_archive(start, end), "message": "Archive summary fetched successfully"}
+
+
+@router.get("/gateway/timings")
+async def read_gateway_timings(
+    reset: bool = False,
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    # Per-worker: each uvicorn process keeps its own histograms
+    data = timing_summary()
+    if reset:
+        reset_timings()
+    return {"data": data, "message": "Gateway timings fetched successfully"}
+
+
+@router.get("/gateway/concurrency")
+async def read_gateway_concurrency(
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    # Per-worker limits; cluster_in_flight_others is the rest of the cluster
+    return {"data": limiter_stats(), "message": "Gateway concurrency limits fetched successfully"}
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.analytics import services, schemas
-from app.auth.services import get_current_user
-from app.auth.models import User
+from app.auth.services import get_current_user, get_streaming_user
+from app.core.principal_cache import Principal
+from app.core.live_analytics import live_analytics
+from app.api.models import APIKey
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -15,7 +21,7 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"])
 )
 async def read_my_analytics(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.get_user_analytics(db, current_user)
 
@@ -26,7 +32,7 @@ async def read_my_analytics(
 )
 async def read_all_analytics(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id == 2:
         raise HTTPException(
@@ -42,8 +48,10 @@ async def read_all_analytics(
     response_model=schemas.UserAnalyticsResponse
 )
 async def read_user_usage_analytics(
+    start: datetime | None = None,
+    end: datetime | None = None,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Ensure only Admins can see user-specific data
     if current_user.role_id != 1:  # Assuming 1 is Admin
@@ -52,4 +60,116 @@ async def read_user_usage_analytics(
             detail="Admin access required"
         )
 
-    return await services.get_user_usage_stats(db)
\ No newline at end of file
+    return await services.get_user_usage_stats(db, start, end)
+
+
+@router.get(
+    "/anomalies",
+    response_model=schemas.AnomalyAlertListResponse
+)
+async def read_anomaly_alerts(
+    since: datetime | None = None,
+    api_id: int | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return await services.get_anomaly_alerts(db, since, api_id, limit)
+
+
+@router.get("/top")
+async def read_top_consumers(
+    api_id: int,
+    minutes: int = Query(5, ge=1, le=60),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Heaviest API keys, users and endpoints of one API over the last
+    `minutes`. Counts are lower bounds; true counts are at most
+    `upper_bound` (count + the dimension's `error`).
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return await services.get_top_consumers(db, api_id, minutes, limit)
+
+
+@router.get("/export")
+async def export_analytics(
+    resource: Literal["usage_logs", "analytics"] = "usage_logs",
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    after_id: int = 0,
+    gzip: bool = False,
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    start, end = services.usage_window(start, end)
+    extension = "csv" if format == "csv" else "ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{resource}.{extension}"'
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        services.export_rows(resource, start, end, format, after_id, gzip),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers=headers
+    )
+
+
+@router.get("/health")
+async def read_api_health(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return await services.get_api_health(db)
+
+
+@router.get("/live")
+async def stream_live_analytics(
+    current_user: Principal = Depends(get_streaming_user)
+):
+    """
+    Server-Sent Events: a `snapshot` of the current minute's counters per
+    API key (and per API for admins), then `delta` events with only the
+    fields that changed. Non-admins see their own keys only.
+    """
+    key_ids = None
+    if current_user.role_id != 1:
+        # Short-lived session: the stream must not hold a pool connection
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(APIKey.id).where(APIKey.user_id == current_user.id)
+            )
+            key_ids = [row[0] for row in result.all()]
+
+    return StreamingResponse(
+        live_analytics.stream(key_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -13,6 +13,8 @@ class AnalyticsBase(BaseModel):
     success_count: int
     error_count: int
     rate_limit_exceeded_count: int
+    cache_hit_count: Optional[int] = 0
+    cache_miss_count: Optional[int] = 0
 
     avg_response_time_ms: int
     max_response_time_ms: int
@@ -32,6 +34,25 @@ class AnalyticsListResponse(BaseModel):
     message: str
 
 
+class AnomalyAlertOut(BaseModel):
+    id: int
+    api_id: int
+    api_key_id: Optional[int]
+    window_start: datetime
+    metric: str
+    value: float
+    baseline: float
+    score: float
+
+    class Config:
+        from_attributes = True
+
+
+class AnomalyAlertListResponse(BaseModel):
+    data: List[AnomalyAlertOut]
+    message: str
+
+
 class ApiUserSummary(BaseModel):
     api_name: str
     unique_users: int
@@ -4,10 +4,20 @@ from fastapi import HTTPException, status
 
 from app.api.models import AnalyticsSummary, APIKey, UsageLog
 from app.auth.models import User
-from app.api.models import API, UsageLog
+from app.api.models import API, UsageLog, ProbeSummary, AnomalyAlert
 from app.analytics import schemas
 from sqlalchemy.orm import selectinload
 from sqlalchemy import func
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+import zlib
+import time
+from app.core.usage_log_partitions import usage_window
+from app.core import health_prober, heavy_hitters
+from app.database import SessionLocal
+from app.config import settings
 
 
 # -------------------------
@@ -68,13 +78,22 @@ async def get_admin_analytics(db: AsyncSession):
     }
 
 
-async def get_user_usage_stats(db: AsyncSession):
+async def get_user_usage_stats(
+    db: AsyncSession,
+    start: datetime | None = None,
+    end: datetime | None = None
+):
     """
     Returns analytics focused on User activity:
     1. API Summary: How many unique users hit each API.
     2. User Activity: Detailed breakdown of (User -> API) call counts.
+
+    Both queries are bounded by [start, end) on usage_logs.timestamp so only
+    the matching partitions are scanned.
     """
-    
+    start, end = usage_window(start, end)
+    in_window = (UsageLog.timestamp >= start) & (UsageLog.timestamp < end)
+
     # 1. API Summary: Group by API Name
     # Counts total calls and unique users per API
     api_summary_stmt = (
@@ -83,7 +102,7 @@ async def get_user_usage_stats(db: AsyncSession):
             func.count(func.distinct(UsageLog.user_id)).label("unique_users"),
             func.count(UsageLog.id).label("total_calls")
         )
-        .join(UsageLog, API.id == UsageLog.api_id)
+        .join(UsageLog, (API.id == UsageLog.api_id) & in_window)
         .group_by(API.name)
     )
     
@@ -99,7 +118,7 @@ async def get_user_usage_stats(db: AsyncSession):
             func.count(UsageLog.id).label("total_calls"),
             func.max(UsageLog.timestamp).label("last_called")
         )
-        .join(UsageLog, User.id == UsageLog.user_id)
+        .join(UsageLog, (User.id == UsageLog.user_id) & in_window)
         .join(API, UsageLog.api_id == API.id)
         .group_by(User.username, API.name)
         .order_by(func.count(UsageLog.id).desc()) # Show heaviest users first
@@ -127,4 +146,259 @@ async def get_user_usage_stats(db: AsyncSession):
             }
             for row in user_activity_rows
         ]
-    }
\ No newline at end of file
+    }
+
+
+# -------------------------
+# Anomaly alerts
+# -------------------------
+async def get_anomaly_alerts(
+    db: AsyncSession,
+    since: datetime | None = None,
+    api_id: int | None = None,
+    limit: int = 100
+):
+    stmt = select(AnomalyAlert)
+    if since is not None:
+        stmt = stmt.where(AnomalyAlert.window_start >= since)
+    if api_id is not None:
+        stmt = stmt.where(AnomalyAlert.api_id == api_id)
+
+    result = await db.execute(
+        stmt.order_by(AnomalyAlert.window_start.desc(), AnomalyAlert.id.desc()).limit(limit)
+    )
+
+    return {
+        "data": [
+            schemas.AnomalyAlertOut.model_validate(row).model_dump()
+            for row in result.scalars().all()
+        ],
+        "message": "Anomaly alerts fetched successfully"
+    }
+
+
+# -------------------------
+# Heavy hitters
+# -------------------------
+async def get_top_consumers(db: AsyncSession, api_id: int, minutes: int, limit: int):
+    data = await heavy_hitters.top(api_id, minutes, limit)
+
+    # Label the (at most `limit`) listed keys and users
+    key_ids = [int(item["id"]) for item in data["keys"]["items"]]
+    user_ids = [int(item["id"]) for item in data["users"]["items"]]
+    prefixes = {}
+    usernames = {}
+    if key_ids:
+        result = await db.execute(select(APIKey.id, APIKey.key_prefix).where(APIKey.id.in_(key_ids)))
+        prefixes = {str(row.id): row.key_prefix for row in result.all()}
+    if user_ids:
+        result = await db.execute(select(User.id, User.username).where(User.id.in_(user_ids)))
+        usernames = {str(row.id): row.username for row in result.all()}
+
+    for item in data["keys"]["items"]:
+        item["key_prefix"] = prefixes.get(item["id"])
+    for item in data["users"]["items"]:
+        item["username"] = usernames.get(item["id"])
+
+    data["window_start"] = datetime.utcfromtimestamp(data["window_start"])
+    data["window_end"] = datetime.utcfromtimestamp(data["window_end"])
+
+    return {
+        "data": data,
+        "message": "Top consumers fetched successfully"
+    }
+
+
+# -------------------------
+# Streaming export
+# -------------------------
+EXPORT_RESOURCES = {
+    "usage_logs": (
+        UsageLog,
+        UsageLog.timestamp,
+        ("id", "api_id", "api_key_id", "user_id", "endpoint", "method",
+         "status_code", "response_time_ms", "timestamp"),
+    ),
+    "analytics": (
+        AnalyticsSummary,
+        AnalyticsSummary.window_start,
+        ("id", "api_id", "api_key_id", "window_start", "window_end",
+         "request_count", "success_count", "error_count", "rate_limit_exceeded_count",
+         "avg_response_time_ms", "max_response_time_ms", "cache_hit_count", "cache_miss_count"),
+    ),
+}
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def export_rows(
+    resource: str,
+    start: datetime,
+    end: datetime,
+    fmt: str = "ndjson",
+    after_id: int = 0,
+    compress: bool = False
+):
+    """
+    Stream rows for [start, end) as NDJSON or CSV, ordered by id.
+
+    Rows come off a server-side cursor in fixed-size chunks and are encoded
+    (and optionally gzipped) chunk by chunk, so memory stays flat however
+    large the range is. Every row carries its id: a client that drops the
+    connection resumes with after_id=<last id received>.
+    """
+    model, time_column, columns = EXPORT_RESOURCES[resource]
+
+    stmt = (
+        select(*(getattr(model, column) for column in columns))
+        .where(time_column >= start, time_column < end, model.id > after_id)
+        .order_by(model.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 → gzip container
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield emit(buffer.getvalue())
+
+    # The request-scoped session is closed before a StreamingResponse body
+    # runs, so the export owns its own session for the cursor's lifetime.
+    async with SessionLocal() as db:
+        result = await db.stream(stmt)
+        async for chunk in result.partitions():
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(
+                    [_encode_value(value) for value in row] for row in chunk
+                )
+                text = buffer.getvalue()
+            else:
+                text = "".join(
+                    json.dumps(
+                        {column: _encode_value(value) for column, value in zip(columns, row)}
+                    ) + "\n"
+                    for row in chunk
+                )
+
+            data = emit(text)
+            if data:
+                yield data
+
+    if compressor:
+        yield compressor.flush()
+
+
+# -------------------------
+# Active health / SLOs
+# -------------------------
+# (name, seconds, from ring buffer) — short windows need per-probe
+# resolution, long ones come from the rolled-up probe_summaries
+BURN_WINDOWS = (
+    ("5m", 300, True),
+    ("1h", 3600, True),
+    ("6h", 6 * 3600, False),
+    ("24h", 24 * 3600, False),
+)
+
+# Multi-window burn-rate alerts: (severity, long window, short window, burn)
+BURN_ALERTS = (
+    ("page", "1h", "5m", 14.4),
+    ("ticket", "6h", "1h", 6.0),
+)
+
+
+def _burn_rate(good: int, total: int, slo_target: float):
+    if not total:
+        return None
+    error_budget = 1 - slo_target
+    if error_budget <= 0:
+        return None
+    return round((1 - good / total) / error_budget, 2)
+
+
+def _percentile(values, fraction: float):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 2)
+
+
+async def get_api_health(db: AsyncSession):
+    result = await db.execute(select(API).where(API.enabled == True))
+    apis = result.scalars().all()
+    samples_by_api = await health_prober.read_samples([api.id for api in apis])
+
+    since = datetime.utcnow() - timedelta(seconds=max(seconds for _, seconds, _ in BURN_WINDOWS))
+    summaries = {}
+    result = await db.execute(
+        select(ProbeSummary).where(ProbeSummary.window_start >= since)
+    )
+    for row in result.scalars():
+        summaries.setdefault(row.api_id, []).append(row)
+
+    now = datetime.utcnow()
+    # Ring samples carry time.time() stamps; utcnow().timestamp() would read
+    # the naive UTC time as local time and shift every cutoff by the offset
+    now_ts = time.time()
+    data = []
+    for api in apis:
+        slo_latency_ms = api.slo_latency_ms or settings.SLO_DEFAULT_LATENCY_MS
+        slo_target = api.slo_target or settings.SLO_DEFAULT_TARGET
+        samples = samples_by_api[api.id]
+        recent = [s for s in samples if s.timestamp >= now_ts - 3600]
+        latencies = sorted(s.latency_ms for s in recent)
+
+        burn_rates = {}
+        for name, seconds, from_ring in BURN_WINDOWS:
+            if from_ring:
+                cutoff = now_ts - seconds
+                window = [s for s in samples if s.timestamp >= cutoff]
+                good = sum(1 for s in window if health_prober.is_good(s, slo_latency_ms))
+                total = len(window)
+            else:
+                cutoff = now - timedelta(seconds=seconds)
+                rows = [r for r in summaries.get(api.id, ()) if r.window_start >= cutoff]
+                good = sum(r.slo_good_count for r in rows)
+                total = sum(r.probe_count for r in rows)
+            burn_rates[name] = _burn_rate(good, total, slo_target)
+
+        alerts = [
+            severity
+            for severity, long_window, short_window, threshold in BURN_ALERTS
+            if (burn_rates[long_window] or 0) > threshold and (burn_rates[short_window] or 0) > threshold
+        ]
+
+        last = samples[-1] if samples else None
+        data.append({
+            "api_id": api.id,
+            "api_name": api.name,
+            "slo_latency_ms": slo_latency_ms,
+            "slo_target": slo_target,
+            "last_probe_at": datetime.utcfromtimestamp(last.timestamp) if last else None,
+            "last_status": last.status if last else None,
+            "last_latency_ms": round(last.latency_ms, 2) if last else None,
+            "availability_1h": (
+                round(sum(1 for s in recent if health_prober.is_success(s)) / len(recent), 4)
+                if recent else None
+            ),
+            "p50_latency_ms_1h": _percentile(latencies, 0.5),
+            "p95_latency_ms_1h": _percentile(latencies, 0.95),
+            "burn_rates": burn_rates,
+            "alerts": alerts,
+        })
+
+    return {
+        "data": data,
+        "message": "API health fetched successfully"
+    }
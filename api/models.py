@@ -7,8 +7,14 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Boolean,
-    Text
+    Text,
+    Index,
+    LargeBinary,
+    Float,
+    Date,
+    UniqueConstraint
 )
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -27,6 +33,20 @@ class API(Base):
     endpoint = Column(String(255), nullable=False)
     method = Column(String(10), default="GET")
     enabled = Column(Boolean, default=True)
+    # Upstream timeout for /gateway/{name}; NULL uses UPSTREAM_TIMEOUT_SECONDS
+    timeout_seconds = Column(Float, nullable=True)
+    # Cluster-wide in-flight cap (app/core/concurrency_limiter.py); NULL = adaptive per-worker limit only
+    max_concurrency = Column(Integer, nullable=True)
+    # GET response cache, see app/core/response_cache.py; NULL TTL disables it
+    cache_ttl_seconds = Column(Integer, nullable=True)
+    cache_stale_seconds = Column(Integer, default=0)
+    cache_vary_headers = Column(String(255), nullable=True)  # comma-separated
+    cache_max_object_bytes = Column(Integer, nullable=True)
+    # Active probing / SLO, see app/core/health_prober.py; NULL uses the
+    # PROBE_* / SLO_* defaults, probe_interval_seconds=0 disables probing
+    probe_interval_seconds = Column(Integer, nullable=True)
+    slo_latency_ms = Column(Integer, nullable=True)
+    slo_target = Column(Float, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
     api_keys = relationship("APIKey", back_populates="api")
@@ -40,7 +60,17 @@ class APIKey(Base):
     __tablename__ = "api_keys"
 
     id = Column(Integer, primary_key=True, index=True)
-    key_value = Column(String(64), unique=True, index=True, nullable=False)
+    # Raw secret of keys created before hashed storage; cleared once an
+    # operator confirms backfill_api_key_hashes (app/core/api_key_cache.py)
+    key_value = Column(String(64), unique=True, index=True, nullable=True)
+    key_prefix = Column(String(12), nullable=True)
+    # HMAC-SHA256 of the raw key, see app/core/api_key_hashing.py
+    key_hash = Column(
+        LargeBinary(32).with_variant(mysql.BINARY(32), "mysql"),
+        unique=True,
+        index=True,
+        nullable=True
+    )
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
 
@@ -64,6 +94,8 @@ class Tier(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, nullable=False)
     description = Column(Text)
+    # Load-shedding order under overload: lower priorities are rejected first
+    priority = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
     rate_limit_rules = relationship(
@@ -88,6 +120,10 @@ class RateLimitRules(Base):
     requests_per_minute = Column(Integer, nullable=False)
     requests_per_hour = Column(Integer, nullable=True)
     requests_per_day = Column(Integer, nullable=True)
+    # Monthly quota per API key, see app/core/quota_ledger.py; NULL = unlimited.
+    # "hard" rejects once used up, "soft" only flags the responses.
+    requests_per_month = Column(Integer, nullable=True)
+    quota_mode = Column(String(10), default="hard", nullable=False)
 
     created_at = Column(DateTime, server_default=func.now())
 
@@ -110,12 +146,40 @@ class UsageLog(Base):
     status_code = Column(Integer)
     response_time_ms = Column(Integer)
 
-    timestamp = Column(DateTime, server_default=func.now())
+    # Partition key: see app/core/usage_log_partitions.py
+    timestamp = Column(DateTime, server_default=func.now(), nullable=False, index=True)
 
     api_key = relationship("APIKey", back_populates="usage_logs")
     user = relationship("User")
     api = relationship("API", back_populates="usage_logs")
 
+    __table_args__ = (
+        Index("ix_usage_logs_api_id_timestamp", "api_id", "timestamp"),
+    )
+
+
+# -------------------------
+# Stress-test Usage Log
+# -------------------------
+class StressUsageLog(Base):
+    """
+    Shadow of usage_logs for stress runs in "gateway" mode, so synthetic
+    traffic never reaches production analytics.
+    """
+    __tablename__ = "stress_usage_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    api_key_id = Column(Integer)
+    user_id = Column(Integer)
+    api_id = Column(Integer)
+
+    endpoint = Column(String(255))
+    method = Column(String(10))
+    status_code = Column(Integer)
+    response_time_ms = Column(Integer)
+
+    timestamp = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+
 
 # -------------------------
 # Analytics
@@ -139,8 +203,95 @@ class AnalyticsSummary(Base):
     max_response_time_ms = Column(Integer)
 
     rate_limit_exceeded_count = Column(Integer, default=0)
+    cache_hit_count = Column(Integer, default=0)
+    cache_miss_count = Column(Integer, default=0)
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    api = relationship("API")
+    api_key = relationship("APIKey")
+
+
+# -------------------------
+# Probe Summary (active health checks)
+# -------------------------
+class ProbeSummary(Base):
+    __tablename__ = "probe_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Removed with the API (also explicitly, see api/services.delete_api)
+    api_id = Column(Integer, ForeignKey("apis.id", ondelete="CASCADE"), nullable=False)
+
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+
+    probe_count = Column(Integer, default=0)
+    # Answered with a status below 500
+    success_count = Column(Integer, default=0)
+    # Successful and within the API's slo_latency_ms
+    slo_good_count = Column(Integer, default=0)
+
+    avg_latency_ms = Column(Integer)
+    p95_latency_ms = Column(Integer)
+    max_latency_ms = Column(Integer)
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    api = relationship("API")
+
+    __table_args__ = (
+        Index("ix_probe_summaries_api_id_window_start", "api_id", "window_start"),
+    )
+
+
+# -------------------------
+# Usage Ledger (per-key billing counts, see app/core/quota_ledger.py)
+# -------------------------
+class UsageLedger(Base):
+    __tablename__ = "usage_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: billed usage outlives a deleted key
+    api_key_id = Column(Integer, nullable=False)
+
+    period = Column(String(5), nullable=False)  # "day" or "month"
+    period_start = Column(Date, nullable=False)
+    request_count = Column(Integer, default=0, nullable=False)
+
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("api_key_id", "period", "period_start", name="uq_usage_ledger_key_period"),
+    )
+
+
+# -------------------------
+# Anomaly Alert (see app/core/anomaly_detection.py)
+# -------------------------
+class AnomalyAlert(Base):
+    __tablename__ = "anomaly_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Deleted with the API, kept (key unset) when only the key goes; also
+    # done explicitly in api/services.py for tables predating these rules
+    api_id = Column(Integer, ForeignKey("apis.id", ondelete="CASCADE"), nullable=False)
+    api_key_id = Column(Integer, ForeignKey("api_keys.id", ondelete="SET NULL"), nullable=True)
+
+    window_start = Column(DateTime, nullable=False)
+
+    # error_rate, p95_latency_ms or rate_limited_rate
+    metric = Column(String(32), nullable=False)
+    value = Column(Float, nullable=False)
+    baseline = Column(Float, nullable=False)
+    # Standard deviations above the baseline
+    score = Column(Float, nullable=False)
 
     created_at = Column(DateTime, server_default=func.now())
 
     api = relationship("API")
     api_key = relationship("APIKey")
+
+    __table_args__ = (
+        Index("ix_anomaly_alerts_window_start", "window_start"),
+    )
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db, db_commit
 from app.api import services, schemas
 from app.auth.services import get_current_user
-from app.auth.models import User
+from app.core.principal_cache import Principal
 
 # ------------------------------------------------
 # Routers
@@ -22,7 +22,7 @@ key_router = APIRouter(prefix="/api-keys", tags=["API Keys"])
 async def create_api(
     api: schemas.APICreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -35,7 +35,7 @@ async def create_api(
 @api_router.get("/",response_model=schemas.APIsListResponse)
 async def list_apis(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.list_apis(db)
 
@@ -44,7 +44,7 @@ async def list_apis(
 async def get_api(
     api_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.get_api(db, api_id)
 
@@ -54,7 +54,7 @@ async def update_api(
     api_id: str,
     payload: schemas.APIUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -68,7 +68,7 @@ async def update_api(
 async def delete_api(
     api_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -78,6 +78,34 @@ async def delete_api(
     return result
 
 
+@api_router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_create_apis(
+    payload: schemas.APIBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    result = await services.bulk_create_apis(db, payload)
+    await db_commit(db)
+    return result
+
+
+@api_router.post("/bulk/delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_apis(
+    payload: schemas.BulkIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    result = await services.bulk_delete_apis(db, payload)
+    await db_commit(db)
+    return result
+
+
 # =================================================
 # TIER ROUTES (ADMIN)
 # =================================================
@@ -90,7 +118,7 @@ async def delete_api(
 async def create_tier(
     tier: schemas.TierCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -106,7 +134,7 @@ async def create_tier(
 )
 async def list_tiers(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.list_tiers(db)
 
@@ -118,7 +146,7 @@ async def list_tiers(
 async def get_tier(
     tier_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.get_tier(db, tier_id)
 
@@ -131,7 +159,7 @@ async def update_tier(
     tier_id: str,
     payload: schemas.TierUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -148,7 +176,7 @@ async def update_tier(
 async def delete_tier(
     tier_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -158,6 +186,34 @@ async def delete_tier(
     return result
 
 
+@tier_router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_create_tiers(
+    payload: schemas.TierBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    result = await services.bulk_create_tiers(db, payload)
+    await db_commit(db)
+    return result
+
+
+@tier_router.post("/bulk/delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_tiers(
+    payload: schemas.BulkIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    result = await services.bulk_delete_tiers(db, payload)
+    await db_commit(db)
+    return result
+
+
 # =================================================
 # API KEY ROUTES (USER)
 # =================================================
@@ -170,7 +226,7 @@ async def delete_tier(
 async def generate_api_key(
     payload: schemas.APIKeyCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await services.generate_api_key(
         db=db,
@@ -187,11 +243,20 @@ async def generate_api_key(
 )
 async def list_my_api_keys(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return await services.list_user_api_keys(db, current_user.id)
 
 
+@key_router.get("/{api_key_id}/usage")
+async def read_api_key_usage(
+    api_key_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    return await services.get_api_key_usage(db, api_key_id, current_user)
+
+
 @key_router.put(
     "/{api_key_id}/revoke",
     response_model=schemas.APIKeyResponse
@@ -199,7 +264,7 @@ async def list_my_api_keys(
 async def revoke_api_key(
     api_key_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await services.revoke_api_key(db, api_key_id)
     await db_commit(db)
@@ -213,7 +278,7 @@ async def revoke_api_key(
 async def delete_api_key(
     api_key_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await services.delete_api_key(db, api_key_id)
     await db_commit(db)
@@ -222,7 +287,46 @@ async def delete_api_key(
 @key_router.get("/all", status_code=status.HTTP_200_OK)
 async def get_all_keys(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await services.list_api_keys(db)
-    return result
\ No newline at end of file
+    return result
+
+
+@key_router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_generate_api_keys(
+    payload: schemas.APIKeyBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    user_id = current_user.id
+    if payload.user_id is not None and payload.user_id != current_user.id:
+        if current_user.role_id != 1:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        user_id = payload.user_id
+
+    result = await services.bulk_generate_api_keys(db, user_id, payload)
+    await db_commit(db)
+    return result
+
+
+@key_router.post("/bulk/revoke", status_code=status.HTTP_200_OK)
+async def bulk_revoke_api_keys(
+    payload: schemas.BulkIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    result = await services.bulk_revoke_api_keys(db, payload, current_user)
+    await db_commit(db)
+    return result
+
+
+@key_router.post("/bulk/delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_api_keys(
+    payload: schemas.BulkIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    result = await services.bulk_delete_api_keys(db, payload, current_user)
+    await db_commit(db)
+    return result
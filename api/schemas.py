@@ -1,21 +1,48 @@
 # backend/app/api/schemas.py
 
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from urllib.parse import urlsplit
+from pydantic import BaseModel, Field, field_validator
+
+
+# Rows per bulk request
+BULK_MAX_ITEMS = 10000
 
 
 # -------------------------
 # API Schemas
 # -------------------------
+def check_endpoint(endpoint: Optional[str]):
+    """
+    /gateway/{api_name} and the health prober open connections to this
+    URL, so it must name a scheme and host.
+    """
+    if endpoint is None:
+        return endpoint
+    parts = urlsplit(endpoint)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("endpoint must be an absolute http(s) URL")
+    return endpoint
+
+
 class APIBase(BaseModel):
     name: str
     endpoint: str
     method: Optional[str] = "GET"
     enabled: Optional[bool] = True
+    timeout_seconds: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    cache_ttl_seconds: Optional[int] = None
+    cache_stale_seconds: Optional[int] = None
+    cache_vary_headers: Optional[str] = None
+    cache_max_object_bytes: Optional[int] = None
+    probe_interval_seconds: Optional[int] = None
+    slo_latency_ms: Optional[int] = None
+    slo_target: Optional[float] = None
 
 
 class APICreate(APIBase):
-    pass
+    _check_endpoint = field_validator("endpoint")(check_endpoint)
 
 
 class APIUpdate(BaseModel):
@@ -23,6 +50,17 @@ class APIUpdate(BaseModel):
     endpoint: Optional[str] = None
     method: Optional[str] = None
     enabled: Optional[bool] = None
+    timeout_seconds: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    cache_ttl_seconds: Optional[int] = None
+    cache_stale_seconds: Optional[int] = None
+    cache_vary_headers: Optional[str] = None
+    cache_max_object_bytes: Optional[int] = None
+    probe_interval_seconds: Optional[int] = None
+    slo_latency_ms: Optional[int] = None
+    slo_target: Optional[float] = None
+
+    _check_endpoint = field_validator("endpoint")(check_endpoint)
 
 
 class APIOut(APIBase):
@@ -48,20 +86,28 @@ class APIsListResponse(BaseModel):
 class TierBase(BaseModel):
     name: str
     description: Optional[str] = None
+    # Higher survives overload longer; see app/core/concurrency_limiter.py
+    priority: Optional[int] = 0
 
 
 class TierCreate(TierBase):
     requests_per_minute: int
     requests_per_hour: int
     requests_per_day: int
+    # Per API key; None = unlimited. See app/core/quota_ledger.py
+    requests_per_month: Optional[int] = None
+    quota_mode: Literal["hard", "soft"] = "hard"
 
 
 class TierUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    priority: Optional[int] = None
     requests_per_minute: Optional[int] = None
     requests_per_hour: Optional[int] = None
     requests_per_day: Optional[int] = None
+    requests_per_month: Optional[int] = None
+    quota_mode: Optional[Literal["hard", "soft"]] = None
 
 
 class TierOut(TierBase):
@@ -69,6 +115,8 @@ class TierOut(TierBase):
     requests_per_minute: int
     requests_per_hour: int | None = None
     requests_per_day: int | None = None
+    requests_per_month: int | None = None
+    quota_mode: str = "hard"
 
     class Config:
         from_attributes = True
@@ -94,7 +142,9 @@ class APIKeyCreate(BaseModel):
 
 class APIKeyOut(BaseModel):
     id: int
-    key_value: str
+    # Only returned when the key is created; afterwards only the prefix is known
+    key_value: Optional[str] = None
+    key_prefix: Optional[str] = None
     enabled: bool
     api_id: int
     tier_id: int
@@ -111,3 +161,24 @@ class APIKeyResponse(BaseModel):
 class APIKeysListResponse(BaseModel):
     data: List[APIKeyOut]
     message: str
+
+
+# -------------------------
+# Bulk Schemas
+# -------------------------
+class BulkIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class APIBulkCreate(BaseModel):
+    items: List[APICreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class TierBulkCreate(BaseModel):
+    items: List[TierCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class APIKeyBulkCreate(APIKeyCreate):
+    count: int = Field(1, ge=1, le=BULK_MAX_ITEMS)
+    # Owner of the new keys; admins only, defaults to the caller
+    user_id: Optional[int] = None
@@ -1,11 +1,19 @@
 # app/api/services.py
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, update, delete
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
 import secrets
 
 from app.api import models, schemas
+from app.config import settings
+from app.database import on_commit
+from app.core.api_key_signing import issue_signed_key
+from app.core.api_key_cache import revoke_keys, invalidate_apis, invalidate_tiers
+from app.core.api_key_hashing import hash_api_key, api_key_prefix
+from app.core.response_cache import purge_apis as purge_api_responses
+from app.core.quota_ledger import key_usage
 
 
 # ======================================================
@@ -75,6 +83,8 @@ async def update_api(
 
     await db.flush()
     await db.refresh(api)
+    on_commit(db, invalidate_apis, [api.id])
+    on_commit(db, purge_api_responses, [api.id])
 
     return {
         "data": schemas.APIOut.model_validate(api).model_dump(),
@@ -82,6 +92,16 @@ async def update_api(
     }
 
 
+async def _delete_api_dependents(db: AsyncSession, api_ids):
+    """
+    Rows that only describe the APIs go with them. Deleted explicitly
+    rather than left to ON DELETE CASCADE, which tables created before it
+    was declared do not have.
+    """
+    await db.execute(delete(models.ProbeSummary).where(models.ProbeSummary.api_id.in_(api_ids)))
+    await db.execute(delete(models.AnomalyAlert).where(models.AnomalyAlert.api_id.in_(api_ids)))
+
+
 async def delete_api(db: AsyncSession, api_id: str):
     result = await db.execute(
         select(models.API).where(models.API.id == api_id)
@@ -91,7 +111,10 @@ async def delete_api(db: AsyncSession, api_id: str):
     if not api:
         raise HTTPException(status_code=404, detail="API not found")
 
+    await _delete_api_dependents(db, [api.id])
     await db.delete(api)
+    on_commit(db, invalidate_apis, [api.id])
+    on_commit(db, purge_api_responses, [api.id])
 
     return {
         "data": None,
@@ -107,7 +130,8 @@ async def create_tier(db: AsyncSession, tier: schemas.TierCreate):
     try:
         db_tier = models.Tier(
             name=tier.name,
-            description=tier.description
+            description=tier.description,
+            priority=tier.priority or 0
         )
         db.add(db_tier)
         await db.flush()  # get tier.id
@@ -116,7 +140,9 @@ async def create_tier(db: AsyncSession, tier: schemas.TierCreate):
             tier_id=db_tier.id,
             requests_per_minute=tier.requests_per_minute,
             requests_per_hour=tier.requests_per_hour,
-            requests_per_day=tier.requests_per_day
+            requests_per_day=tier.requests_per_day,
+            requests_per_month=tier.requests_per_month,
+            quota_mode=tier.quota_mode
         )
         db.add(rate_rule)
 
@@ -125,9 +151,12 @@ async def create_tier(db: AsyncSession, tier: schemas.TierCreate):
                 id=db_tier.id,
                 name=db_tier.name,
                 description=db_tier.description,
+                priority=db_tier.priority,
                 requests_per_minute=rate_rule.requests_per_minute,
                 requests_per_hour=rate_rule.requests_per_hour,
                 requests_per_day=rate_rule.requests_per_day,
+                requests_per_month=rate_rule.requests_per_month,
+                quota_mode=rate_rule.quota_mode,
             ).model_dump(),
             "message": "Tier created successfully"
         }
@@ -151,9 +180,12 @@ async def list_tiers(db: AsyncSession):
             id=t.id,
             name=t.name,
             description=t.description,
+            priority=t.priority,
             requests_per_minute=t.rate_limit_rules.requests_per_minute,
             requests_per_hour=t.rate_limit_rules.requests_per_hour,
             requests_per_day=t.rate_limit_rules.requests_per_day,
+            requests_per_month=t.rate_limit_rules.requests_per_month,
+            quota_mode=t.rate_limit_rules.quota_mode,
         ).model_dump()
         for t in tiers
     ]
@@ -180,9 +212,12 @@ async def get_tier(db: AsyncSession, tier_id: str):
             id=tier.id,
             name=tier.name,
             description=tier.description,
+            priority=tier.priority,
             requests_per_minute=tier.rate_limit_rules.requests_per_minute,
             requests_per_hour=tier.rate_limit_rules.requests_per_hour,
             requests_per_day=tier.rate_limit_rules.requests_per_day,
+            requests_per_month=tier.rate_limit_rules.requests_per_month,
+            quota_mode=tier.rate_limit_rules.quota_mode,
         ).model_dump(),
         "message": "Tier fetched successfully"
     }
@@ -209,6 +244,8 @@ async def update_tier(
         tier.name = data["name"]
     if "description" in data:
         tier.description = data["description"]
+    if "priority" in data:
+        tier.priority = data["priority"]
 
     if "requests_per_minute" in data:
         tier.rate_limit_rules.requests_per_minute = data["requests_per_minute"]
@@ -216,15 +253,24 @@ async def update_tier(
         tier.rate_limit_rules.requests_per_hour = data["requests_per_hour"]
     if "requests_per_day" in data:
         tier.rate_limit_rules.requests_per_day = data["requests_per_day"]
+    if "requests_per_month" in data:
+        tier.rate_limit_rules.requests_per_month = data["requests_per_month"]
+    if data.get("quota_mode"):
+        tier.rate_limit_rules.quota_mode = data["quota_mode"]
+
+    on_commit(db, invalidate_tiers, [tier.id])
 
     return {
         "data": schemas.TierOut(
             id=tier.id,
             name=tier.name,
             description=tier.description,
+            priority=tier.priority,
             requests_per_minute=tier.rate_limit_rules.requests_per_minute,
             requests_per_hour=tier.rate_limit_rules.requests_per_hour,
             requests_per_day=tier.rate_limit_rules.requests_per_day,
+            requests_per_month=tier.rate_limit_rules.requests_per_month,
+            quota_mode=tier.rate_limit_rules.quota_mode,
         ).model_dump(),
         "message": "Tier updated successfully"
     }
@@ -239,6 +285,7 @@ async def delete_tier(db: AsyncSession, tier_id: str):
         raise HTTPException(status_code=404, detail="Tier not found")
 
     await db.delete(tier)
+    on_commit(db, invalidate_tiers, [tier.id])
 
     return {
         "data": None,
@@ -258,7 +305,6 @@ async def generate_api_key(
         key_value = secrets.token_hex(32)
 
         api_key = models.APIKey(
-            key_value=key_value,
             user_id=user_id,
             api_id=payload.api_id,
             tier_id=payload.tier_id
@@ -266,10 +312,22 @@ async def generate_api_key(
 
         db.add(api_key)
         await db.flush()
+
+        if settings.API_KEY_FORMAT == "signed":
+            # The signed format embeds the key id, so it is only known after the insert
+            key_value = issue_signed_key(api_key.id, api_key.api_id, api_key.tier_id)
+
+        # Only the keyed hash is stored; the raw key is returned exactly once
+        api_key.key_hash = hash_api_key(key_value)
+        api_key.key_prefix = api_key_prefix(key_value)
+        await db.flush()
         await db.refresh(api_key)
 
+        data = schemas.APIKeyOut.model_validate(api_key).model_dump()
+        data["key_value"] = key_value
+
         return {
-            "data": schemas.APIKeyOut.model_validate(api_key).model_dump(),
+            "data": data,
             "message": "API key generated successfully"
         }
 
@@ -305,6 +363,7 @@ async def revoke_api_key(db: AsyncSession, api_key_id: str):
     api_key.enabled = False
     await db.flush()
     await db.refresh(api_key)
+    on_commit(db, revoke_keys, [api_key.id])
 
     return {
         "data": schemas.APIKeyOut.model_validate(api_key).model_dump(),
@@ -312,6 +371,17 @@ async def revoke_api_key(db: AsyncSession, api_key_id: str):
     }
 
 
+async def _detach_key_dependents(db: AsyncSession, key_ids):
+    """
+    Alerts outlive the keys they were raised for, as API-level history.
+    """
+    await db.execute(
+        update(models.AnomalyAlert)
+        .where(models.AnomalyAlert.api_key_id.in_(key_ids))
+        .values(api_key_id=None)
+    )
+
+
 async def delete_api_key(db: AsyncSession, api_key_id: str):
     result = await db.execute(
         select(models.APIKey).where(models.APIKey.id == api_key_id)
@@ -321,7 +391,9 @@ async def delete_api_key(db: AsyncSession, api_key_id: str):
     if not api_key:
         raise HTTPException(status_code=404, detail="API key not found")
 
+    await _detach_key_dependents(db, [api_key.id])
     await db.delete(api_key)
+    on_commit(db, revoke_keys, [api_key.id])
 
     return {
         "data": None,
@@ -329,6 +401,36 @@ async def delete_api_key(db: AsyncSession, api_key_id: str):
     }
 
 
+async def get_api_key_usage(db: AsyncSession, api_key_id: int, current_user):
+    result = await db.execute(
+        select(models.APIKey.user_id, models.RateLimitRules.requests_per_month, models.RateLimitRules.quota_mode)
+        .join(models.RateLimitRules, models.RateLimitRules.tier_id == models.APIKey.tier_id)
+        .where(models.APIKey.id == api_key_id)
+    )
+    row = result.first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="API key not found")
+    if row.user_id != current_user.id and current_user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Not allowed to view this API key")
+
+    usage = await key_usage(db, api_key_id)
+    remaining = None
+    if row.requests_per_month is not None:
+        remaining = max(row.requests_per_month - usage["this_month"], 0)
+
+    return {
+        "data": {
+            "api_key_id": api_key_id,
+            "requests_per_month": row.requests_per_month,
+            "quota_mode": row.quota_mode,
+            "remaining_this_month": remaining,
+            **usage
+        },
+        "message": "API key usage fetched successfully"
+    }
+
+
 async def list_api_keys(db: AsyncSession):
     result = await db.execute(
         select(models.APIKey)
@@ -336,6 +438,209 @@ async def list_api_keys(db: AsyncSession):
     api_keys = result.scalars().all()
 
     return {
-        "data": api_keys,
+        "data": [schemas.APIKeyOut.model_validate(k).model_dump() for k in api_keys],
         "message": "API Keys fetched successfully"
-    }
\ No newline at end of file
+    }
+
+# ======================================================
+# BULK SERVICES (one transaction per request)
+# ======================================================
+
+async def _insert_returning_ids(db: AsyncSession, model, rows, unique_column):
+    """
+    Insert `rows` as one multi-row insert and return their ids in row
+    order: through RETURNING where the dialect supports it, otherwise
+    (MySQL) by reading them back through a unique column.
+    """
+    if db.bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = await db.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars())
+
+    await db.execute(insert(model), rows)
+    values = [row[unique_column.key] for row in rows]
+    result = await db.execute(
+        select(model.id, unique_column).where(unique_column.in_(values))
+    )
+    ids = {value: row_id for row_id, value in result.all()}
+    return [ids[value] for value in values]
+
+
+async def _existing_ids(db: AsyncSession, model, ids, *conditions):
+    result = await db.execute(select(model.id).where(model.id.in_(ids), *conditions))
+    return set(result.scalars().all())
+
+
+def _bulk_result(found, requested, message: str):
+    return {
+        "data": {
+            "ids": sorted(found),
+            "not_found": sorted(set(requested) - found),
+        },
+        "message": message
+    }
+
+
+async def _reject_taken_names(db: AsyncSession, model, names, label: str):
+    duplicates = {name for name in names if names.count(name) > 1}
+    result = await db.execute(select(model.name).where(model.name.in_(names)))
+    taken = duplicates | set(result.scalars().all())
+    if taken:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{label} names already exist or repeat: {', '.join(sorted(taken))}"
+        )
+
+
+async def bulk_create_apis(db: AsyncSession, payload: schemas.APIBulkCreate):
+    rows = [api.model_dump() for api in payload.items]
+    await _reject_taken_names(db, models.API, [row["name"] for row in rows], "API")
+
+    ids = await _insert_returning_ids(db, models.API, rows, models.API.name)
+
+    return {
+        "data": [
+            schemas.APIOut(id=api_id, **row).model_dump()
+            for api_id, row in zip(ids, rows)
+        ],
+        "message": f"{len(ids)} APIs created successfully"
+    }
+
+
+async def bulk_delete_apis(db: AsyncSession, payload: schemas.BulkIds):
+    found = await _existing_ids(db, models.API, payload.ids)
+    if found:
+        await _delete_api_dependents(db, found)
+        # What db.delete() does through API.api_keys / API.usage_logs;
+        # a Core delete skips the ORM and would trip the foreign keys
+        await db.execute(update(models.APIKey).where(models.APIKey.api_id.in_(found)).values(api_id=None))
+        await db.execute(update(models.UsageLog).where(models.UsageLog.api_id.in_(found)).values(api_id=None))
+        await db.execute(delete(models.API).where(models.API.id.in_(found)))
+        on_commit(db, invalidate_apis, found)
+        on_commit(db, purge_api_responses, found)
+
+    return _bulk_result(found, payload.ids, f"{len(found)} APIs deleted successfully")
+
+
+async def bulk_create_tiers(db: AsyncSession, payload: schemas.TierBulkCreate):
+    await _reject_taken_names(db, models.Tier, [tier.name for tier in payload.items], "Tier")
+
+    tier_rows = [
+        {"name": tier.name, "description": tier.description, "priority": tier.priority or 0}
+        for tier in payload.items
+    ]
+    ids = await _insert_returning_ids(db, models.Tier, tier_rows, models.Tier.name)
+
+    rule_fields = (
+        "requests_per_minute", "requests_per_hour", "requests_per_day",
+        "requests_per_month", "quota_mode",
+    )
+    rule_rows = [
+        {"tier_id": tier_id, **tier.model_dump(include=set(rule_fields))}
+        for tier_id, tier in zip(ids, payload.items)
+    ]
+    await db.execute(insert(models.RateLimitRules), rule_rows)
+
+    return {
+        "data": [
+            schemas.TierOut(id=tier_id, **tier_row, **rule_row).model_dump()
+            for tier_id, tier_row, rule_row in zip(ids, tier_rows, rule_rows)
+        ],
+        "message": f"{len(ids)} tiers created successfully"
+    }
+
+
+async def bulk_delete_tiers(db: AsyncSession, payload: schemas.BulkIds):
+    found = await _existing_ids(db, models.Tier, payload.ids)
+    if found:
+        # Core deletes skip the ORM cascade to rate_limit_rules
+        await db.execute(delete(models.RateLimitRules).where(models.RateLimitRules.tier_id.in_(found)))
+        await db.execute(delete(models.Tier).where(models.Tier.id.in_(found)))
+        on_commit(db, invalidate_tiers, found)
+
+    return _bulk_result(found, payload.ids, f"{len(found)} tiers deleted successfully")
+
+
+async def bulk_generate_api_keys(db: AsyncSession, user_id: int, payload: schemas.APIKeyBulkCreate):
+    if not await _existing_ids(db, models.API, [payload.api_id]):
+        raise HTTPException(status_code=404, detail="API not found")
+    if not await _existing_ids(db, models.Tier, [payload.tier_id]):
+        raise HTTPException(status_code=404, detail="Tier not found")
+
+    signed = settings.API_KEY_FORMAT == "signed"
+    key_values = [secrets.token_hex(32) for _ in range(payload.count)]
+    rows = [
+        {
+            "user_id": user_id,
+            "api_id": payload.api_id,
+            "tier_id": payload.tier_id,
+            "enabled": True,
+            # Signed keys embed their id: insert a random placeholder hash
+            # and replace it once the ids are known
+            "key_hash": secrets.token_bytes(32) if signed else hash_api_key(key_value),
+            "key_prefix": None if signed else api_key_prefix(key_value),
+        }
+        for key_value in key_values
+    ]
+    ids = await _insert_returning_ids(db, models.APIKey, rows, models.APIKey.key_hash)
+
+    if signed:
+        key_values = [issue_signed_key(key_id, payload.api_id, payload.tier_id) for key_id in ids]
+        await db.execute(
+            update(models.APIKey),
+            [
+                {"id": key_id, "key_hash": hash_api_key(key_value), "key_prefix": api_key_prefix(key_value)}
+                for key_id, key_value in zip(ids, key_values)
+            ]
+        )
+
+    return {
+        "data": [
+            schemas.APIKeyOut(
+                id=key_id,
+                key_value=key_value,
+                key_prefix=api_key_prefix(key_value),
+                enabled=True,
+                api_id=payload.api_id,
+                tier_id=payload.tier_id,
+            ).model_dump()
+            for key_id, key_value in zip(ids, key_values)
+        ],
+        "message": f"{len(ids)} API keys generated successfully"
+    }
+
+
+def _owned_by(current_user):
+    # Admins may act on any key, everyone else only on their own
+    if current_user.role_id == 1:
+        return ()
+    return (models.APIKey.user_id == current_user.id,)
+
+
+async def bulk_revoke_api_keys(db: AsyncSession, payload: schemas.BulkIds, current_user):
+    found = await _existing_ids(db, models.APIKey, payload.ids, *_owned_by(current_user))
+    if found:
+        await db.execute(
+            update(models.APIKey)
+            .where(models.APIKey.id.in_(found))
+            .values(enabled=False)
+        )
+        on_commit(db, revoke_keys, found)
+
+    return _bulk_result(found, payload.ids, f"{len(found)} API keys revoked successfully")
+
+
+async def bulk_delete_api_keys(db: AsyncSession, payload: schemas.BulkIds, current_user):
+    found = await _existing_ids(db, models.APIKey, payload.ids, *_owned_by(current_user))
+    if found:
+        await _detach_key_dependents(db, found)
+        # What db.delete() does through APIKey.usage_logs
+        await db.execute(
+            update(models.UsageLog).where(models.UsageLog.api_key_id.in_(found)).values(api_key_id=None)
+        )
+        await db.execute(delete(models.APIKey).where(models.APIKey.id.in_(found)))
+        on_commit(db, revoke_keys, found)
+
+    return _bulk_result(found, payload.ids, f"{len(found)} API keys deleted successfully")
@@ -32,8 +32,10 @@ class BlacklistedTokens(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     token = Column(Text, nullable=False)
+    # jti (or SHA-256 of the token for pre-jti tokens): see app/core/token_revocation.py
+    token_id = Column(String(64), unique=True, index=True, nullable=True)
     blacklisted_at = Column(DateTime, server_default=func.current_timestamp(), nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     reason = Column(String(255), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
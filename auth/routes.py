@@ -1,6 +1,6 @@
 # app/auth/routes.py
-from fastapi import APIRouter, Depends
-from app.database import get_db
+from fastapi import APIRouter, Depends, Request
+from app.database import get_db, db_commit
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from app.auth.schemas import *
@@ -20,12 +20,13 @@ async def create_user(user: CreateUser, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/login")
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     try:
         credentials = LoginInput(email=form_data.username, password=form_data.password)
     except ValidationError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="email is incorrect")
-    result = await authenticate_user(db, credentials)
+    client_ip = request.client.host if request.client else None
+    result = await authenticate_user(db, credentials, client_ip)
     await db.commit()
     return result
 
@@ -33,7 +34,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Async
 @router.post("/logout")
 async def logout(
     data: BlacklistedTokenSubmit,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     print(data.model_dump())
@@ -47,15 +48,16 @@ async def logout(
 @router.get("/toggle-status")
 async def toggle_user_status(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     result = await toogle_user_status_service(db, user_id)
-    await db.commit()
+    await db_commit(db)
     return result
 
 
 
 @router.get("/me", response_model=schemas.UserOut)
-async def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+async def get_me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # The principal snapshot has no profile fields, so /me reads the full row
+    return (await db.execute(select(User).where(User.id == current_user.id))).scalar_one()
\ No newline at end of file
@@ -3,7 +3,7 @@ from app.auth import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from app.auth.models import User
-from app.database import get_db
+from app.database import get_db, on_commit, SessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import select
@@ -11,10 +11,13 @@ from datetime import datetime, timezone
 from app.config import settings
 from jose import JWTError, jwt
 from app.auth import utils
+from app.core import token_revocation
+from app.core.principal_cache import Principal, get_principal, invalidate_principal
+from app.core import login_throttle
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid token",
@@ -22,10 +25,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
 
     try:
-        db_blacklisted_token = (await db.execute(select(models.BlacklistedTokens).where(models.BlacklistedTokens.token == token))).scalar_one_or_none()
-        if db_blacklisted_token:
-            raise credentials_exception
-        
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.TOKENALGORITHM])
         # print("JWT payload:", payload)
         id: str = payload.get("sub")
@@ -35,21 +34,46 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         print("JWT decode error:", e)
         raise credentials_exception
 
-    user = (await db.execute(select(User).where(User.id == id))).scalar_one_or_none()
+    if await token_revocation.is_token_revoked(db, token_revocation.token_id(token, payload)):
+        raise credentials_exception
 
-    if not user or user.is_active == 0:
+    principal = await get_principal(db, int(id))
+
+    if not principal or not principal.is_active:
         print("User not found")
         raise credentials_exception
-    return user
+    return principal
+
+
+async def get_streaming_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    get_current_user for endless responses (SSE): yield-dependencies such as
+    get_db are only closed once the response ends, so the lookup uses its
+    own session that goes back to the pool before streaming starts.
+    """
+    async with SessionLocal() as db:
+        return await get_current_user(token, db)
 
 # -------------------------------------------------------------------------------------------------------------
 
-async def authenticate_user(db: AsyncSession, credentials: schemas.LoginInput):
+async def authenticate_user(db: AsyncSession, credentials: schemas.LoginInput, client_ip: str | None = None):
+    # Throttled identities are rejected before any SQL or Argon2 work
+    await login_throttle.check_login_allowed(credentials.email, client_ip)
+
     user = (await db.execute(select(User).where(User.email == credentials.email))).scalar_one_or_none()
 
-    if not user or not await utils.verify_password(user.password, credentials.password):
+    if user:
+        verified = await utils.verify_password(user.password, credentials.password)
+    else:
+        # Same Argon2 cost as a real account so response time doesn't reveal which emails exist
+        await utils.verify_password(await utils.get_dummy_hash(), credentials.password)
+        verified = False
+
+    if not verified:
+        await login_throttle.record_login_failure(credentials.email, client_ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
+    await login_throttle.record_login_success(credentials.email)
     token = await utils.create_access_token({"sub": str(user.id)})
     return {"access_token": token, "token_type": "bearer"}
 
@@ -75,9 +99,17 @@ async def blacklist_token_service(db: AsyncSession, data: schemas.BlacklistedTok
         raise credentials_exception
     
     expires_at = datetime.fromtimestamp(exp_timestamp, tz=timezone.utc)
+    revocation_id = token_revocation.token_id(data.token, payload)
+
+    already_revoked = (await db.execute(
+        select(models.BlacklistedTokens.id).where(models.BlacklistedTokens.token_id == revocation_id)
+    )).scalar_one_or_none()
+    if already_revoked:
+        return {"status": 1}
 
     db_blacklisted_token = models.BlacklistedTokens(
         token = data.token,
+        token_id = revocation_id,
         expires_at = expires_at,
         reason = data.reason,
         user_id = user.id
@@ -85,6 +117,12 @@ async def blacklist_token_service(db: AsyncSession, data: schemas.BlacklistedTok
 
     db.add(db_blacklisted_token)
     await db.flush()
+    try:
+        await token_revocation.revoke(revocation_id, expires_at)
+    except Exception as e:
+        # The row above still revokes the token: sync_revocations copies it
+        # into Redis on its next run
+        print("Revocation cache write failed:", e)
 
     return {"status": 1}
 
@@ -124,10 +162,11 @@ async def toogle_user_status_service(db: AsyncSession, user_id: int):
         if not db_user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        db_user.status = not db_user.status
+        db_user.is_active = not db_user.is_active
 
         await db.flush()
         await db.refresh(db_user)
+        on_commit(db, invalidate_principal, db_user.id)
         return {"data": schemas.UserOut.model_validate(db_user).model_dump(), "message": "User status toggled successfully"}, status.HTTP_200_OK
 
     except HTTPException as http_exec:
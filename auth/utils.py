@@ -1,18 +1,94 @@
 from argon2 import PasswordHasher, exceptions as argon2_exceptions
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import datetime as DATETIME
 from jose import JWTError, jwt
 from app.config import settings
+import uuid
 
 
-ph = PasswordHasher()
+ph = PasswordHasher(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+    parallelism=settings.ARGON2_PARALLELISM
+)
+
+# ----------------------------------------------------------------------
+# Argon2 worker pool
+# argon2-cffi releases the GIL while hashing, so a small thread pool keeps
+# the event loop free. The semaphore caps concurrent hashes at the pool
+# size; callers beyond PASSWORD_HASH_MAX_QUEUE are shed with a 503 instead
+# of piling up. PASSWORD_HASH_WORKERS=0 hashes inline on the event loop.
+# ----------------------------------------------------------------------
+_hash_executor = (
+    ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+    if settings.PASSWORD_HASH_WORKERS > 0 else None
+)
+_hash_slots = asyncio.Semaphore(max(settings.PASSWORD_HASH_WORKERS, 1))
+
+password_pool_stats = {
+    "workers": settings.PASSWORD_HASH_WORKERS,
+    "in_flight": 0,
+    "queued": 0,
+    "max_queued": 0,
+    "completed": 0,
+    "rejected": 0,
+}
+
+
+async def _run_in_hash_pool(fn, *args):
+    if _hash_executor is None:
+        return fn(*args)
+
+    stats = password_pool_stats
+    if stats["queued"] >= settings.PASSWORD_HASH_MAX_QUEUE:
+        stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    stats["queued"] += 1
+    stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+    try:
+        await _hash_slots.acquire()
+    finally:
+        stats["queued"] -= 1
+
+    stats["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        stats["in_flight"] -= 1
+        stats["completed"] += 1
+        _hash_slots.release()
+
+
+def shutdown_password_pool():
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+
 
 async def hash_password(password: str) -> str:
     """
     Hashes the plain password with Argon2-Cffi
     """
-    return ph.hash(password)
+    return await _run_in_hash_pool(ph.hash, password)
+
+
+_dummy_hash = None
+
+async def get_dummy_hash() -> str:
+    """
+    Hash of a throwaway password, verified against when the email is unknown.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password(uuid.uuid4().hex)
+    return _dummy_hash
 
 
 async def verify_password(hashed_password: str, plain_password: str) -> bool:
@@ -21,7 +97,9 @@ async def verify_password(hashed_password: str, plain_password: str) -> bool:
     Raises HTTPException if verification fails.
     """
     try:
-        return ph.verify(hashed_password, plain_password)
+        return await _run_in_hash_pool(ph.verify, hashed_password, plain_password)
+    except HTTPException:
+        raise
     except argon2_exceptions.VerifyMismatchError:
         return False
     except Exception as e:
@@ -32,5 +110,5 @@ async def verify_password(hashed_password: str, plain_password: str) -> bool:
 async def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.now(DATETIME.timezone.utc) + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.TOKENALGORITHM)
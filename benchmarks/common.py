@@ -0,0 +1,54 @@
+# app/benchmarks/common.py
+"""
+Shared setup for the in-process benchmarks.
+
+Run from the directory that contains the `app` package, e.g.
+    python -m app.benchmarks.login_storm
+"""
+import os
+import tempfile
+
+
+def boot(**env):
+    """
+    Point the app at a throwaway SQLite file and an in-memory Redis
+    stand-in (fakeredis). Must run before anything under `app` is imported.
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="apimonitor-bench-"), "bench.db")
+    defaults = {
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "TOKENALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+        "DEBUG": "false",
+        "REDIS_HOST": "localhost",
+        "REDIS_PORT": "6379",
+        "REDIS_URL": "redis://localhost:6379/0",
+    }
+    defaults.update(env)
+    for key, value in defaults.items():
+        os.environ.setdefault(key, str(value))
+
+    if os.environ.get("BENCH_REAL_REDIS") != "1":
+        import fakeredis
+        from app.core import redis as core_redis
+        server = fakeredis.FakeServer()
+        core_redis.redis_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        core_redis.redis_bytes_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=False)
+
+
+async def create_schema():
+    from app.database import engine, Base
+    import app.main  # noqa: F401  (registers every model)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,213 @@
+# app/benchmarks/gateway.py
+"""
+Full gateway-path benchmark: API key lookup, rate limit, analytics counters
+and usage logging on the /internal/* endpoints, in-process against SQLite
+and fakeredis (set BENCH_REAL_REDIS=1 to use REDIS_URL instead).
+
+    python -m app.benchmarks.gateway --save baseline
+    python -m app.benchmarks.gateway --compare app/benchmarks/results/baseline.json
+
+Each (endpoint, concurrency) cell reports throughput, p50/p99 latency, DB
+queries per request, Redis commands per request and a per-status breakdown.
+gateway_errors counts every non-2xx answer, so shed (503) or failed
+requests cannot pass for fast successes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+ENDPOINTS = {
+    "ping": ("GET", "/internal/ping"),
+    "users": ("GET", "/internal/users"),
+    "process": ("POST", "/internal/process"),
+    "flaky": ("GET", "/internal/flaky"),
+}
+
+
+class Counters:
+    def __init__(self):
+        self.db_queries = 0
+        self.redis_commands = 0
+
+
+def instrument(counters: Counters):
+    from sqlalchemy import event
+    from redis.asyncio.client import Redis, Pipeline
+    from app.database import engine
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(*args):
+        counters.db_queries += 1
+
+    execute_command = Redis.execute_command
+    pipeline_execute = Pipeline.execute
+
+    async def counted_execute_command(self, *args, **kwargs):
+        counters.redis_commands += 1
+        return await execute_command(self, *args, **kwargs)
+
+    async def counted_pipeline_execute(self, *args, **kwargs):
+        counters.redis_commands += len(self.command_stack)
+        return await pipeline_execute(self, *args, **kwargs)
+
+    Redis.execute_command = counted_execute_command
+    Pipeline.execute = counted_pipeline_execute
+
+
+async def seed() -> str:
+    from app.database import SessionLocal
+    from app.auth.models import Role, User
+    from app.api import models
+    from app.core.api_key_hashing import hash_api_key, api_key_prefix
+
+    key_value = "bench-" + os.urandom(16).hex()
+    async with SessionLocal() as db:
+        db.add_all([Role(id=1, name="admin"), Role(id=2, name="user")])
+        db.add(User(id=1, role_id=2, username="bench", email="bench@example.com", password="x"))
+        db.add(models.API(id=1, name="internal", endpoint="http://localhost/internal", method="GET"))
+        db.add(models.Tier(id=1, name="bench"))
+        # Effectively unlimited: the benchmark measures overhead, not rejections
+        db.add(models.RateLimitRules(tier_id=1, requests_per_minute=10 ** 9))
+        db.add(models.APIKey(
+            id=1, user_id=1, api_id=1, tier_id=1,
+            key_hash=hash_api_key(key_value), key_prefix=api_key_prefix(key_value)
+        ))
+        await db.commit()
+    return key_value
+
+
+async def run_cell(client, counters, key_value, endpoint, concurrency, requests):
+    from app.benchmarks.common import percentile
+
+    method, path = ENDPOINTS[endpoint]
+    headers = {"X-API-KEY": key_value}
+    latencies = []
+    statuses = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    db_before, redis_before = counters.db_queries, counters.redis_commands
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "gateway_errors": sum(count for code, count in statuses.items() if not 200 <= code < 300),
+        "status_codes": {str(code): statuses[code] for code in sorted(statuses)},
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "db_queries_per_request": round((counters.db_queries - db_before) / len(latencies), 2),
+        "redis_commands_per_request": round((counters.redis_commands - redis_before) / len(latencies), 2),
+    }
+
+
+async def run(endpoints, concurrency_levels, requests):
+    from app.benchmarks.common import boot, create_schema
+    boot()
+    await create_schema()
+
+    import httpx
+    from app.main import app
+
+    counters = Counters()
+    key_value = await seed()
+    instrument(counters)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm the key cache and connection pools
+        await client.get("/internal/ping", headers={"X-API-KEY": key_value})
+
+        for endpoint in endpoints:
+            for concurrency in concurrency_levels:
+                results.append(await run_cell(client, counters, key_value, endpoint, concurrency, requests))
+                print(json.dumps(results[-1]))
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__), capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(baseline_path: str, results: list):
+    with open(baseline_path) as f:
+        baseline = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    metrics = ("gateway_errors", "throughput_rps", "p50_ms", "p99_ms", "db_queries_per_request", "redis_commands_per_request")
+    print(f"\n{'cell':<16}" + "".join(f"{m:>30}" for m in metrics))
+    for result in results:
+        cell = (result["endpoint"], result["concurrency"])
+        before = baseline.get(cell)
+        if not before:
+            continue
+        row = f"{cell[0]}@{cell[1]:<10}"
+        for metric in metrics:
+            old, new = before[metric], result[metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            row += f"{f'{old} → {new} ({change})':>30}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="ping,users,process,flaky")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="requests per cell")
+    parser.add_argument("--save", metavar="NAME", help="write results to results/NAME.json")
+    parser.add_argument("--compare", metavar="PATH", help="diff against a saved baseline")
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    concurrency_levels = [int(c) for c in args.concurrency.split(",") if c]
+    results = asyncio.run(run(endpoints, concurrency_levels, args.requests))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "created_at": datetime.utcnow().isoformat(),
+            "requests_per_cell": args.requests,
+        },
+        "results": results,
+    }
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {path}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
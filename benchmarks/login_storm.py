@@ -0,0 +1,96 @@
+# app/benchmarks/login_storm.py
+"""
+/internal/ping latency while /auth/login is being hammered.
+
+Runs the app in-process twice, once hashing inline on the event loop
+(PASSWORD_HASH_WORKERS=0, the old behaviour) and once on the Argon2
+worker pool, and prints ping p50/p99 for both:
+
+    python -m app.benchmarks.login_storm --logins 16 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+async def run(logins: int, duration: float):
+    from app.benchmarks.common import boot, create_schema, percentile
+    boot()
+    await create_schema()
+
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register", json={
+            "username": "storm", "email": "storm@example.com", "password": "storm-password"
+        })
+
+        deadline = time.perf_counter() + duration
+        login_count = 0
+        ping_ms = []
+
+        async def login_loop():
+            nonlocal login_count
+            while time.perf_counter() < deadline:
+                await client.post("/auth/login", data={
+                    "username": "storm@example.com", "password": "storm-password"
+                })
+                login_count += 1
+
+        async def ping_loop():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                # Bypass the gateway so only event-loop responsiveness is measured
+                await client.get("/internal/ping", headers={"X-STRESS-TEST": "true"})
+                ping_ms.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(ping_loop(), *(login_loop() for _ in range(logins)))
+
+    return {
+        "password_hash_workers": int(os.environ["PASSWORD_HASH_WORKERS"]),
+        "logins": login_count,
+        "logins_per_s": round(login_count / duration, 1),
+        "pings": len(ping_ms),
+        "ping_p50_ms": round(percentile(ping_ms, 0.50), 2),
+        "ping_p99_ms": round(percentile(ping_ms, 0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login loops")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--workers", type=int, default=4, help="pool size for the 'after' run")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(run(args.logins, args.duration))))
+        return
+
+    results = []
+    for workers in (0, args.workers):
+        env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers))
+        output = subprocess.run(
+            [sys.executable, "-m", "app.benchmarks.login_storm", "--single",
+             "--logins", str(args.logins), "--duration", str(args.duration)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<10}{'logins/s':>10}{'ping p50':>12}{'ping p99':>12}")
+    for label, result in zip(("inline", "pool"), results):
+        print(
+            f"{label:<10}{result['logins_per_s']:>10}"
+            f"{result['ping_p50_ms']:>10}ms{result['ping_p99_ms']:>10}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
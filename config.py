@@ -13,6 +13,128 @@ class Settings(BaseSettings):
     REDIS_PORT: int
     REDIS_URL: str
 
+    # usage_logs partitioning / retention
+    USAGE_LOG_PARTITION_INTERVAL: str = "day"  # "day" or "month"
+    USAGE_LOG_PARTITIONS_AHEAD: int = 7
+    USAGE_LOG_RETENTION_DAYS: int = 90
+
+    # usage_logs columnar archive
+    USAGE_ARCHIVE_DIR: str = "archive/usage_logs"
+    USAGE_ARCHIVE_CHUNK_SIZE: int = 10000
+
+    # background jobs
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 6 * 3600
+    REVOCATION_PURGE_INTERVAL_SECONDS: int = 3600
+    # Reloads revocations Redis may have evicted; keep it below the token lifetime
+    REVOCATION_RESYNC_INTERVAL_SECONDS: int = 600
+
+    # authenticated principal cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 50000
+
+    # password hashing (argon2-cffi defaults)
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST_KIB: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # login throttling
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 300
+    LOGIN_MAX_FAILURES_PER_EMAIL: int = 5
+    LOGIN_MAX_FAILURES_PER_IP: int = 20
+    LOGIN_BACKOFF_BASE_SECONDS: int = 30
+    LOGIN_BACKOFF_MAX_SECONDS: int = 3600
+    LOGIN_STRIKES_TTL_SECONDS: int = 86400
+
+    # API keys
+    API_KEY_FORMAT: str = "random"  # "random" or "signed"
+    API_KEY_SIGNING_SECRET: Optional[str] = None  # defaults to SECRET_KEY
+    API_KEY_HASH_SECRET: Optional[str] = None  # defaults to SECRET_KEY
+    API_KEY_CACHE_TTL_SECONDS: int = 30
+    API_KEY_CACHE_MAX_ENTRIES: int = 100000
+
+    # gateway tracing (always on when DEBUG, which also adds Server-Timing)
+    GATEWAY_TRACING: bool = False
+    OTEL_EXPORT_ENABLED: bool = False
+    OTEL_EXPORTER_ENDPOINT: str = "http://localhost:4317"
+
+    # /metrics
+    METRICS_PUBLISH_INTERVAL_SECONDS: int = 5
+
+    # /gateway reverse proxy (API.timeout_seconds overrides the timeout)
+    UPSTREAM_TIMEOUT_SECONDS: float = 30.0
+    UPSTREAM_HTTP2: bool = True  # needs the h2 package
+    UPSTREAM_MAX_CONNECTIONS: int = 200
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    UPSTREAM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # proxied GET response cache (enabled per API via cache_ttl_seconds)
+    RESPONSE_CACHE_BACKEND: str = "local"  # "local" or "redis"
+    RESPONSE_CACHE_LOCAL_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_OBJECT_BYTES: int = 1024 * 1024
+
+    # adaptive per-API concurrency limits (gateway load shedding)
+    CONCURRENCY_INITIAL_LIMIT: int = 20
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 500  # per worker
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.5
+    CONCURRENCY_BACKOFF: float = 0.9
+    CONCURRENCY_RTT_WINDOW_SECONDS: float = 30.0
+    CONCURRENCY_SHED_HEADROOM: float = 0.25  # share of the limit reserved above priority 0
+    CONCURRENCY_TOP_PRIORITY: int = 2  # tiers at or above this may use the full limit
+    CONCURRENCY_SYNC_INTERVAL_SECONDS: float = 0.5
+
+    # active health probing and SLOs (API columns override the defaults)
+    PROBE_ENABLED: bool = True
+    PROBE_DEFAULT_INTERVAL_SECONDS: int = 60
+    PROBE_JITTER: float = 0.1  # +/- fraction of the interval
+    PROBE_MAX_PER_SECOND: float = 20.0
+    PROBE_MAX_CONCURRENCY: int = 50
+    PROBE_TIMEOUT_SECONDS: float = 10.0
+    PROBE_RING_SIZE: int = 1440  # samples kept per API
+    PROBE_SUMMARY_WINDOW_SECONDS: int = 300
+    PROBE_ROLLUP_INTERVAL_SECONDS: int = 60
+    PROBE_TARGET_REFRESH_SECONDS: int = 60
+    PROBE_LEADER_TTL_SECONDS: int = 15
+    SLO_DEFAULT_LATENCY_MS: int = 1000
+    SLO_DEFAULT_TARGET: float = 0.99
+
+    # anomaly detection on closed analytics windows (needs numpy)
+    ANOMALY_DETECTION_ENABLED: bool = True
+    ANOMALY_EWMA_ALPHA: float = 0.1
+    ANOMALY_Z_THRESHOLD: float = 4.0
+    ANOMALY_WARMUP_WINDOWS: int = 10  # windows a series needs before it can alert
+    ANOMALY_MIN_REQUESTS: int = 20  # quieter windows neither alert nor train
+    ANOMALY_MIN_ERROR_RATE_DELTA: float = 0.05
+    ANOMALY_MIN_P95_DELTA_MS: float = 100.0
+    ANOMALY_MIN_RATE_LIMITED_DELTA: float = 0.05
+
+    # monthly quotas / usage ledger (app/core/quota_ledger.py)
+    QUOTA_CHECKPOINT_INTERVAL_SECONDS: int = 60
+    QUOTA_LEDGER_BATCH_SIZE: int = 1000
+
+    # top-K heavy hitters per API (keys, users, endpoints)
+    TOPK_WINDOW_SECONDS: int = 60
+    TOPK_CAPACITY: int = 200  # members kept per API, dimension and window
+    TOPK_LOCAL_CAPACITY: int = 2000  # per worker between flushes
+    TOPK_FLUSH_INTERVAL_SECONDS: float = 2.0
+    TOPK_RETENTION_WINDOWS: int = 60
+
+    # live analytics stream (/analytics/live, one Redis poller per worker)
+    LIVE_ANALYTICS_INTERVAL_SECONDS: float = 1.0
+    LIVE_ANALYTICS_HEARTBEAT_SECONDS: float = 15.0
+    LIVE_ANALYTICS_QUEUE_SIZE: int = 32  # pending events per subscriber before a resync
+
+    # stress runs (locust subprocesses, per API worker)
+    STRESS_MAX_CONCURRENT_RUNS: int = 1
+    STRESS_MAX_TOTAL_USERS: int = 1000
+    STRESS_MAX_QUEUED_RUNS: int = 10
+    STRESS_MAX_PROCESSES: int = 4  # cap for locust --processes
+    STRESS_KILL_GRACE_SECONDS: int = 10
+    STRESS_FINISHED_RUNS_KEPT: int = 50
+    # X-STRESS-TOKEN required for X-STRESS-TEST: gateway; defaults to a key derived from SECRET_KEY
+    STRESS_GATEWAY_SECRET: Optional[str] = None
 
     class Config:
         env_file = ".env"
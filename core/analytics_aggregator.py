@@ -3,6 +3,8 @@ from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.redis import redis_client
+from app.core.analytics_counter import COUNTER_TTL_SECONDS, window_index_key
+from app.core.anomaly_detection import series_metrics, detect_anomalies, save_state
 from app.api import models
 
 
@@ -17,19 +19,37 @@ def parse_window(window: str):
 
 async def aggregate_analytics(db: AsyncSession):
     """
-    Pull analytics counters from Redis and persist to MySQL
+    Pull analytics counters of closed windows from Redis, persist them to
+    MySQL and score them for anomalies
     """
-    keys = await redis_client.keys("analytics:*")
+    # Counters live COUNTER_TTL_SECONDS, so only that many windows can
+    # hold data; their index sets replace a KEYS scan of the keyspace.
+    # The current minute is still being written and is left for next time.
+    now = datetime.utcnow()
+    windows = [
+        (now - timedelta(minutes=minutes)).strftime("%Y%m%d%H%M")
+        for minutes in range(1, COUNTER_TTL_SECONDS // 60 + 1)
+    ]
 
+    pipe = redis_client.pipeline()
+    for window in windows:
+        pipe.smembers(window_index_key(window))
+    indexed = await pipe.execute()
+
+    keys = [key for members in indexed for key in members]
+    pipe = redis_client.pipeline()
     for key in keys:
-        # analytics:{api_id}:{api_key_id}:{window}
-        parts = key.split(":")
-        if len(parts) != 4:
-            continue
+        pipe.hgetall(key)
+    counters = await pipe.execute() if keys else []
+
+    # window_start → (api_id, api_key_id, requests, metrics) for detection
+    series = {}
+    summaries = 0
 
-        _, api_id, api_key_id, window = parts
+    for key, data in zip(keys, counters):
+        # analytics:{api_id}:{api_key_id}:{window}
+        _, api_id, api_key_id, window = key.split(":")
 
-        data = await redis_client.hgetall(key)
         if not data:
             continue
 
@@ -41,6 +61,8 @@ async def aggregate_analytics(db: AsyncSession):
         rate_limit_exceeded = int(data.get("rate_limit_exceeded", 0))
         total_latency = int(data.get("total_latency_ms", 0))
         max_latency = int(data.get("max_latency_ms", 0))
+        cache_hits = int(data.get("cache_hits", 0))
+        cache_misses = int(data.get("cache_misses", 0))
 
         avg_latency = (
             int(total_latency / request_count)
@@ -57,12 +79,32 @@ async def aggregate_analytics(db: AsyncSession):
             error_count=error_count,
             rate_limit_exceeded_count=rate_limit_exceeded,
             avg_response_time_ms=avg_latency,
-            max_response_time_ms=max_latency
+            max_response_time_ms=max_latency,
+            cache_hit_count=cache_hits,
+            cache_miss_count=cache_misses
         )
 
         db.add(summary)
+        summaries += 1
+
+        requests, metrics = series_metrics(data)
+        series.setdefault(window_start, []).append((int(api_id), int(api_key_id), requests, metrics))
 
         # Remove Redis key after aggregation
-        await redis_client.delete(key)
+        pipe.delete(key)
+        pipe.srem(window_index_key(window), key)
+
+    try:
+        alerts, state = await detect_anomalies(series)
+    except Exception as e:
+        # Detection must never cost the aggregated counters
+        print("Anomaly detection failed:", e)
+        alerts, state = [], None
+    db.add_all(alerts)
 
     await db.commit()
+    await pipe.execute()
+    await save_state(state)
+    await redis_client.set("analytics:last_aggregated_at", datetime.utcnow().timestamp())
+
+    return {"windows": len(series), "summaries": summaries, "anomalies": len(alerts)}
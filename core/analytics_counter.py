@@ -1,22 +1,66 @@
 # app/core/analytics_counter.py
+from bisect import bisect_left
 from datetime import datetime
 from app.core.redis import redis_client
+from app.core.metrics import LATENCY_BUCKETS
+
+
+# Same bounds as the Prometheus latency histograms, in ms; field
+# lat:{i} counts requests in bucket i (the last one is +Inf)
+LATENCY_BUCKETS_MS = tuple(int(bound * 1000) for bound in LATENCY_BUCKETS)
+
+COUNTER_TTL_SECONDS = 300
 
 
 def get_time_window():
     return datetime.utcnow().strftime("%Y%m%d%H%M")
 
 
+def window_index_key(window: str, namespace: str = ""):
+    """
+    Set of the counter hashes written in a window, so readers never
+    have to scan the keyspace.
+    """
+    return f"{namespace}analytics:index:{window}"
+
+
+def latency_percentile(data: dict, fraction: float):
+    """
+    Percentile (ms) from a counter hash's histogram, interpolated linearly
+    within the bucket; None without samples.
+    """
+    counts = [int(data.get(f"lat:{i}", 0)) for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+    total = sum(counts)
+    if not total:
+        return None
+    # The observed max bounds every percentile, including the +Inf bucket
+    observed_max = int(data.get("max_latency_ms", 0)) or None
+    rank = fraction * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = LATENCY_BUCKETS_MS[i - 1] if i else 0
+            upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else observed_max or lower
+            if observed_max is not None:
+                upper = min(upper, observed_max)
+            return int(lower + max(upper - lower, 0) * (rank - seen) / count)
+        seen += count
+    return observed_max or 0
+
+
 async def increment_request_counters(
     *,
     api_id: int,
     api_key_id: int,
     status_code: int,
     response_time_ms: int,
-    rate_limited: bool = False
+    rate_limited: bool = False,
+    cache_status: str | None = None,
+    namespace: str = ""
 ):
     window = get_time_window()
-    redis_key = f"analytics:{api_id}:{api_key_id}:{window}"
+    redis_key = f"{namespace}analytics:{api_id}:{api_key_id}:{window}"
+    index_key = window_index_key(window, namespace)
 
     pipe = redis_client.pipeline()
 
@@ -33,15 +77,25 @@ async def increment_request_counters(
     if rate_limited:
         pipe.hincrby(redis_key, "rate_limit_exceeded", 1)
 
+    # response cache (proxied GETs only; a stale serve counts as a hit)
+    if cache_status == "miss":
+        pipe.hincrby(redis_key, "cache_misses", 1)
+    elif cache_status:
+        pipe.hincrby(redis_key, "cache_hits", 1)
+
     # latency stats
     pipe.hincrby(redis_key, "total_latency_ms", response_time_ms)
+    pipe.hincrby(redis_key, f"lat:{bisect_left(LATENCY_BUCKETS_MS, response_time_ms)}", 1)
 
-    # max latency (manual compare)  
+    # max latency (manual compare)
     current_max = await redis_client.hget(redis_key, "max_latency_ms")
     if not current_max or response_time_ms > int(current_max):
         pipe.hset(redis_key, "max_latency_ms", response_time_ms)
 
     # TTL (5 minutes)
-    pipe.expire(redis_key, 300)
+    pipe.expire(redis_key, COUNTER_TTL_SECONDS)
+
+    pipe.sadd(index_key, redis_key)
+    pipe.expire(index_key, COUNTER_TTL_SECONDS)
 
     await pipe.execute()
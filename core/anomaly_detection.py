@@ -0,0 +1,142 @@
+# app/core/anomaly_detection.py
+"""
+Anomaly detection over closed per-minute analytics windows.
+
+Every (api_id, api_key_id) series keeps an EWMA mean and variance of
+three metrics: non-429 error rate, p95 latency and rate-limited share.
+A window is flagged when a metric exceeds its mean by ANOMALY_Z_THRESHOLD
+standard deviations *and* by the metric's absolute minimum delta (so a
+flat baseline does not alert on noise).
+
+All series of a window are scored in one vectorized NumPy step. State is
+a 26-byte record per series in one Redis hash, decoded and encoded as a
+single structured array.
+"""
+from app.api import models
+from app.config import settings
+from app.core import redis as core_redis
+from app.core.analytics_counter import latency_percentile
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+STATE_KEY = "anomaly:state"
+
+METRICS = ("error_rate", "p95_latency_ms", "rate_limited_rate")
+
+if np is not None:
+    # windows seen, then EWMA mean / variance per metric
+    STATE_DTYPE = np.dtype([("count", ">u2"), ("mean", ">f4", (3,)), ("var", ">f4", (3,))])
+
+
+def series_metrics(data: dict):
+    """
+    (requests, (error_rate, p95_latency_ms, rate_limited_rate)) of one
+    counter hash; p95 is None for counters without a histogram.
+    """
+    requests = int(data.get("requests", 0))
+    if not requests:
+        return 0, (0.0, None, 0.0)
+    rate_limited = int(data.get("rate_limit_exceeded", 0))
+    # Rejections are reported on their own, not as errors
+    errors = int(data.get("errors", 0)) - rate_limited
+    return requests, (errors / requests, latency_percentile(data, 0.95), rate_limited / requests)
+
+
+def _min_deltas():
+    return np.array([
+        settings.ANOMALY_MIN_ERROR_RATE_DELTA,
+        settings.ANOMALY_MIN_P95_DELTA_MS,
+        settings.ANOMALY_MIN_RATE_LIMITED_DELTA,
+    ])
+
+
+async def detect_anomalies(windows: dict):
+    """
+    windows: window_start → list of (api_id, api_key_id, requests, metrics).
+
+    Returns (alerts, state); the caller adds the alerts to its session and
+    passes state to save_state() once they are committed.
+    """
+    if np is None or not settings.ANOMALY_DETECTION_ENABLED or not windows:
+        return [], None
+
+    fields = sorted({f"{api_id}:{key_id}" for rows in windows.values() for api_id, key_id, _, _ in rows})
+    position = {field: i for i, field in enumerate(fields)}
+
+    stored = await core_redis.redis_bytes_client.hmget(STATE_KEY, fields)
+    empty = bytes(STATE_DTYPE.itemsize)
+    state = np.frombuffer(
+        b"".join(value if value and len(value) == STATE_DTYPE.itemsize else empty for value in stored),
+        dtype=STATE_DTYPE,
+    )
+    count = state["count"].astype(np.int64)
+    mean = state["mean"].astype(np.float64)
+    var = state["var"].astype(np.float64)
+
+    alpha = settings.ANOMALY_EWMA_ALPHA
+    threshold = settings.ANOMALY_Z_THRESHOLD
+    min_deltas = _min_deltas()
+    alerts = []
+
+    # Oldest first: each window trains the baseline the next one is scored on
+    for window_start in sorted(windows):
+        rows = windows[window_start]
+        index = np.fromiter((position[f"{api_id}:{key_id}"] for api_id, key_id, _, _ in rows), dtype=np.int64, count=len(rows))
+        requests = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+        values = np.array(
+            [[np.nan if value is None else value for value in row[3]] for row in rows],
+            dtype=np.float64,
+        ).reshape(len(rows), len(METRICS))
+
+        valid = ~np.isnan(values) & (requests >= settings.ANOMALY_MIN_REQUESTS)[:, None]
+        seen = count[index]
+        base_mean = mean[index]
+        base_var = var[index]
+
+        delta = np.where(valid, values - base_mean, 0.0)
+        # Flooring the deviation makes "score > threshold" also demand the
+        # minimum delta, and keeps scores finite on a flat baseline
+        score = delta / np.maximum(np.sqrt(base_var), min_deltas / threshold)
+        flagged = valid & (seen >= settings.ANOMALY_WARMUP_WINDOWS)[:, None] & (score > threshold)
+
+        for row, metric in zip(*np.nonzero(flagged)):
+            api_id, api_key_id, _, _ = rows[row]
+            alerts.append(models.AnomalyAlert(
+                api_id=int(api_id),
+                api_key_id=int(api_key_id),
+                window_start=window_start,
+                metric=METRICS[metric],
+                value=float(values[row, metric]),
+                baseline=float(base_mean[row, metric]),
+                score=round(float(score[row, metric]), 2),
+            ))
+
+        # EWMA update; the first observation of a metric seeds its mean
+        first = valid & (seen == 0)[:, None]
+        new_mean = np.where(first, values, base_mean + alpha * delta)
+        new_var = np.where(first, 0.0, (1 - alpha) * (base_var + alpha * delta * delta))
+        mean[index] = np.where(valid, new_mean, base_mean)
+        var[index] = np.where(valid, new_var, base_var)
+        count[index] = np.where(valid.any(axis=1), np.minimum(seen + 1, np.iinfo(np.uint16).max), seen)
+
+    updated = np.empty(len(fields), dtype=STATE_DTYPE)
+    updated["count"] = count
+    updated["mean"] = mean
+    updated["var"] = var
+    return alerts, (fields, updated)
+
+
+async def save_state(state):
+    if state is None:
+        return
+    fields, updated = state
+    raw = updated.tobytes()
+    size = STATE_DTYPE.itemsize
+    await core_redis.redis_bytes_client.hset(
+        STATE_KEY,
+        mapping={field: raw[i * size:(i + 1) * size] for i, field in enumerate(fields)},
+    )
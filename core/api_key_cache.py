@@ -0,0 +1,227 @@
+# app/core/api_key_cache.py
+import time
+from typing import NamedTuple
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import models
+from app.config import settings
+from app.core import cache_invalidation
+from app.core.api_key_hashing import hash_api_key, api_key_prefix
+
+
+class KeySnapshot(NamedTuple):
+    """
+    Everything the gateway needs about a key, detached from the session.
+    """
+    id: int
+    user_id: int
+    api_id: int
+    tier_id: int
+    api_enabled: bool
+    requests_per_minute: int
+    requests_per_month: int | None
+    quota_mode: str
+    tier_priority: int
+    api_name: str
+    api_endpoint: str
+    api_method: str
+    api_timeout_seconds: float | None
+    api_max_concurrency: int | None
+    api_cache_ttl_seconds: int | None
+    api_cache_stale_seconds: int | None
+    api_cache_vary_headers: tuple
+    api_cache_max_object_bytes: int | None
+
+
+# key_hash → (snapshot, expires_at). Only keys that exist are cached, so
+# flooding with random keys cannot grow it.
+_keys = {}
+
+# True while rows without key_hash exist (checked at startup, cleared by
+# backfill_api_key_hashes); while set, a hash miss falls back to the old raw
+# key_value lookup.
+_legacy_rows_remaining = True
+
+# Ids of revoked / deleted keys. Lets the gateway reject a revoked signed key
+# without a SQL lookup; kept small because only revocations land here.
+_revoked_ids = set()
+
+
+def is_revoked(key_id: int) -> bool:
+    return key_id in _revoked_ids
+
+
+def _snapshot(api_key: models.APIKey) -> KeySnapshot:
+    return KeySnapshot(
+        id=api_key.id,
+        user_id=api_key.user_id,
+        api_id=api_key.api_id,
+        tier_id=api_key.tier_id,
+        api_enabled=bool(api_key.api.enabled),
+        requests_per_minute=api_key.tier.rate_limit_rules.requests_per_minute,
+        requests_per_month=api_key.tier.rate_limit_rules.requests_per_month,
+        quota_mode=api_key.tier.rate_limit_rules.quota_mode or "hard",
+        tier_priority=api_key.tier.priority or 0,
+        api_name=api_key.api.name,
+        api_endpoint=api_key.api.endpoint,
+        api_method=api_key.api.method,
+        api_timeout_seconds=api_key.api.timeout_seconds,
+        api_max_concurrency=api_key.api.max_concurrency,
+        api_cache_ttl_seconds=api_key.api.cache_ttl_seconds,
+        api_cache_stale_seconds=api_key.api.cache_stale_seconds,
+        api_cache_vary_headers=tuple(
+            name.strip().lower()
+            for name in (api_key.api.cache_vary_headers or "").split(",")
+            if name.strip()
+        ),
+        api_cache_max_object_bytes=api_key.api.cache_max_object_bytes,
+    )
+
+
+async def _load_api_key(db: AsyncSession, condition):
+    result = await db.execute(
+        select(models.APIKey)
+        .options(
+            selectinload(models.APIKey.api),
+            selectinload(models.APIKey.tier)
+                .selectinload(models.Tier.rate_limit_rules)
+        )
+        .where(condition, models.APIKey.enabled == True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def resolve_api_key(db: AsyncSession, key_value: str) -> KeySnapshot | None:
+    key_hash = hash_api_key(key_value)
+
+    entry = _keys.get(key_hash)
+    now = time.monotonic()
+    if entry and entry[1] > now:
+        return entry[0]
+
+    api_key = await _load_api_key(db, models.APIKey.key_hash == key_hash)
+    if not api_key and _legacy_rows_remaining:
+        api_key = await _load_api_key(db, models.APIKey.key_value == key_value)
+
+    if not api_key:
+        _keys.pop(key_hash, None)
+        return None
+
+    snapshot = _snapshot(api_key)
+    if len(_keys) >= settings.API_KEY_CACHE_MAX_ENTRIES:
+        _keys.clear()
+    _keys[key_hash] = (snapshot, now + settings.API_KEY_CACHE_TTL_SECONDS)
+    return snapshot
+
+
+async def load_legacy_key_state(db: AsyncSession):
+    global _legacy_rows_remaining
+
+    result = await db.execute(
+        select(models.APIKey.id)
+        .where(models.APIKey.key_hash.is_(None), models.APIKey.key_value.is_not(None))
+        .limit(1)
+    )
+    _legacy_rows_remaining = result.first() is not None
+
+
+async def backfill_api_key_hashes(db: AsyncSession, drop_raw_keys: bool = False, batch_size: int = 500):
+    """
+    Migration for rows created before hashed storage: fill key_hash and
+    key_prefix from key_value. The raw secrets are kept (lookups fall back
+    to them) until an operator confirms with drop_raw_keys, which clears
+    key_value on every row that already has its hash.
+    """
+    global _legacy_rows_remaining
+
+    hashed = 0
+    while True:
+        result = await db.execute(
+            select(models.APIKey.id, models.APIKey.key_value)
+            .where(models.APIKey.key_hash.is_(None), models.APIKey.key_value.is_not(None))
+            .limit(batch_size)
+        )
+        rows = result.all()
+        for key_id, key_value in rows:
+            await db.execute(
+                update(models.APIKey)
+                .where(models.APIKey.id == key_id)
+                .values(
+                    key_hash=hash_api_key(key_value),
+                    key_prefix=api_key_prefix(key_value)
+                )
+            )
+        await db.commit()
+        hashed += len(rows)
+
+        if len(rows) < batch_size:
+            break
+
+    _legacy_rows_remaining = False
+
+    dropped = 0
+    if drop_raw_keys:
+        result = await db.execute(
+            update(models.APIKey)
+            .where(models.APIKey.key_hash.is_not(None), models.APIKey.key_value.is_not(None))
+            .values(key_value=None)
+        )
+        await db.commit()
+        dropped = result.rowcount
+
+    return {"hashed": hashed, "raw_keys_dropped": dropped}
+
+
+async def load_revoked_keys(db: AsyncSession):
+    result = await db.execute(
+        select(models.APIKey.id).where(models.APIKey.enabled == False)
+    )
+    _revoked_ids.update(result.scalars().all())
+
+
+# -------------------------
+# Invalidation
+# -------------------------
+def _evict_where(predicate):
+    for key_value in [k for k, (snapshot, _) in _keys.items() if predicate(snapshot)]:
+        _keys.pop(key_value, None)
+
+
+def _evict_keys(key_ids):
+    ids = set(key_ids)
+    _evict_where(lambda snapshot: snapshot.id in ids)
+
+
+def _revoke_keys(key_ids):
+    _revoked_ids.update(key_ids)
+    _evict_keys(key_ids)
+
+
+def _evict_apis(api_ids):
+    ids = set(api_ids)
+    _evict_where(lambda snapshot: snapshot.api_id in ids)
+
+
+def _evict_tiers(tier_ids):
+    ids = set(tier_ids)
+    _evict_where(lambda snapshot: snapshot.tier_id in ids)
+
+
+async def revoke_keys(key_ids):
+    await cache_invalidation.publish("api_key_revoked", key_ids)
+
+
+async def invalidate_apis(api_ids):
+    await cache_invalidation.publish("api", api_ids)
+
+
+async def invalidate_tiers(tier_ids):
+    await cache_invalidation.publish("tier", tier_ids)
+
+
+cache_invalidation.register("api_key_revoked", _revoke_keys)
+cache_invalidation.register("api", _evict_apis)
+cache_invalidation.register("tier", _evict_tiers)
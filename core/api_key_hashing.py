@@ -0,0 +1,40 @@
+# app/core/api_key_hashing.py
+import hashlib
+import hmac
+
+from app.config import settings
+from app.core.api_key_signing import PREFIX as SIGNED_PREFIX, is_signed_key
+
+
+PREFIX_LENGTH = 8
+
+
+def _hash_key() -> bytes:
+    secret = settings.API_KEY_HASH_SECRET or settings.SECRET_KEY
+    return hashlib.sha256(b"api-key-hash:" + secret.encode("utf-8")).digest()
+
+
+_KEY = _hash_key()
+
+
+def hash_api_key(value: str) -> bytes:
+    """
+    HMAC-SHA256 of the raw key: the fixed 32-byte value stored and indexed
+    in api_keys.key_hash. Keyed, so a leaked table can't be brute-forced
+    offline without the secret.
+    """
+    return hmac.new(_KEY, value.encode("utf-8"), hashlib.sha256).digest()
+
+
+def api_key_prefix(value: str) -> str:
+    """
+    Non-secret characters kept so users can tell keys apart: the leading
+    ones, or for signed keys "ak1_" plus four MAC characters, since their
+    leading ones encode the version and the key id's high zero bytes and
+    are the same for every key. The last character is skipped: it only
+    carries padding bits.
+    """
+    if is_signed_key(value):
+        tail = PREFIX_LENGTH - len(SIGNED_PREFIX)
+        return SIGNED_PREFIX + value[-tail - 1:-1]
+    return value[:PREFIX_LENGTH]
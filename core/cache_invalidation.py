@@ -0,0 +1,56 @@
+# app/core/cache_invalidation.py
+import asyncio
+import json
+from app.core.redis import redis_client
+
+
+CHANNEL = "cache:invalidate"
+
+# kind → [handler(ids)] for every in-process cache that must stay coherent
+# across uvicorn workers
+_handlers = {}
+
+
+def register(kind: str, handler):
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def _apply(kind: str, ids: list):
+    for handler in _handlers.get(kind, ()):
+        handler(ids)
+
+
+async def publish(kind: str, ids):
+    """
+    Invalidate `ids` in this worker immediately and in every other worker
+    through one Redis publish.
+    """
+    ids = list(ids)
+    _apply(kind, ids)
+    try:
+        await redis_client.publish(CHANNEL, json.dumps({"kind": kind, "ids": ids}))
+    except Exception as e:
+        # Other workers still converge once their cache TTL runs out
+        print("Cache invalidation publish failed:", e)
+
+
+async def listen():
+    """
+    Per-worker subscriber, started from the app lifespan.
+    """
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                payload = json.loads(message["data"])
+                _apply(payload["kind"], payload["ids"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Cache invalidation listener error:", e)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
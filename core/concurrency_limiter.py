@@ -0,0 +1,253 @@
+# app/core/concurrency_limiter.py
+"""
+Per-API in-flight limits for the gateway.
+
+Each worker keeps an adaptive limit per API (AIMD on latency): while the
+smoothed latency stays near the best recently observed one the limit grows
+by ~1 per round trip; once it exceeds CONCURRENCY_LATENCY_TOLERANCE x that
+baseline, or the upstream fails, the limit is cut by CONCURRENCY_BACKOFF.
+Latency baselines are kept per (method, path), so a slow endpoint is never
+compared with a fast one of the same API, and the limit is only cut while
+it is at least half in use: a cut below twice the current concurrency would
+shed traffic the upstream is coping with.
+APIs with max_concurrency set are also capped cluster-wide: every worker
+publishes its in-flight counts to Redis each CONCURRENCY_SYNC_INTERVAL_SECONDS
+and admission checks against the others' last published total, so the
+request path never waits on Redis.
+
+Lower tier priorities may only use part of either limit, so they are shed
+first and the remaining headroom keeps latency bounded for higher tiers.
+
+"gateway" stress runs get their own limits and cluster counts (keyed by
+namespace), so synthetic load can neither shrink a production limit nor
+take production slots.
+"""
+import asyncio
+import os
+import time
+
+from app.config import settings
+from app.core.redis import redis_client
+
+
+REDIS_KEY_PREFIX = "concurrency:"
+
+# EWMA weight of each new latency sample
+RTT_SMOOTHING = 0.1
+
+
+# Per-API cap on distinct (method, path) baselines; further paths share one
+MAX_ROUTES = 64
+OTHER_ROUTES = "*"
+
+
+class RouteLatency:
+    __slots__ = ("min_rtt", "smoothed_rtt", "window_min", "window_started")
+
+    def __init__(self, rtt: float, now: float):
+        self.min_rtt = self.smoothed_rtt = rtt
+        self.window_min = None
+        self.window_started = now
+
+    def on_sample(self, rtt: float, now: float):
+        # Baseline = minimum latency of the previous window, so it follows
+        # the upstream when its unloaded latency drifts
+        if self.window_min is None or rtt < self.window_min:
+            self.window_min = rtt
+        # Smoothing keeps per-request jitter from reading as congestion
+        self.smoothed_rtt += (rtt - self.smoothed_rtt) * RTT_SMOOTHING
+        if now - self.window_started >= settings.CONCURRENCY_RTT_WINDOW_SECONDS:
+            self.min_rtt = self.window_min
+            self.window_min = None
+            self.window_started = now
+
+    @property
+    def congested(self) -> bool:
+        return self.smoothed_rtt > self.min_rtt * settings.CONCURRENCY_LATENCY_TOLERANCE
+
+
+class AdaptiveLimit:
+    __slots__ = (
+        "namespace", "api_id", "limit", "in_flight", "cluster_cap",
+        "routes", "last_decrease",
+    )
+
+    def __init__(self, namespace: str, api_id: int):
+        self.namespace = namespace
+        self.api_id = api_id
+        self.limit = float(settings.CONCURRENCY_INITIAL_LIMIT)
+        self.in_flight = 0
+        self.cluster_cap = None
+        # "METHOD /path" → RouteLatency
+        self.routes = {}
+        self.last_decrease = 0.0
+
+    @property
+    def min_rtt(self) -> float | None:
+        # Slowest route's baseline: used where one figure stands for the API
+        if not self.routes:
+            return None
+        return max(route.min_rtt for route in self.routes.values())
+
+    def on_sample(self, route: str, rtt: float, failed: bool, now: float):
+        if route not in self.routes and len(self.routes) >= MAX_ROUTES:
+            route = OTHER_ROUTES
+        latency = self.routes.get(route)
+        if latency is None:
+            latency = self.routes[route] = RouteLatency(rtt, now)
+        else:
+            latency.on_sample(rtt, now)
+
+        # Below half the limit, cutting it changes nothing about the load
+        # and only sets up the next burst to be shed
+        in_use = self.in_flight + 1 >= self.limit / 2
+        if failed or latency.congested:
+            # At most one cut per round trip: one congestion event, not one per request
+            if in_use and now - self.last_decrease >= latency.min_rtt:
+                self.limit = max(settings.CONCURRENCY_MIN_LIMIT, self.limit * settings.CONCURRENCY_BACKOFF)
+                self.last_decrease = now
+        elif in_use:
+            # Only grow when the limit is actually being used
+            self.limit = min(settings.CONCURRENCY_MAX_LIMIT, self.limit + 1 / self.limit)
+
+
+# (namespace, api_id) → AdaptiveLimit
+_limits = {}
+
+# (namespace, api_id) → in-flight total of the other workers, as last published
+_others = {}
+
+
+def _share(priority: int) -> float:
+    """
+    Fraction of a limit a tier may fill: 1 - CONCURRENCY_SHED_HEADROOM for
+    priority 0, rising linearly to the full limit at CONCURRENCY_TOP_PRIORITY.
+    """
+    top = max(settings.CONCURRENCY_TOP_PRIORITY, 1)
+    level = min(max(priority, 0), top)
+    return 1 - settings.CONCURRENCY_SHED_HEADROOM * (top - level) / top
+
+
+class Slot:
+    __slots__ = ("state", "route", "started", "released", "sample")
+
+    def __init__(self, state: AdaptiveLimit, route: str):
+        self.state = state
+        self.route = route
+        self.started = time.perf_counter()
+        self.released = False
+        # False for requests whose latency must not move the limit
+        self.sample = True
+
+    def release(self, status_code: int):
+        if self.released:
+            return
+        self.released = True
+        now = time.perf_counter()
+        state = self.state
+        state.in_flight -= 1
+        if self.sample:
+            # 502/503/504 mean the upstream (or something behind it) is struggling
+            state.on_sample(self.route, now - self.started, status_code in (502, 503, 504), time.monotonic())
+
+    def wrap_body(self, body_iterator, status_code: int):
+        """
+        Hold the slot until a streamed body has been fully sent.
+        """
+        async def body():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                self.release(status_code)
+        return body()
+
+
+def acquire(api_key, route: str, namespace: str = "") -> Slot | None:
+    """
+    route is "METHOD /path"; its latency is judged against its own baseline.
+    None means shed: answer 503 without calling the handler.
+    """
+    state = _limits.get((namespace, api_key.api_id))
+    if state is None:
+        state = _limits[(namespace, api_key.api_id)] = AdaptiveLimit(namespace, api_key.api_id)
+    state.cluster_cap = api_key.api_max_concurrency
+
+    share = _share(api_key.tier_priority)
+    if state.in_flight >= max(state.limit * share, 1):
+        return None
+    if state.cluster_cap and state.in_flight + _others.get((namespace, state.api_id), 0) >= max(state.cluster_cap * share, 1):
+        return None
+
+    state.in_flight += 1
+    return Slot(state, route)
+
+
+def retry_after(api_id: int, namespace: str = "") -> int:
+    state = _limits.get((namespace, api_id))
+    if state is None or state.min_rtt is None:
+        return 1
+    return max(1, round(state.min_rtt * settings.CONCURRENCY_LATENCY_TOLERANCE))
+
+
+def limiter_stats():
+    """
+    Production limits only; stress-run state is not reported.
+    """
+    return {
+        api_id: {
+            "limit": round(state.limit, 2),
+            "in_flight": state.in_flight,
+            "cluster_cap": state.cluster_cap,
+            "cluster_in_flight_others": _others.get((namespace, api_id), 0),
+            "min_rtt_ms": {
+                route: round(latency.min_rtt * 1000, 2)
+                for route, latency in state.routes.items()
+            },
+        }
+        for (namespace, api_id), state in _limits.items()
+        if not namespace
+    }
+
+
+# -------------------------
+# Cluster-wide counts
+# -------------------------
+async def sync_cluster_counts():
+    clustered = [state for state in _limits.values() if state.cluster_cap]
+    if not clustered:
+        return
+
+    worker = str(os.getpid())
+    now = time.time()
+    stale_before = now - settings.CONCURRENCY_SYNC_INTERVAL_SECONDS * 3
+
+    pipe = redis_client.pipeline()
+    for state in clustered:
+        key = f"{state.namespace}{REDIS_KEY_PREFIX}{state.api_id}"
+        pipe.hset(key, worker, f"{state.in_flight}:{now}")
+        pipe.expire(key, max(int(settings.CONCURRENCY_SYNC_INTERVAL_SECONDS * 10), 5))
+        pipe.hgetall(key)
+    results = await pipe.execute()
+
+    for state, counts in zip(clustered, results[2::3]):
+        total = 0
+        for field, value in counts.items():
+            if field == worker:
+                continue
+            in_flight, published_at = value.split(":")
+            # A worker that died mid-request stops refreshing; ignore it
+            if float(published_at) >= stale_before:
+                total += int(in_flight)
+        _others[(state.namespace, state.api_id)] = total
+
+
+async def sync_loop():
+    while True:
+        try:
+            await sync_cluster_counts()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Concurrency count sync failed:", e)
+        await asyncio.sleep(settings.CONCURRENCY_SYNC_INTERVAL_SECONDS)
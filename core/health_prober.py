@@ -0,0 +1,351 @@
+# app/core/health_prober.py
+"""
+Active health checks for every enabled API.
+
+One worker in the cluster holds a Redis lease and runs the scheduler:
+each API is probed every probe_interval_seconds (± PROBE_JITTER, first
+probe at a random offset so APIs never line up), dispatch is paced by a
+token bucket of PROBE_MAX_PER_SECOND with burst 1, and at most
+PROBE_MAX_CONCURRENCY probes are in flight.
+
+Results go to a fixed-size ring buffer per API in Redis (10 bytes per
+sample, readable by every worker) and closed PROBE_SUMMARY_WINDOW_SECONDS
+windows are rolled up into probe_summaries.
+"""
+import asyncio
+import heapq
+import os
+import random
+import socket
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.future import select
+
+from app.api import models
+from app.config import settings
+from app.core import redis as core_redis
+from app.core.upstream import _client_for
+from app.database import SessionLocal
+
+
+# unix seconds, HTTP status (0 = no response), latency ms
+RECORD = struct.Struct(">IHf")
+
+LEADER_KEY = "probe:leader"
+
+
+def ring_key(api_id: int):
+    return f"probe:ring:{api_id}"
+
+
+def seq_key(api_id: int):
+    return f"probe:seq:{api_id}"
+
+
+def rolled_key(api_id: int):
+    return f"probe:rolled:{api_id}"
+
+
+class ProbeTarget(NamedTuple):
+    id: int
+    endpoint: str
+    method: str
+    interval: int
+    slo_latency_ms: int
+
+
+class Sample(NamedTuple):
+    timestamp: int
+    status: int
+    latency_ms: float
+
+
+def is_success(sample: Sample) -> bool:
+    return 0 < sample.status < 500
+
+
+def is_good(sample: Sample, slo_latency_ms: int) -> bool:
+    return is_success(sample) and sample.latency_ms <= slo_latency_ms
+
+
+def decode_ring(ring: bytes | None, seq: bytes | None):
+    """
+    Samples oldest first.
+    """
+    if not ring or not seq:
+        return []
+    count = int(seq)
+    size = settings.PROBE_RING_SIZE
+    start = max(count - size, 0)
+    samples = []
+    for n in range(start, count):
+        offset = (n % size) * RECORD.size
+        if offset + RECORD.size > len(ring):
+            continue
+        sample = Sample(*RECORD.unpack_from(ring, offset))
+        if sample.timestamp:
+            samples.append(sample)
+    return samples
+
+
+async def read_samples(api_ids):
+    """
+    api_id → samples, one pipeline for all APIs.
+    """
+    pipe = core_redis.redis_bytes_client.pipeline()
+    for api_id in api_ids:
+        pipe.get(ring_key(api_id))
+        pipe.get(seq_key(api_id))
+    results = await pipe.execute()
+    return {
+        api_id: decode_ring(results[2 * i], results[2 * i + 1])
+        for i, api_id in enumerate(api_ids)
+    }
+
+
+class HealthProber:
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+        self.targets = {}
+        self.due = []
+        self.seq = {}
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.next_leader_check = 0.0
+        self.next_refresh = 0.0
+        self.next_rollup = 0.0
+        self.tasks = set()
+
+    # -------------------------
+    # Leadership
+    # -------------------------
+    async def _renew_leadership(self) -> bool:
+        client = core_redis.redis_client
+        ttl = settings.PROBE_LEADER_TTL_SECONDS
+        if await client.set(LEADER_KEY, self.worker_id, nx=True, ex=ttl):
+            return True
+        if await client.get(LEADER_KEY) == self.worker_id:
+            await client.expire(LEADER_KEY, ttl)
+            return True
+        return False
+
+    def _step_down(self):
+        self.targets.clear()
+        self.due.clear()
+        self.seq.clear()
+        self.next_refresh = 0.0
+
+    # -------------------------
+    # Scheduling
+    # -------------------------
+    async def _refresh_targets(self):
+        async with SessionLocal() as db:
+            result = await db.execute(select(models.API).where(models.API.enabled == True))
+            apis = result.scalars().all()
+
+        now = time.monotonic()
+        targets = {}
+        for api in apis:
+            interval = api.probe_interval_seconds
+            if interval is None:
+                interval = settings.PROBE_DEFAULT_INTERVAL_SECONDS
+            if interval <= 0:
+                continue
+            targets[api.id] = ProbeTarget(
+                id=api.id,
+                endpoint=api.endpoint,
+                method=api.method or "GET",
+                interval=interval,
+                slo_latency_ms=api.slo_latency_ms or settings.SLO_DEFAULT_LATENCY_MS,
+            )
+            if api.id not in self.targets:
+                # Spread first probes across one interval instead of a burst
+                heapq.heappush(self.due, (now + random.uniform(0, interval), api.id))
+
+        # Removed / disabled APIs drop out when their heap entry comes due
+        self.targets = targets
+
+    def _take_token(self, now: float) -> bool:
+        self.tokens = min(1.0, self.tokens + (now - self.last_refill) * settings.PROBE_MAX_PER_SECOND)
+        self.last_refill = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+    def _dispatch_due(self, now: float):
+        while self.due and self.due[0][0] <= now:
+            if self.in_flight >= settings.PROBE_MAX_CONCURRENCY or not self._take_token(now):
+                return
+            due_at, api_id = heapq.heappop(self.due)
+            target = self.targets.get(api_id)
+            if target is None:
+                continue
+
+            jitter = random.uniform(-settings.PROBE_JITTER, settings.PROBE_JITTER)
+            # Next slot from the planned time, not from now, so delays don't accumulate
+            heapq.heappush(self.due, (max(due_at + target.interval * (1 + jitter), now), api_id))
+
+            self.in_flight += 1
+            task = asyncio.create_task(self._probe(target))
+            self.tasks.add(task)
+            task.add_done_callback(self._probe_done)
+
+    def _probe_done(self, task):
+        self.tasks.discard(task)
+        self.in_flight -= 1
+
+    def _sleep_for(self, now: float) -> float:
+        if not self.due:
+            return 1.0
+        wait = self.due[0][0] - now
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) / settings.PROBE_MAX_PER_SECOND)
+        return min(max(wait, 0.01), 1.0)
+
+    # -------------------------
+    # Probing
+    # -------------------------
+    async def _probe(self, target: ProbeTarget):
+        parts = urlsplit(target.endpoint)
+        client = _client_for(f"{parts.scheme}://{parts.netloc}")
+        started = time.perf_counter()
+        try:
+            # Headers are enough to judge liveness and latency; skip the body
+            async with client.stream(
+                target.method,
+                target.endpoint,
+                headers={"user-agent": "apimonitor-prober"},
+                timeout=settings.PROBE_TIMEOUT_SECONDS,
+            ) as response:
+                status_code = response.status_code
+        except httpx.HTTPError:
+            status_code = 0
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            await self._record(target.id, Sample(int(time.time()), status_code, latency_ms))
+        except Exception as e:
+            print(f"Recording probe for API {target.id} failed:", e)
+
+    async def _record(self, api_id: int, sample: Sample):
+        client = core_redis.redis_bytes_client
+        seq = self.seq.get(api_id)
+        if seq is None:
+            # Continue the ring where the previous leader stopped
+            seq = int(await client.get(seq_key(api_id)) or 0)
+
+        offset = (seq % settings.PROBE_RING_SIZE) * RECORD.size
+        pipe = client.pipeline()
+        pipe.setrange(ring_key(api_id), offset, RECORD.pack(*sample))
+        pipe.set(seq_key(api_id), seq + 1)
+        await pipe.execute()
+        self.seq[api_id] = seq + 1
+
+    # -------------------------
+    # Rollup
+    # -------------------------
+    async def rollup(self):
+        """
+        Aggregate closed summary windows from the ring buffers into
+        probe_summaries; each window is written once.
+        """
+        if not self.targets:
+            return
+
+        window = settings.PROBE_SUMMARY_WINDOW_SECONDS
+        closed_until = int(time.time()) // window * window
+        api_ids = list(self.targets)
+        samples_by_api = await read_samples(api_ids)
+        rolled = await core_redis.redis_client.mget([rolled_key(api_id) for api_id in api_ids])
+
+        rows = []
+        marks = {}
+        for api_id, rolled_until in zip(api_ids, rolled):
+            rolled_until = int(rolled_until or 0)
+            windows = {}
+            for sample in samples_by_api[api_id]:
+                if rolled_until <= sample.timestamp < closed_until:
+                    windows.setdefault(sample.timestamp // window * window, []).append(sample)
+            for start, samples in sorted(windows.items()):
+                rows.append(self._summary(api_id, start, window, samples))
+            if closed_until > rolled_until:
+                marks[rolled_key(api_id)] = closed_until
+
+        if rows:
+            async with SessionLocal() as db:
+                db.add_all(rows)
+                await db.commit()
+        if marks:
+            await core_redis.redis_client.mset(marks)
+
+    def _summary(self, api_id: int, start: int, window: int, samples):
+        slo_latency_ms = self.targets[api_id].slo_latency_ms
+        latencies = sorted(sample.latency_ms for sample in samples)
+        window_start = datetime.utcfromtimestamp(start)
+        return models.ProbeSummary(
+            api_id=api_id,
+            window_start=window_start,
+            window_end=window_start + timedelta(seconds=window),
+            probe_count=len(samples),
+            success_count=sum(1 for sample in samples if is_success(sample)),
+            slo_good_count=sum(1 for sample in samples if is_good(sample, slo_latency_ms)),
+            avg_latency_ms=int(sum(latencies) / len(latencies)),
+            p95_latency_ms=int(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]),
+            max_latency_ms=int(latencies[-1]),
+        )
+
+    # -------------------------
+    # Main loop
+    # -------------------------
+    async def run(self):
+        while True:
+            now = time.monotonic()
+            try:
+                if now >= self.next_leader_check:
+                    was_leader = self.leader
+                    self.leader = await self._renew_leadership()
+                    self.next_leader_check = now + settings.PROBE_LEADER_TTL_SECONDS / 3
+                    if was_leader and not self.leader:
+                        self._step_down()
+
+                if not self.leader:
+                    await asyncio.sleep(self.next_leader_check - now)
+                    continue
+
+                if now >= self.next_refresh:
+                    await self._refresh_targets()
+                    self.next_refresh = now + settings.PROBE_TARGET_REFRESH_SECONDS
+                if now >= self.next_rollup:
+                    await self.rollup()
+                    self.next_rollup = now + settings.PROBE_ROLLUP_INTERVAL_SECONDS
+
+                self._dispatch_due(time.monotonic())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Health prober error:", e)
+                await asyncio.sleep(1)
+            await asyncio.sleep(self._sleep_for(time.monotonic()))
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.leader:
+            try:
+                # Hand over immediately instead of after the lease expires
+                if await core_redis.redis_client.get(LEADER_KEY) == self.worker_id:
+                    await core_redis.redis_client.delete(LEADER_KEY)
+            except Exception as e:
+                print("Releasing probe leadership failed:", e)
+
+
+health_prober = HealthProber()
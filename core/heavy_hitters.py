@@ -0,0 +1,166 @@
+# app/core/heavy_hitters.py
+"""
+Top-K heaviest API keys, users and endpoints per API and time window.
+
+The gateway counts into small per-worker tables (no I/O on the request
+path); every TOPK_FLUSH_INTERVAL_SECONDS they are merged into one Redis
+sorted set per (API, dimension, window) with ZINCRBY and trimmed back to
+TOPK_CAPACITY members in the same transaction. Memory and work are
+bounded by the capacities, not by traffic.
+
+Counts are lower bounds. Whatever bounded tables drop (a local prune or
+a Redis trim) is added to the window's `error`, so a member's true count
+lies in [count, count + error] and anything unlisted has at most `error`.
+"""
+import asyncio
+import time
+
+from app.config import settings
+from app.core.redis import redis_client
+
+
+REDIS_KEY_PREFIX = "topk:"
+
+DIMENSIONS = ("keys", "users", "endpoints")
+
+
+def window_of(timestamp: float) -> int:
+    return int(timestamp) // settings.TOPK_WINDOW_SECONDS * settings.TOPK_WINDOW_SECONDS
+
+
+def set_key(namespace: str, api_id: int, dimension: str, window: int):
+    return f"{namespace}{REDIS_KEY_PREFIX}{api_id}:{dimension}:{window}"
+
+
+def error_key(namespace: str, api_id: int, window: int):
+    return f"{namespace}{REDIS_KEY_PREFIX}{api_id}:error:{window}"
+
+
+class _Counts:
+    """
+    Exact counts until TOPK_LOCAL_CAPACITY distinct members, then the
+    lighter half is dropped and its heaviest count becomes the error.
+    """
+    __slots__ = ("counts", "error")
+
+    def __init__(self):
+        self.counts = {}
+        self.error = 0
+
+    def add(self, member: str):
+        counts = self.counts
+        counts[member] = counts.get(member, 0) + 1
+        if len(counts) > settings.TOPK_LOCAL_CAPACITY:
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+            keep = settings.TOPK_LOCAL_CAPACITY // 2
+            self.error += ranked[keep][1]
+            self.counts = dict(ranked[:keep])
+
+
+# (namespace, api_id, window) → {dimension: _Counts}
+_pending = {}
+
+
+def record(api_key, method: str, path: str, namespace: str = ""):
+    window = window_of(time.time())
+    tables = _pending.get((namespace, api_key.api_id, window))
+    if tables is None:
+        tables = _pending[(namespace, api_key.api_id, window)] = {
+            dimension: _Counts() for dimension in DIMENSIONS
+        }
+    tables["keys"].add(str(api_key.id))
+    tables["users"].add(str(api_key.user_id))
+    tables["endpoints"].add(f"{method} {path}")
+
+
+# -------------------------
+# Flush to Redis
+# -------------------------
+async def flush():
+    global _pending
+    if not _pending:
+        return
+    pending, _pending = _pending, {}
+
+    capacity = settings.TOPK_CAPACITY
+    ttl = settings.TOPK_WINDOW_SECONDS * settings.TOPK_RETENTION_WINDOWS
+
+    pipe = redis_client.pipeline(transaction=True)
+    trims = []
+    for (namespace, api_id, window), tables in pending.items():
+        errors = error_key(namespace, api_id, window)
+        for dimension, table in tables.items():
+            key = set_key(namespace, api_id, dimension, window)
+            for member, count in table.counts.items():
+                pipe.zincrby(key, count, member)
+            # Highest score about to be trimmed, then the trim itself
+            pipe.zrevrange(key, capacity, capacity, withscores=True)
+            trims.append((errors, dimension, len(pipe.command_stack) - 1))
+            pipe.zremrangebyrank(key, 0, -(capacity + 1))
+            pipe.expire(key, ttl)
+            if table.error:
+                pipe.hincrby(errors, dimension, table.error)
+        pipe.expire(errors, ttl)
+    results = await pipe.execute()
+
+    # A trimmed member may have lost up to the highest trimmed score; the
+    # score is only known once the MULTI has run, hence a second round trip
+    pipe = redis_client.pipeline()
+    for errors, dimension, position in trims:
+        trimmed = results[position]
+        if trimmed:
+            pipe.hincrby(errors, dimension, int(trimmed[0][1]))
+    if pipe.command_stack:
+        await pipe.execute()
+
+
+async def flush_loop():
+    while True:
+        await asyncio.sleep(settings.TOPK_FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Heavy hitter flush failed:", e)
+
+
+# -------------------------
+# Query
+# -------------------------
+async def top(api_id: int, minutes: int, limit: int):
+    """
+    Heaviest members per dimension over the last `minutes`, merged from
+    the per-window sets (each at most TOPK_CAPACITY members).
+    """
+    step = settings.TOPK_WINDOW_SECONDS
+    last = window_of(time.time())
+    # The current window plus enough closed ones to cover `minutes`
+    count = max(-(-minutes * 60 // step), 1)
+    windows = [last - i * step for i in reversed(range(count))]
+
+    pipe = redis_client.pipeline()
+    for window in windows:
+        for dimension in DIMENSIONS:
+            pipe.zrevrange(set_key("", api_id, dimension, window), 0, -1, withscores=True)
+        pipe.hgetall(error_key("", api_id, window))
+    results = await pipe.execute()
+
+    stride = len(DIMENSIONS) + 1
+    data = {}
+    for d, dimension in enumerate(DIMENSIONS):
+        counts = {}
+        error = 0
+        for w in range(len(windows)):
+            for member, score in results[w * stride + d]:
+                counts[member] = counts.get(member, 0) + int(score)
+            error += int(results[w * stride + len(DIMENSIONS)].get(dimension, 0))
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        data[dimension] = {
+            "error": error,
+            "items": [
+                {"id": member, "count": count, "upper_bound": count + error}
+                for member, count in ranked
+            ],
+        }
+    return {"window_start": windows[0], "window_end": windows[-1] + settings.TOPK_WINDOW_SECONDS, **data}
@@ -0,0 +1,202 @@
+# app/core/live_analytics.py
+"""
+Current-minute counters pushed to dashboards over SSE.
+
+Each worker runs at most one poller, and only while someone is subscribed:
+every LIVE_ANALYTICS_INTERVAL_SECONDS it reads the current window's index
+set and counter hashes in one pipeline, so Redis load does not grow with
+the number of dashboards. Subscribers get a full snapshot first and then
+only the fields that changed; the unfiltered (admin) delta is encoded
+once and shared.
+"""
+import asyncio
+import json
+
+from app.config import settings
+from app.core.analytics_counter import get_time_window, window_index_key, latency_percentile
+from app.core.redis import redis_client
+
+
+COUNT_FIELDS = (
+    ("requests", "requests"),
+    ("success", "success"),
+    ("errors", "errors"),
+    ("rate_limit_exceeded", "rate_limited"),
+    ("cache_hits", "cache_hits"),
+    ("cache_misses", "cache_misses"),
+)
+
+
+def _stats(data: dict):
+    requests = int(data.get("requests", 0))
+    stats = {name: int(data.get(field, 0)) for field, name in COUNT_FIELDS}
+    stats["avg_ms"] = int(int(data.get("total_latency_ms", 0)) / requests) if requests else 0
+    stats["p50_ms"] = latency_percentile(data, 0.5)
+    stats["p95_ms"] = latency_percentile(data, 0.95)
+    stats["p99_ms"] = latency_percentile(data, 0.99)
+    stats["max_ms"] = int(data.get("max_latency_ms", 0))
+    return stats
+
+
+def _merge(total: dict, data: dict):
+    for field, value in data.items():
+        if field == "max_latency_ms":
+            total[field] = max(int(total.get(field, 0)), int(value))
+        else:
+            total[field] = int(total.get(field, 0)) + int(value)
+
+
+def _diff(old: dict, new: dict):
+    """
+    Per entry, only the fields that changed.
+    """
+    changes = {}
+    for entry_id, stats in new.items():
+        previous = old.get(entry_id)
+        if previous is None:
+            changes[entry_id] = stats
+        elif previous != stats:
+            changes[entry_id] = {field: value for field, value in stats.items() if previous.get(field) != value}
+    return changes
+
+
+def _event(kind: str, payload: dict) -> bytes:
+    return f"event: {kind}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscriber:
+    __slots__ = ("key_ids", "queue")
+
+    def __init__(self, key_ids):
+        # None = everything (admins), else only these API keys
+        self.key_ids = key_ids
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_ANALYTICS_QUEUE_SIZE)
+
+
+class LiveAnalyticsHub:
+    def __init__(self):
+        self.subscribers = set()
+        self.poller = None
+        self.window = None
+        self.keys = {}
+        self.apis = {}
+
+    # -------------------------
+    # Reading counters
+    # -------------------------
+    async def _read(self, window: str):
+        members = await redis_client.smembers(window_index_key(window))
+        members = sorted(members)
+        pipe = redis_client.pipeline()
+        for member in members:
+            pipe.hgetall(member)
+        counters = await pipe.execute() if members else []
+
+        keys = {}
+        api_totals = {}
+        for member, data in zip(members, counters):
+            if not data:
+                continue
+            # analytics:{api_id}:{api_key_id}:{window}
+            _, api_id, api_key_id, _ = member.split(":")
+            keys[api_key_id] = {"api_id": int(api_id), **_stats(data)}
+            _merge(api_totals.setdefault(api_id, {}), data)
+
+        apis = {api_id: _stats(data) for api_id, data in api_totals.items()}
+        return keys, apis
+
+    # -------------------------
+    # Fan-out
+    # -------------------------
+    def _view(self, subscriber: Subscriber, keys: dict, apis: dict):
+        if subscriber.key_ids is None:
+            return {"keys": keys, "apis": apis}
+        return {"keys": {key_id: stats for key_id, stats in keys.items() if key_id in subscriber.key_ids}}
+
+    def _snapshot(self, subscriber: Subscriber) -> bytes:
+        return _event("snapshot", {"window": self.window, **self._view(subscriber, self.keys, self.apis)})
+
+    def _send(self, subscriber: Subscriber, event: bytes):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow for deltas: drop the backlog and start over from a snapshot
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self._snapshot(subscriber))
+
+    def _publish(self, window: str, keys: dict, apis: dict):
+        rolled_over = window != self.window
+        key_changes = {} if rolled_over else _diff(self.keys, keys)
+        api_changes = {} if rolled_over else _diff(self.apis, apis)
+        self.window, self.keys, self.apis = window, keys, apis
+
+        if rolled_over:
+            for subscriber in self.subscribers:
+                self._send(subscriber, self._snapshot(subscriber))
+            return
+        if not key_changes:
+            return
+
+        shared = None
+        for subscriber in self.subscribers:
+            if subscriber.key_ids is None:
+                if shared is None:
+                    shared = _event("delta", {"window": window, "keys": key_changes, "apis": api_changes})
+                self._send(subscriber, shared)
+                continue
+            view = self._view(subscriber, key_changes, api_changes)
+            if view["keys"]:
+                self._send(subscriber, _event("delta", {"window": window, **view}))
+
+    async def _poll(self):
+        while self.subscribers:
+            try:
+                window = get_time_window()
+                keys, apis = await self._read(window)
+                self._publish(window, keys, apis)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Live analytics poll failed:", e)
+            await asyncio.sleep(settings.LIVE_ANALYTICS_INTERVAL_SECONDS)
+        self.poller = None
+
+    # -------------------------
+    # Subscriptions
+    # -------------------------
+    async def stream(self, key_ids=None):
+        """
+        SSE body: a snapshot, then deltas as counters change.
+        """
+        subscriber = Subscriber(set(map(str, key_ids)) if key_ids is not None else None)
+        self.subscribers.add(subscriber)
+        if self.poller is None:
+            # State left from an earlier session is stale; the first poll
+            # sends everyone a fresh snapshot
+            self.window = None
+            self.poller = asyncio.create_task(self._poll())
+        elif self.window is not None:
+            subscriber.queue.put_nowait(self._snapshot(subscriber))
+
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.LIVE_ANALYTICS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield b": keep-alive\n\n"
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def shutdown(self):
+        self.subscribers.clear()
+        if self.poller is not None:
+            self.poller.cancel()
+            await asyncio.gather(self.poller, return_exceptions=True)
+            self.poller = None
+
+
+live_analytics = LiveAnalyticsHub()
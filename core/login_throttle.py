@@ -0,0 +1,102 @@
+# app/core/login_throttle.py
+import time
+import uuid
+from fastapi import HTTPException, status
+
+from app.core.redis import redis_client
+from app.config import settings
+
+
+def _block_key(kind: str, identity: str) -> str:
+    return f"login_block:{kind}:{identity}"
+
+
+def _window_key(kind: str, identity: str) -> str:
+    return f"login_failures:{kind}:{identity}"
+
+
+def _strikes_key(kind: str, identity: str) -> str:
+    return f"login_strikes:{kind}:{identity}"
+
+
+def _limits(kind: str) -> int:
+    return (
+        settings.LOGIN_MAX_FAILURES_PER_EMAIL
+        if kind == "email" else settings.LOGIN_MAX_FAILURES_PER_IP
+    )
+
+
+async def check_login_allowed(email: str, client_ip: str | None):
+    """
+    Runs before any DB or Argon2 work: a blocked identity costs a single
+    MGET. Fails open if Redis is unavailable.
+    """
+    keys = [_block_key("email", email.lower())]
+    if client_ip:
+        keys.append(_block_key("ip", client_ip))
+
+    try:
+        blocked_until = await redis_client.mget(keys)
+    except Exception as e:
+        print("Login throttle unavailable:", e)
+        return
+
+    retry_after = max((float(value) for value in blocked_until if value), default=0) - time.time()
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(int(retry_after) + 1)}
+        )
+
+
+async def record_login_failure(email: str, client_ip: str | None):
+    """
+    Sliding-window failure count per email and per IP. Crossing the limit
+    blocks the identity for LOGIN_BACKOFF_BASE_SECONDS * 2^(strikes - 1),
+    so repeat offenders back off exponentially.
+    """
+    identities = [("email", email.lower())]
+    if client_ip:
+        identities.append(("ip", client_ip))
+
+    now = time.time()
+    window = settings.LOGIN_FAILURE_WINDOW_SECONDS
+
+    try:
+        pipe = redis_client.pipeline()
+        for kind, identity in identities:
+            key = _window_key(kind, identity)
+            pipe.zadd(key, {uuid.uuid4().hex: now})
+            pipe.zremrangebyscore(key, 0, now - window)
+            pipe.zcard(key)
+            pipe.expire(key, window)
+        results = await pipe.execute()
+
+        for index, (kind, identity) in enumerate(identities):
+            failures = results[index * 4 + 2]
+            if failures < _limits(kind):
+                continue
+
+            strikes_key = _strikes_key(kind, identity)
+            strikes = await redis_client.incr(strikes_key)
+            await redis_client.expire(strikes_key, settings.LOGIN_STRIKES_TTL_SECONDS)
+
+            backoff = min(
+                settings.LOGIN_BACKOFF_BASE_SECONDS * 2 ** (strikes - 1),
+                settings.LOGIN_BACKOFF_MAX_SECONDS
+            )
+            pipe = redis_client.pipeline()
+            pipe.set(_block_key(kind, identity), now + backoff, ex=int(backoff))
+            pipe.delete(_window_key(kind, identity))
+            await pipe.execute()
+    except Exception as e:
+        print("Login throttle unavailable:", e)
+
+
+async def record_login_success(email: str):
+    email = email.lower()
+    try:
+        await redis_client.delete(_window_key("email", email), _strikes_key("email", email))
+    except Exception as e:
+        print("Login throttle unavailable:", e)
@@ -0,0 +1,302 @@
+# app/core/metrics.py
+"""
+Prometheus-compatible metrics.
+
+Each uvicorn worker records into plain in-process counters (the event loop
+is single-threaded, so no locks), and publishes a snapshot to Redis every
+METRICS_PUBLISH_INTERVAL_SECONDS. /metrics merges every live worker's
+snapshot, so a scrape costs O(series x workers) regardless of traffic.
+"""
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+
+from app.core.redis import redis_client
+from app.config import settings
+
+
+WORKER_KEY_PREFIX = "metrics:worker:"
+# Live workers: pid → time of its last publish
+WORKERS_KEY = "metrics:workers"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+# -------------------------
+# Metric types
+# -------------------------
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def dump(self):
+        return self.value
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def dump(self):
+        return [self.counts, self.sum, self.count]
+
+
+class Metric:
+    def __init__(self, kind: str, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS, cluster=False):
+        self.kind = kind
+        # Cluster-wide values are computed at scrape time and never summed across workers
+        self.cluster = cluster
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        _registry.append(self)
+
+    def labels(self, *values):
+        """
+        Resolve a labelled child. Bind children once (module level or first
+        use) and keep the reference; recording on it allocates nothing.
+        """
+        child = self._children.get(values)
+        if child is None:
+            child = _Histogram(self.buckets) if self.kind == "histogram" else _Value()
+            self._children[values] = child
+        return child
+
+    def snapshot(self):
+        return {
+            "kind": self.kind,
+            "help": self.help,
+            "labelnames": self.labelnames,
+            "buckets": self.buckets,
+            "series": [[list(values), child.dump()] for values, child in self._children.items()],
+        }
+
+
+def counter(name, help, labelnames=()):
+    return Metric("counter", name, help, labelnames)
+
+
+def gauge(name, help, labelnames=(), cluster=False):
+    return Metric("gauge", name, help, labelnames, cluster=cluster)
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return Metric("histogram", name, help, labelnames, buckets)
+
+
+# -------------------------
+# Gateway metrics
+# -------------------------
+gateway_requests = counter(
+    "gateway_requests_total", "Requests through the gateway by status class", ("status_class",)
+)
+gateway_latency = histogram(
+    "gateway_request_duration_seconds", "Gateway request latency", ("status_class",)
+)
+gateway_rate_limited = counter(
+    "gateway_rate_limited_total", "Requests rejected by the per-key rate limit"
+)
+gateway_rejected = counter(
+    "gateway_rejected_total", "Requests rejected before forwarding", ("reason",)
+)
+
+# Pre-bound children indexed by status // 100
+_STATUS_CLASSES = ("1xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+_requests_by_class = [gateway_requests.labels(c) for c in _STATUS_CLASSES]
+_latency_by_class = [gateway_latency.labels(c) for c in _STATUS_CLASSES]
+rate_limited_child = gateway_rate_limited.labels()
+rejected_missing_key = gateway_rejected.labels("missing_key")
+rejected_invalid_key = gateway_rejected.labels("invalid_key")
+rejected_api_disabled = gateway_rejected.labels("api_disabled")
+rejected_overloaded = gateway_rejected.labels("overloaded")
+
+gateway_cache = counter(
+    "gateway_response_cache_total", "Proxied GET response cache lookups", ("result",)
+)
+cache_hit_child = gateway_cache.labels("hit")
+cache_stale_child = gateway_cache.labels("stale")
+cache_miss_child = gateway_cache.labels("miss")
+
+
+def observe_request(status_code: int, duration_seconds: float):
+    index = min(status_code // 100, 5)
+    _requests_by_class[index].value += 1
+    _latency_by_class[index].observe(duration_seconds)
+
+
+# -------------------------
+# Scrape-time collectors
+# -------------------------
+db_pool = gauge("db_pool_connections", "SQLAlchemy pool connections", ("state",))
+redis_pool = gauge("redis_pool_connections", "Redis pool connections", ("state",))
+password_pool = gauge("password_hash_pool", "Argon2 worker pool state", ("state",))
+concurrency = gauge(
+    "gateway_concurrency", "Adaptive per-API concurrency limiter state", ("api_id", "state")
+)
+aggregation_lag = gauge(
+    "analytics_aggregation_lag_seconds", "Seconds since aggregate_analytics last completed",
+    cluster=True
+)
+
+
+def _collect_local():
+    from app.database import engine
+    from app.auth.utils import password_pool_stats
+    from app.core.concurrency_limiter import limiter_stats
+
+    pool = engine.pool
+    for state, getter in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, getter):
+            db_pool.labels(state).set(getattr(pool, getter)())
+
+    connection_pool = redis_client.connection_pool
+    redis_pool.labels("in_use").set(len(getattr(connection_pool, "_in_use_connections", ())))
+    redis_pool.labels("idle").set(len(getattr(connection_pool, "_available_connections", ())))
+
+    for state in ("in_flight", "queued", "max_queued", "completed", "rejected"):
+        password_pool.labels(state).set(password_pool_stats[state])
+
+    for api_id, stats in limiter_stats().items():
+        concurrency.labels(str(api_id), "limit").set(stats["limit"])
+        concurrency.labels(str(api_id), "in_flight").set(stats["in_flight"])
+
+
+async def _collect_cluster():
+    last = await redis_client.get("analytics:last_aggregated_at")
+    aggregation_lag.labels().set(round(time.time() - float(last), 1) if last else -1)
+
+
+def snapshot(include_cluster=True):
+    _collect_local()
+    return {
+        metric.name: metric.snapshot()
+        for metric in _registry
+        if include_cluster or not metric.cluster
+    }
+
+
+# -------------------------
+# Multiprocess aggregation
+# -------------------------
+def _worker_key(pid=None):
+    return f"{WORKER_KEY_PREFIX}{pid or os.getpid()}"
+
+
+def _stale_before(now: float) -> float:
+    return now - settings.METRICS_PUBLISH_INTERVAL_SECONDS * 3
+
+
+async def publish_snapshot():
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.set(
+        _worker_key(),
+        json.dumps(snapshot(include_cluster=False)),
+        ex=settings.METRICS_PUBLISH_INTERVAL_SECONDS * 3
+    )
+    pipe.zadd(WORKERS_KEY, {str(os.getpid()): now})
+    # Workers that stopped publishing (their snapshot has expired too)
+    pipe.zremrangebyscore(WORKERS_KEY, 0, _stale_before(now))
+    await pipe.execute()
+
+
+async def publish_loop():
+    while True:
+        try:
+            await publish_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Metrics publish failed:", e)
+        await asyncio.sleep(settings.METRICS_PUBLISH_INTERVAL_SECONDS)
+
+
+def _merge(into: dict, other: dict):
+    for name, metric in other.items():
+        target = into.setdefault(name, {**metric, "series": {}})
+        for labels, value in metric["series"]:
+            key = tuple(labels)
+            current = target["series"].get(key)
+            if current is None:
+                target["series"][key] = value
+            elif metric["kind"] == "histogram":
+                counts = [a + b for a, b in zip(current[0], value[0])]
+                target["series"][key] = [counts, current[1] + value[1], current[2] + value[2]]
+            else:
+                target["series"][key] = current + value
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _render(merged: dict) -> str:
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in metric["series"].items():
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, labels)} {value}")
+                continue
+
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(list(metric["buckets"]) + ["+Inf"], counts):
+                cumulative += bucket
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+async def render_metrics() -> str:
+    try:
+        await _collect_cluster()
+    except Exception as e:
+        print("Cluster metrics collection failed:", e)
+    local = snapshot()
+
+    merged = {}
+    _merge(merged, local)
+    try:
+        own_pid = str(os.getpid())
+        pids = await redis_client.zrangebyscore(WORKERS_KEY, _stale_before(time.time()), "+inf")
+        worker_keys = [_worker_key(pid) for pid in pids if pid != own_pid]
+        if worker_keys:
+            for raw in await redis_client.mget(worker_keys):
+                if raw:
+                    _merge(merged, json.loads(raw))
+    except Exception as e:
+        print("Metrics aggregation failed, serving this worker only:", e)
+
+    return _render(merged)
@@ -0,0 +1,30 @@
+# app/core/periodic.py
+import asyncio
+from app.database import SessionLocal
+
+
+async def run_periodic(name: str, interval_seconds: float, job):
+    """
+    Run `job(db)` every `interval_seconds` with a fresh session, starting
+    immediately. Failures are logged and retried on the next tick.
+    """
+    while True:
+        try:
+            async with SessionLocal() as db:
+                await job(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Periodic job '{name}' failed:", e)
+
+        await asyncio.sleep(interval_seconds)
+
+
+def start_periodic(name: str, interval_seconds: float, job) -> asyncio.Task:
+    return asyncio.create_task(run_periodic(name, interval_seconds, job), name=name)
+
+
+async def stop_tasks(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,55 @@
+# app/core/principal_cache.py
+import time
+from typing import NamedTuple
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.models import User
+from app.config import settings
+from app.core import cache_invalidation
+
+
+class Principal(NamedTuple):
+    """
+    Immutable snapshot of the authenticated user; all that route-level
+    authorization (`current_user.id`, `current_user.role_id`) needs.
+    """
+    id: int
+    role_id: int
+    is_active: bool
+
+
+# user_id → (principal, expires_at)
+_principals = {}
+
+
+async def get_principal(db: AsyncSession, user_id: int) -> Principal | None:
+    entry = _principals.get(user_id)
+    now = time.monotonic()
+    if entry and entry[1] > now:
+        return entry[0]
+
+    row = (await db.execute(
+        select(User.id, User.role_id, User.is_active).where(User.id == user_id)
+    )).one_or_none()
+    if not row:
+        _principals.pop(user_id, None)
+        return None
+
+    principal = Principal(id=row.id, role_id=row.role_id, is_active=bool(row.is_active))
+    if len(_principals) >= settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+        _principals.clear()
+    _principals[user_id] = (principal, now + settings.PRINCIPAL_CACHE_TTL_SECONDS)
+    return principal
+
+
+def _evict(user_ids):
+    for user_id in user_ids:
+        _principals.pop(user_id, None)
+
+
+async def invalidate_principal(user_id: int):
+    await cache_invalidation.publish("principal", [user_id])
+
+
+cache_invalidation.register("principal", _evict)
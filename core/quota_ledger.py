@@ -0,0 +1,215 @@
+# app/core/quota_ledger.py
+"""
+Per-key usage per UTC day and month.
+
+The gateway counts in Redis, queued into the same pipeline as the rate
+limit check (see app/core/rate_limiter.py), and every
+QUOTA_CHECKPOINT_INTERVAL_SECONDS the counters of keys active today or
+yesterday are upserted into usage_ledger in bulk. Redis holds the live
+figure, the ledger the billing record; a checkpoint never lowers a ledger
+count, so losing Redis cannot shrink billed usage. A month counter that
+Redis lost is re-seeded from the ledger on its next request, so quota
+enforcement carries on from the billed figure instead of restarting at 0.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api import models
+from app.config import settings
+from app.core.redis import redis_client
+from app.database import SessionLocal
+
+
+REDIS_KEY_PREFIX = "quota:"
+
+DAY_TTL_SECONDS = 3 * 24 * 3600
+MONTH_TTL_SECONDS = 40 * 24 * 3600
+
+HISTORY_DAYS = 31
+HISTORY_MONTHS = 12
+
+
+def day_key(key_id: int, day: date, namespace: str = ""):
+    return f"{namespace}{REDIS_KEY_PREFIX}{key_id}:d:{day:%Y%m%d}"
+
+
+def month_key(key_id: int, day: date, namespace: str = ""):
+    return f"{namespace}{REDIS_KEY_PREFIX}{key_id}:m:{day:%Y%m}"
+
+
+def index_key(day: date, namespace: str = ""):
+    """
+    Keys with usage on `day`, so checkpoints never scan the keyspace.
+    """
+    return f"{namespace}{REDIS_KEY_PREFIX}index:{day:%Y%m%d}"
+
+
+# -------------------------
+# Gateway side
+# -------------------------
+def queue_usage(pipe, key_id: int, namespace: str = ""):
+    """
+    Queue one request's counting on `pipe`: its first two results are the
+    day and month totals including this request.
+    """
+    today = datetime.utcnow().date()
+    pipe.incr(day_key(key_id, today, namespace))
+    pipe.incr(month_key(key_id, today, namespace))
+    pipe.expire(day_key(key_id, today, namespace), DAY_TTL_SECONDS)
+    pipe.expire(month_key(key_id, today, namespace), MONTH_TTL_SECONDS)
+    pipe.sadd(index_key(today, namespace), key_id)
+    pipe.expire(index_key(today, namespace), DAY_TTL_SECONDS)
+
+
+async def seed_month_count(key_id: int) -> int:
+    """
+    For a request whose INCR created the month counter: either the key's
+    first request this month, or Redis lost the counter. Adds the ledger's
+    figure on top, keeping the requests counted since the loss; returns the
+    month total including this request.
+    """
+    today = datetime.utcnow().date()
+    ledger = models.UsageLedger
+    try:
+        async with SessionLocal() as db:
+            recorded = (await db.execute(
+                select(ledger.request_count).where(
+                    ledger.api_key_id == key_id,
+                    ledger.period == "month",
+                    ledger.period_start == today.replace(day=1)
+                )
+            )).scalar_one_or_none()
+    except Exception as e:
+        print("Quota ledger lookup failed:", e)
+        return 1
+
+    if not recorded:
+        return 1
+    return await redis_client.incrby(month_key(key_id, today), recorded)
+
+
+async def refund_usage(key_id: int, namespace: str = ""):
+    """
+    Undo queue_usage for a request that was rejected (not billable).
+    """
+    today = datetime.utcnow().date()
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.decr(day_key(key_id, today, namespace))
+    pipe.decr(month_key(key_id, today, namespace))
+    await pipe.execute()
+
+
+# -------------------------
+# Checkpoint
+# -------------------------
+def _upsert(db: AsyncSession, rows):
+    table = models.UsageLedger
+    dialect = db.bind.dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_duplicate_key_update(
+            request_count=func.greatest(table.request_count, stmt.inserted.request_count),
+            updated_at=func.now()
+        )
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        greatest = func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        greatest = func.max  # SQLite's two-argument max() is scalar
+
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["api_key_id", "period", "period_start"],
+        set_={
+            "request_count": greatest(table.request_count, stmt.excluded.request_count),
+            "updated_at": func.now(),
+        }
+    )
+
+
+async def checkpoint(db: AsyncSession):
+    today = datetime.utcnow().date()
+    # Yesterday too, so its final count lands after the day rolls over
+    days = [today - timedelta(days=1), today]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for day in days:
+        pipe.smembers(index_key(day))
+    indexed = await pipe.execute()
+
+    entries = [(day, int(key_id)) for day, members in zip(days, indexed) for key_id in members]
+    if not entries:
+        return 0
+
+    pipe = redis_client.pipeline(transaction=False)
+    for day, key_id in entries:
+        pipe.get(day_key(key_id, day))
+        pipe.get(month_key(key_id, day))
+    counts = await pipe.execute()
+
+    rows = {}
+    for (day, key_id), day_count, month_count in zip(entries, counts[::2], counts[1::2]):
+        if day_count is not None:
+            rows[(key_id, "day", day)] = int(day_count)
+        if month_count is not None:
+            rows[(key_id, "month", day.replace(day=1))] = int(month_count)
+
+    values = [
+        {"api_key_id": key_id, "period": period, "period_start": start, "request_count": count}
+        for (key_id, period, start), count in rows.items()
+    ]
+    batch_size = settings.QUOTA_LEDGER_BATCH_SIZE
+    for i in range(0, len(values), batch_size):
+        await db.execute(_upsert(db, values[i:i + batch_size]))
+    await db.commit()
+    return len(values)
+
+
+# -------------------------
+# Reporting
+# -------------------------
+async def key_usage(db: AsyncSession, key_id: int):
+    """
+    Live day / month totals from Redis plus the ledger history; two index
+    lookups however much the key was used.
+    """
+    today = datetime.utcnow().date()
+    live_day, live_month = await redis_client.mget(day_key(key_id, today), month_key(key_id, today))
+
+    ledger = models.UsageLedger
+    result = await db.execute(
+        select(ledger.period, ledger.period_start, ledger.request_count)
+        .where(
+            ledger.api_key_id == key_id,
+            ledger.period == "day",
+            ledger.period_start >= today - timedelta(days=HISTORY_DAYS - 1)
+        )
+        .order_by(ledger.period_start.desc())
+    )
+    days = result.all()
+    result = await db.execute(
+        select(ledger.period, ledger.period_start, ledger.request_count)
+        .where(ledger.api_key_id == key_id, ledger.period == "month")
+        .order_by(ledger.period_start.desc())
+        .limit(HISTORY_MONTHS)
+    )
+    months = result.all()
+
+    def current(live, rows, start):
+        recorded = next((row.request_count for row in rows if row.period_start == start), 0)
+        # Redis is ahead between checkpoints; the ledger wins if Redis was lost
+        return max(int(live or 0), recorded)
+
+    return {
+        "today": current(live_day, days, today),
+        "this_month": current(live_month, months, today.replace(day=1)),
+        "days": [{"date": row.period_start, "requests": row.request_count} for row in days],
+        "months": [{"month": row.period_start, "requests": row.request_count} for row in months],
+    }
@@ -1,25 +1,54 @@
 # app/core/rate_limiter.py
+import time
 from fastapi import HTTPException, status
 from app.core.redis import redis_client
+from app.core import quota_ledger
+
+
+class QuotaExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Monthly quota exceeded"
+        )
 
 
 async def check_rate_limit(
-    api_key: str,
+    key_id: int,
     limit: int,
-    window_seconds: int = 60
+    window_seconds: int = 60,
+    namespace: str = "",
+    monthly_quota: int | None = None,
+    quota_mode: str = "hard"
 ):
     """
-    Simple fixed-window rate limiter
+    Simple fixed-window rate limiter, plus the key's day / month usage
+    counting in the same round trip. Returns the month's usage including
+    this request; rejected requests are not counted.
     """
-    redis_key = f"rate_limit:{api_key}"
+    window = int(time.time()) // window_seconds
+    redis_key = f"{namespace}rate_limit:{key_id}:{window}"
 
-    current_count = await redis_client.incr(redis_key)
-
-    if current_count == 1:
-        await redis_client.expire(redis_key, window_seconds)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.incr(redis_key)
+    # The window is part of the key, so refreshing the TTL is harmless
+    pipe.expire(redis_key, window_seconds)
+    quota_ledger.queue_usage(pipe, key_id, namespace)
+    results = await pipe.execute()
+    current_count, month_count = results[0], results[3]
+    # Stress namespaces have no ledger
+    if month_count == 1 and not namespace:
+        month_count = await quota_ledger.seed_month_count(key_id)
 
     if current_count > limit:
+        await quota_ledger.refund_usage(key_id, namespace)
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded"
         )
+
+    if monthly_quota is not None and month_count > monthly_quota and quota_mode == "hard":
+        await quota_ledger.refund_usage(key_id, namespace)
+        raise QuotaExceeded()
+
+    return month_count
@@ -5,3 +5,9 @@ redis_client = redis.from_url(
     settings.REDIS_URL,
     decode_responses=True
 )
+
+# Binary payloads (cached response bodies): same server, no decoding
+redis_bytes_client = redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=False
+)
@@ -0,0 +1,324 @@
+# app/core/response_cache.py
+"""
+Optional per-API cache for proxied GETs, configured on the API row
+(cache_ttl_seconds, cache_stale_seconds, cache_vary_headers,
+cache_max_object_bytes) and stored in a per-worker LRU or in Redis
+(RESPONSE_CACHE_BACKEND).
+
+- Concurrent misses for one cache key share a single upstream call
+  (single-flight, per worker).
+- Within cache_stale_seconds after expiry the stale copy is served at once
+  and refreshed in the background (stale-while-revalidate).
+- Authorization and Cookie are forwarded upstream, so they are always part
+  of the cache key: a response fetched with one caller's credentials is
+  only ever served back to that caller (RFC 9111 §3.5).
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config import settings
+from app.core import cache_invalidation, metrics
+from app.core.api_key_cache import KeySnapshot
+from app.core import redis as core_redis
+from app.core.upstream import (
+    UpstreamError, open_stream, close_stream, stream_response,
+    response_headers, forward, forward_headers, error_response,
+)
+
+
+REDIS_KEY_PREFIX = "respcache:"
+
+# Heuristically cacheable statuses (RFC 9110 §15.1)
+CACHEABLE_STATUSES = frozenset((200, 203, 204, 300, 301, 404, 405, 410, 414, 501))
+
+# Regenerated per response from the cached body
+_REBUILT_HEADERS = (b"content-length", b"age", b"x-cache")
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: list
+    body: bytes
+    stored_at: float
+    ttl: int
+    stale: int
+
+
+# -------------------------
+# Backends
+# -------------------------
+class LocalLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CachedResponse):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old.body)
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    def purge_apis(self, api_ids):
+        prefixes = tuple(f"{api_id}:" for api_id in api_ids)
+        for key in [k for k in self.entries if k.startswith(prefixes)]:
+            self.size -= len(self.entries.pop(key).body)
+
+
+class RedisCache:
+    """
+    One hash per entry: `meta` (JSON) and `body` (raw bytes), expiring when
+    the stale window closes.
+    """
+
+    def _key(self, key: str):
+        api_id, digest = key.split(":", 1)
+        return f"{REDIS_KEY_PREFIX}{api_id}:{hashlib.sha256(digest.encode()).hexdigest()}"
+
+    async def get(self, key: str):
+        try:
+            data = await core_redis.redis_bytes_client.hgetall(self._key(key))
+        except Exception as e:
+            print("Response cache read failed:", e)
+            return None
+        if not data:
+            return None
+        meta = json.loads(data[b"meta"])
+        return CachedResponse(
+            status_code=meta["status"],
+            headers=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in meta["headers"]],
+            body=data[b"body"],
+            stored_at=meta["stored_at"],
+            ttl=meta["ttl"],
+            stale=meta["stale"],
+        )
+
+    async def set(self, key: str, entry: CachedResponse):
+        meta = json.dumps({
+            "status": entry.status_code,
+            "headers": [(name.decode("latin-1"), value.decode("latin-1")) for name, value in entry.headers],
+            "stored_at": entry.stored_at,
+            "ttl": entry.ttl,
+            "stale": entry.stale,
+        })
+        redis_key = self._key(key)
+        try:
+            pipe = core_redis.redis_bytes_client.pipeline()
+            pipe.hset(redis_key, mapping={"meta": meta, "body": entry.body})
+            pipe.expire(redis_key, entry.ttl + entry.stale)
+            await pipe.execute()
+        except Exception as e:
+            print("Response cache write failed:", e)
+
+    async def purge_apis(self, api_ids):
+        client = core_redis.redis_bytes_client
+        for api_id in api_ids:
+            keys = [key async for key in client.scan_iter(match=f"{REDIS_KEY_PREFIX}{api_id}:*", count=500)]
+            if keys:
+                await client.delete(*keys)
+
+
+_local = LocalLRU(settings.RESPONSE_CACHE_LOCAL_MAX_BYTES)
+_backend = RedisCache() if settings.RESPONSE_CACHE_BACKEND == "redis" else _local
+
+# cache key → Future of the in-flight fetch (single-flight)
+_fetches = {}
+
+# Background revalidations, referenced until done
+_refreshes = set()
+
+
+# -------------------------
+# Cache keys / policy
+# -------------------------
+# Request headers that may make the upstream answer per caller
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+
+
+def cache_key(api_key: KeySnapshot, path: str, query: str, headers) -> str:
+    vary = "|".join(f"{name}={headers.get(name, '')}" for name in api_key.api_cache_vary_headers)
+    key = f"{api_key.api_id}:{path}?{query}|{vary}"
+    credentials = "\n".join(headers.get(name, "") for name in CREDENTIAL_HEADERS)
+    if credentials.strip():
+        # Digest only: the local LRU must not hold the secrets themselves
+        key += "|cred=" + hashlib.sha256(credentials.encode()).hexdigest()
+    return key
+
+
+def _storable(upstream) -> bool:
+    if upstream.status_code not in CACHEABLE_STATUSES:
+        return False
+    cache_control = upstream.headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    # Per-client responses must never be shared between keys
+    return "set-cookie" not in upstream.headers and upstream.headers.get("vary") != "*"
+
+
+class _Passthrough(NamedTuple):
+    """
+    An upstream response that turned out uncacheable, partially read.
+    """
+    upstream: object
+    buffered: list
+    chunks: object
+
+
+async def _fetch(api_key: KeySnapshot, key: str, path: str, query: str, headers):
+    upstream = await open_stream(api_key, "GET", path, query, headers)
+    chunks = upstream.aiter_raw()
+    max_bytes = api_key.api_cache_max_object_bytes or settings.RESPONSE_CACHE_MAX_OBJECT_BYTES
+
+    declared = upstream.headers.get("content-length")
+    if not _storable(upstream) or (declared and int(declared) > max_bytes):
+        return _Passthrough(upstream, [], chunks)
+
+    buffered = []
+    size = 0
+    try:
+        async for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                return _Passthrough(upstream, buffered, chunks)
+    except BaseException:
+        await close_stream(api_key, upstream)
+        raise
+
+    await close_stream(api_key, upstream)
+    entry = CachedResponse(
+        status_code=upstream.status_code,
+        headers=[(name, value) for name, value in response_headers(upstream) if name not in _REBUILT_HEADERS],
+        body=b"".join(buffered),
+        stored_at=time.time(),
+        ttl=api_key.api_cache_ttl_seconds,
+        stale=api_key.api_cache_stale_seconds or 0,
+    )
+    await _backend.set(key, entry)
+    return entry
+
+
+async def _single_flight(api_key: KeySnapshot, key: str, path: str, query: str, headers):
+    """
+    Returns (result, leader). Followers only ever see a CachedResponse or
+    None (the leader's response was uncacheable or failed; fetch yourself).
+    """
+    pending = _fetches.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending), False
+
+    pending = asyncio.get_running_loop().create_future()
+    _fetches[key] = pending
+    try:
+        result = await _fetch(api_key, key, path, query, headers)
+        pending.set_result(result if isinstance(result, CachedResponse) else None)
+        return result, True
+    except BaseException:
+        pending.set_result(None)
+        raise
+    finally:
+        _fetches.pop(key, None)
+
+
+async def _refresh(api_key: KeySnapshot, key: str, path: str, query: str, headers):
+    try:
+        result, leader = await _single_flight(api_key, key, path, query, headers)
+        if leader and isinstance(result, _Passthrough):
+            await close_stream(api_key, result.upstream)
+    except UpstreamError:
+        pass
+    except Exception as e:
+        print("Response cache revalidation failed:", e)
+
+
+def _serve(entry: CachedResponse, cache_status: str, now: float):
+    response = Response(content=entry.body, status_code=entry.status_code)
+    response.raw_headers = entry.headers + [
+        (b"content-length", str(len(entry.body)).encode()),
+        (b"age", str(int(now - entry.stored_at)).encode()),
+        (b"x-cache", cache_status.upper().encode()),
+    ]
+    return response
+
+
+# -------------------------
+# Entry point
+# -------------------------
+async def cached_forward(request: Request, api_key: KeySnapshot, path: str):
+    if request.method != "GET" or not api_key.api_cache_ttl_seconds:
+        return await forward(request, api_key, path)
+
+    query = request.url.query
+    key = cache_key(api_key, path, query, request.headers)
+    headers = forward_headers(request)
+    now = time.time()
+
+    entry = await _backend.get(key)
+    if entry is not None:
+        age = now - entry.stored_at
+        if age < entry.ttl:
+            return _hit(request, entry, "hit", now)
+        if age < entry.ttl + entry.stale:
+            task = asyncio.create_task(_refresh(api_key, key, path, query, headers))
+            _refreshes.add(task)
+            task.add_done_callback(_refreshes.discard)
+            return _hit(request, entry, "stale", now)
+
+    request.state.cache_status = "miss"
+    if not getattr(request.state, "namespace", ""):
+        metrics.cache_miss_child.value += 1
+    try:
+        result, leader = await _single_flight(api_key, key, path, query, headers)
+    except UpstreamError as e:
+        return error_response(e)
+
+    if isinstance(result, CachedResponse):
+        return _serve(result, "miss", time.time())
+    if leader:
+        response = stream_response(api_key, result.upstream, result.buffered, result.chunks)
+        response.headers["x-cache"] = "BYPASS"
+        return response
+    # Leader's response could not be shared
+    return await forward(request, api_key, path)
+
+
+def _hit(request: Request, entry: CachedResponse, cache_status: str, now: float):
+    request.state.cache_status = cache_status
+    if not getattr(request.state, "namespace", ""):
+        (metrics.cache_hit_child if cache_status == "hit" else metrics.cache_stale_child).value += 1
+    return _serve(entry, cache_status, now)
+
+
+# -------------------------
+# Invalidation
+# -------------------------
+async def purge_apis(api_ids):
+    """
+    Drop cached responses after an API's upstream or cache config changed.
+    """
+    if isinstance(_backend, RedisCache):
+        try:
+            await _backend.purge_apis(api_ids)
+        except Exception as e:
+            print("Response cache purge failed:", e)
+    # The local LRU is purged in every worker by the "api" invalidation
+
+
+cache_invalidation.register("api", _local.purge_apis)
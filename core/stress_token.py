@@ -0,0 +1,23 @@
+# app/core/stress_token.py
+import hashlib
+import hmac
+
+from app.config import settings
+
+
+def _stress_token() -> str:
+    """
+    Shared secret that lets gateway-mode stress traffic into the stress:
+    namespace. Derived from SECRET_KEY unless STRESS_GATEWAY_SECRET is set,
+    so every worker (and the locust subprocesses it spawns) agrees on it.
+    """
+    if settings.STRESS_GATEWAY_SECRET:
+        return settings.STRESS_GATEWAY_SECRET
+    return hashlib.sha256(b"stress-gateway:" + settings.SECRET_KEY.encode("utf-8")).hexdigest()
+
+
+STRESS_TOKEN = _stress_token()
+
+
+def is_stress_token(value: str | None) -> bool:
+    return bool(value) and hmac.compare_digest(value.encode("utf-8"), STRESS_TOKEN.encode("utf-8"))
@@ -0,0 +1,107 @@
+# app/core/token_revocation.py
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import delete, update
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.redis import redis_client
+from app.auth import models
+
+
+REVOKED_PREFIX = "revoked_token:"
+# Present only while Redis holds the full set of active revocations.
+# If Redis restarts it disappears and checks fall back to SQL until resynced.
+# It expires after one token lifetime, so a revocation evicted under memory
+# pressure can be trusted away for at most that long; the periodic resync
+# reloads the set (and the marker) well before then.
+SYNCED_MARKER = "revoked_token:__synced__"
+
+
+def token_id(token: str, payload: dict) -> str:
+    """
+    Fixed-length revocation id: the token's jti, or a SHA-256 of the raw
+    token for tokens issued before jti was added.
+    """
+    return payload.get("jti") or hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _ttl_seconds(expires_at: datetime) -> int:
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return int((expires_at - datetime.now(timezone.utc)).total_seconds())
+
+
+async def revoke(revocation_id: str, expires_at: datetime):
+    ttl = _ttl_seconds(expires_at)
+    if ttl > 0:
+        await redis_client.set(REVOKED_PREFIX + revocation_id, 1, ex=ttl)
+
+
+async def is_token_revoked(db: AsyncSession, revocation_id: str) -> bool:
+    """
+    One Redis round trip in the common case; the indexed SQL lookup is only
+    used when Redis is unavailable or has lost its revocation set.
+    """
+    try:
+        pipe = redis_client.pipeline()
+        pipe.exists(REVOKED_PREFIX + revocation_id)
+        pipe.exists(SYNCED_MARKER)
+        revoked, synced = await pipe.execute()
+        if synced:
+            return bool(revoked)
+    except Exception as e:
+        print("Revocation cache unavailable:", e)
+
+    result = await db.execute(
+        select(models.BlacklistedTokens.id)
+        .where(models.BlacklistedTokens.token_id == revocation_id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def sync_revocations(db: AsyncSession):
+    """
+    Backfill token_id on legacy rows and load every unexpired revocation
+    into Redis.
+    """
+    legacy = await db.execute(
+        select(models.BlacklistedTokens.id, models.BlacklistedTokens.token)
+        .where(models.BlacklistedTokens.token_id.is_(None))
+    )
+    for row_id, token in legacy.all():
+        await db.execute(
+            update(models.BlacklistedTokens)
+            .where(models.BlacklistedTokens.id == row_id)
+            .values(token_id=hashlib.sha256(token.encode("utf-8")).hexdigest())
+        )
+    await db.commit()
+
+    result = await db.execute(
+        select(models.BlacklistedTokens.token_id, models.BlacklistedTokens.expires_at)
+        .where(models.BlacklistedTokens.expires_at > datetime.utcnow())
+    )
+
+    pipe = redis_client.pipeline()
+    for revocation_id, expires_at in result.all():
+        ttl = _ttl_seconds(expires_at)
+        if ttl > 0:
+            pipe.set(REVOKED_PREFIX + revocation_id, 1, ex=ttl)
+    pipe.set(SYNCED_MARKER, 1, ex=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    await pipe.execute()
+
+
+async def purge_expired_revocations(db: AsyncSession):
+    """
+    Expired tokens fail signature validation anyway, so their rows are dead
+    weight. Also resyncs Redis if it lost the revocation set.
+    """
+    await db.execute(
+        delete(models.BlacklistedTokens)
+        .where(models.BlacklistedTokens.expires_at <= datetime.utcnow())
+    )
+    await db.commit()
+
+    if not await redis_client.exists(SYNCED_MARKER):
+        await sync_revocations(db)
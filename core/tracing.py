@@ -0,0 +1,143 @@
+# app/core/tracing.py
+import time
+from time import perf_counter_ns
+
+from app.config import settings
+
+
+PHASES = ("key_lookup", "rate_limit", "handler", "counters", "usage_log", "commit")
+
+# Histogram buckets are powers of two in microseconds: bucket i holds
+# durations in [2^(i-1), 2^i) µs, the last one everything above ~8s.
+BUCKETS = 24
+
+
+class PhaseHistogram:
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, duration_ns: int):
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        self.buckets[min((duration_ns // 1000).bit_length(), BUCKETS - 1)] += 1
+
+    def quantile_us(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th sample.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return float(2 ** index)
+        return self.max_ns / 1000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "avg_us": round(self.total_ns / self.count / 1000, 1) if self.count else 0.0,
+            "p50_us": self.quantile_us(0.50),
+            "p99_us": self.quantile_us(0.99),
+            "max_us": round(self.max_ns / 1000, 1),
+        }
+
+
+phase_histograms = {phase: PhaseHistogram() for phase in PHASES}
+
+
+class RequestTrace:
+    """
+    Consecutive phase spans for one gateway request. `mark(phase)` closes
+    the span that started at the previous mark.
+    """
+    __slots__ = ("started_ns", "last_ns", "spans")
+
+    def __init__(self):
+        self.started_ns = self.last_ns = perf_counter_ns()
+        self.spans = []
+
+    def mark(self, phase: str):
+        now = perf_counter_ns()
+        self.spans.append((phase, self.last_ns, now))
+        self.last_ns = now
+
+
+def start_trace() -> RequestTrace | None:
+    """
+    None when tracing is off; callers guard every mark with `if trace:`
+    so the disabled cost is a single truth test per phase.
+    """
+    if settings.GATEWAY_TRACING or settings.DEBUG:
+        return RequestTrace()
+    return None
+
+
+def finish_trace(trace: RequestTrace, response=None, path: str = ""):
+    for phase, start_ns, end_ns in trace.spans:
+        phase_histograms[phase].record(end_ns - start_ns)
+
+    if response is not None and settings.DEBUG:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={(end_ns - start_ns) / 1e6:.3f}"
+            for phase, start_ns, end_ns in trace.spans
+        )
+
+    if _tracer is not None:
+        _export(trace, path)
+
+
+def timing_summary():
+    return {phase: histogram.summary() for phase, histogram in phase_histograms.items()}
+
+
+def reset_timings():
+    for phase in PHASES:
+        phase_histograms[phase] = PhaseHistogram()
+
+
+# -------------------------
+# Optional OpenTelemetry export
+# -------------------------
+def _init_tracer():
+    if not settings.OTEL_EXPORT_ENABLED:
+        return None
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OTEL_EXPORT_ENABLED is set but opentelemetry-sdk / otlp exporter are not installed")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "apimonitor-gateway"}))
+    provider.add_span_processor(
+        BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_ENDPOINT, insecure=True))
+    )
+    return provider.get_tracer("app.gateway")
+
+
+def _export(trace: RequestTrace, path: str):
+    from opentelemetry import trace as otel_trace
+
+    # perf_counter_ns has no epoch; shift spans onto wall-clock time
+    offset = time.time_ns() - perf_counter_ns()
+    root = _tracer.start_span("gateway " + path, start_time=trace.started_ns + offset)
+    context = otel_trace.set_span_in_context(root)
+    for phase, start_ns, end_ns in trace.spans:
+        span = _tracer.start_span(phase, context=context, start_time=start_ns + offset)
+        span.end(end_time=end_ns + offset)
+    root.end(end_time=trace.last_ns + offset)
+
+
+_tracer = _init_tracer()
@@ -0,0 +1,187 @@
+# app/core/upstream.py
+"""
+Forwarding for /gateway/{api_name}/{path}: one keep-alive httpx client per
+upstream origin, shared by every request in the worker, with request and
+response bodies streamed chunk by chunk (never buffered).
+"""
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.config import settings
+from app.core.api_key_cache import KeySnapshot
+
+
+# Per-connection headers that must not be forwarded (RFC 9110 §7.6.1),
+# plus the gateway's own credentials
+_HOP_BY_HOP = frozenset((
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+))
+# X-Forwarded-* are re-added below with this hop appended, never twice
+_FORWARDED_HEADERS = {"x-forwarded-for", "x-forwarded-proto", "x-forwarded-host"}
+_STRIPPED_REQUEST_HEADERS = _HOP_BY_HOP | _FORWARDED_HEADERS | {"host", "content-length", "x-api-key", "x-stress-test", "x-stress-token"}
+
+# origin → AsyncClient
+_clients = {}
+
+
+def _http2_available():
+    if not settings.UPSTREAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("UPSTREAM_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+_http2 = None
+
+
+def _client_for(origin: str) -> httpx.AsyncClient:
+    global _http2
+
+    client = _clients.get(origin)
+    if client is None:
+        if _http2 is None:
+            _http2 = _http2_available()
+        client = httpx.AsyncClient(
+            base_url=origin,
+            http2=_http2,
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            # Redirects are the client's business, not the gateway's
+            follow_redirects=False,
+        )
+        _clients[origin] = client
+    return client
+
+
+def _upstream_url(endpoint: str, path: str, query: str):
+    parts = urlsplit(endpoint)
+    # Rows created before endpoints were validated may still be relative
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise UpstreamError(502, "API endpoint is not an absolute http(s) URL")
+    origin = f"{parts.scheme}://{parts.netloc}"
+    target = parts.path.rstrip("/") + "/" + path.lstrip("/")
+    if query:
+        target += "?" + query
+    return origin, target
+
+
+def forward_headers(request: Request):
+    headers = [
+        (name, value) for name, value in request.headers.items()
+        if name not in _STRIPPED_REQUEST_HEADERS
+    ]
+    client_host = request.client.host if request.client else ""
+    forwarded_for = request.headers.get("x-forwarded-for")
+    headers.append(("x-forwarded-for", f"{forwarded_for}, {client_host}" if forwarded_for else client_host))
+    headers.append(("x-forwarded-proto", request.url.scheme))
+    headers.append(("x-forwarded-host", request.headers.get("host", "")))
+    return headers
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, detail: str, headers=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def error_response(error: UpstreamError):
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"detail": error.detail},
+        headers=error.headers
+    )
+
+
+async def open_stream(api_key: KeySnapshot, method: str, path: str, query: str, headers, content=None):
+    """
+    Send the request and return the upstream response with its body still
+    unread; the caller must close_stream it. Concurrency is bounded before
+    this point by app/core/concurrency_limiter.py.
+    """
+    origin, target = _upstream_url(api_key.api_endpoint, path, query)
+    client = _client_for(origin)
+    upstream_request = client.build_request(
+        method,
+        target,
+        headers=headers,
+        content=content,
+        timeout=httpx.Timeout(api_key.api_timeout_seconds or settings.UPSTREAM_TIMEOUT_SECONDS),
+    )
+
+    try:
+        return await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        raise UpstreamError(504, "Upstream timed out")
+    except httpx.HTTPError as e:
+        print(f"Upstream {origin} failed:", e)
+        raise UpstreamError(502, "Upstream unavailable")
+
+
+async def close_stream(api_key: KeySnapshot, upstream: httpx.Response):
+    await upstream.aclose()
+
+
+def response_headers(upstream: httpx.Response):
+    # Raw list keeps repeated headers (Set-Cookie) intact
+    return [
+        (name.lower(), value) for name, value in upstream.headers.raw
+        if name.lower().decode("latin-1") not in _HOP_BY_HOP
+    ]
+
+
+def stream_response(api_key: KeySnapshot, upstream: httpx.Response, buffered=(), chunks=None):
+    """
+    Relay the upstream body. `buffered` / `chunks` let a caller that has
+    already started reading (the response cache) hand over the rest.
+    """
+    chunks = chunks or upstream.aiter_raw()
+
+    async def body():
+        # Raw bytes: content-encoding passes through untouched
+        try:
+            for chunk in buffered:
+                yield chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await close_stream(api_key, upstream)
+
+    response = StreamingResponse(body(), status_code=upstream.status_code)
+    response.raw_headers = response_headers(upstream)
+    return response
+
+
+async def forward(request: Request, api_key: KeySnapshot, path: str):
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    try:
+        upstream = await open_stream(
+            api_key,
+            request.method,
+            path,
+            request.url.query,
+            forward_headers(request),
+            # Async iterator → chunked upload straight from the ASGI receive channel
+            content=request.stream() if has_body else None,
+        )
+    except UpstreamError as e:
+        return error_response(e)
+    return stream_response(api_key, upstream)
+
+
+async def close_upstream_clients():
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
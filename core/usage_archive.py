@@ -0,0 +1,264 @@
+# app/core/usage_archive.py
+import asyncio
+import json
+import os
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+
+from app.api import models
+from app.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+
+MANIFEST_FILE = "manifest.json"
+
+COLUMNS = (
+    "id",
+    "api_id",
+    "api_key_id",
+    "user_id",
+    "endpoint",
+    "method",
+    "status_code",
+    "response_time_ms",
+    "timestamp",
+)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="pyarrow is required for usage log archiving"
+        )
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("api_id", pa.int32()),
+        ("api_key_id", pa.int32()),
+        ("user_id", pa.int32()),
+        ("endpoint", pa.string()),
+        ("method", pa.string()),
+        ("status_code", pa.int16()),
+        ("response_time_ms", pa.int32()),
+        ("timestamp", pa.timestamp("ms")),
+    ])
+
+
+# -------------------------
+# Manifest
+# -------------------------
+def load_manifest(archive_dir: str = settings.USAGE_ARCHIVE_DIR):
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: dict, archive_dir: str):
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# -------------------------
+# Archiving
+# -------------------------
+async def _write_segment(db: AsyncSession, day: date, path: str):
+    """
+    Stream one day of usage_logs through a server-side cursor into a
+    Parquet file, holding at most one chunk of rows in memory.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+
+    stmt = (
+        select(*(getattr(models.UsageLog, column) for column in COLUMNS))
+        .where(models.UsageLog.timestamp >= start, models.UsageLog.timestamp < end)
+        .order_by(models.UsageLog.id)
+        .execution_options(yield_per=settings.USAGE_ARCHIVE_CHUNK_SIZE)
+    )
+
+    schema = _schema()
+    writer = None
+    rows = 0
+    min_id = max_id = None
+
+    try:
+        result = await db.stream(stmt)
+        async for chunk in result.partitions():
+            columns = list(zip(*chunk))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            await asyncio.to_thread(writer.write_batch, batch)
+
+            rows += len(chunk)
+            min_id = chunk[0].id if min_id is None else min_id
+            max_id = chunk[-1].id
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return {"rows": rows, "min_id": min_id, "max_id": max_id}
+
+
+async def _delete_archived_rows(db: AsyncSession, day: date, segment: dict, archive_dir: str, manifest: dict):
+    # Only drop rows once the segment and manifest are durable
+    day_start = datetime.combine(day, datetime.min.time())
+    await db.execute(
+        delete(models.UsageLog).where(
+            models.UsageLog.timestamp >= day_start,
+            models.UsageLog.timestamp < day_start + timedelta(days=1),
+            models.UsageLog.id <= segment["max_id"]
+        )
+    )
+    await db.commit()
+    segment["pending"] = False
+    _save_manifest(manifest, archive_dir)
+
+
+async def archive_usage_logs(
+    db: AsyncSession,
+    start: date,
+    end: date,
+    archive_dir: str = settings.USAGE_ARCHIVE_DIR
+):
+    """
+    Archive the closed days in [start, end) to one Parquet segment per day,
+    record them in the manifest and delete the archived rows.
+    """
+    _require_pyarrow()
+
+    if end > datetime.utcnow().date():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only closed (past) days can be archived"
+        )
+
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    segments_by_day = {segment["start"]: segment for segment in manifest["segments"]}
+
+    created = []
+    day = start
+    while day < end:
+        segment = segments_by_day.get(day.isoformat())
+        if segment is not None:
+            if segment.get("pending"):
+                # Written on an earlier run whose delete never committed
+                await _delete_archived_rows(db, day, segment, archive_dir, manifest)
+            day += timedelta(days=1)
+            continue
+
+        file_name = f"usage_logs_{day.strftime('%Y%m%d')}.parquet"
+        tmp_path = os.path.join(archive_dir, file_name + ".tmp")
+        stats = await _write_segment(db, day, tmp_path)
+
+        if not stats["rows"]:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, os.path.join(archive_dir, file_name))
+            segment = {
+                "file": file_name,
+                "start": day.isoformat(),
+                "end": (day + timedelta(days=1)).isoformat(),
+                "created_at": datetime.utcnow().isoformat(),
+                # Until the archived rows are deleted; reruns finish the job
+                "pending": True,
+                **stats
+            }
+            manifest["segments"].append(segment)
+            _save_manifest(manifest, archive_dir)
+
+            await _delete_archived_rows(db, day, segment, archive_dir, manifest)
+            created.append(segment)
+
+        day += timedelta(days=1)
+
+    return created
+
+
+# -------------------------
+# Historical queries
+# -------------------------
+def _summarize(segment_paths: list, start: datetime, end: datetime):
+    tables = [
+        pq.read_table(
+            path,
+            columns=["api_id", "status_code", "response_time_ms", "timestamp"],
+            filters=[("timestamp", ">=", start), ("timestamp", "<", end)],
+            memory_map=True
+        )
+        for path in segment_paths
+    ]
+    if not tables:
+        return {"total_calls": 0, "error_count": 0, "apis": []}
+
+    table = pa.concat_tables(tables)
+    errors = pc.sum(pc.greater_equal(table["status_code"], 400)).as_py() or 0
+
+    per_api = table.group_by("api_id").aggregate([
+        ("response_time_ms", "count"),
+        ("response_time_ms", "tdigest", pc.TDigestOptions(q=[0.5, 0.95, 0.99])),
+    ])
+
+    apis = []
+    for row in per_api.to_pylist():
+        p50, p95, p99 = row["response_time_ms_tdigest"]
+        apis.append({
+            "api_id": row["api_id"],
+            "total_calls": row["response_time_ms_count"],
+            "p50_response_time_ms": p50,
+            "p95_response_time_ms": p95,
+            "p99_response_time_ms": p99,
+        })
+
+    return {"total_calls": table.num_rows, "error_count": errors, "apis": apis}
+
+
+async def query_archive(
+    start: datetime,
+    end: datetime,
+    archive_dir: str = settings.USAGE_ARCHIVE_DIR
+):
+    """
+    Answer count / latency-percentile questions for an archived range from
+    the memory-mapped segments, without touching the database.
+    """
+    _require_pyarrow()
+
+    # Segments and their timestamps are naive UTC; "...Z" / "+02:00" query
+    # bounds would not compare with them
+    start, end = (
+        value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+        for value in (start, end)
+    )
+
+    manifest = load_manifest(archive_dir)
+    paths = [
+        os.path.join(archive_dir, segment["file"])
+        for segment in manifest["segments"]
+        if datetime.fromisoformat(segment["start"]) < end
+        and datetime.fromisoformat(segment["end"]) > start
+    ]
+
+    return await asyncio.to_thread(_summarize, paths, start, end)
@@ -0,0 +1,351 @@
+# app/core/usage_log_partitions.py
+from datetime import datetime, date, timedelta
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+
+TABLE = "usage_logs"
+LEGACY_TABLE = "usage_logs_unpartitioned"
+
+# Serialises maintenance across workers: GET_LOCK name on MySQL,
+# pg_advisory_xact_lock key on PostgreSQL
+LOCK_NAME = "usage_logs_partitions"
+ADVISORY_LOCK_ID = 0x75736C67
+
+
+# -------------------------
+# Period helpers
+# -------------------------
+def period_start(day: date, interval: str) -> date:
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start: date, interval: str) -> date:
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: date, interval: str) -> str:
+    """
+    day → p20250131, month → p202501
+    """
+    return "p" + start.strftime("%Y%m" if interval == "month" else "%Y%m%d")
+
+
+def partition_start(name: str) -> date | None:
+    digits = name.rsplit("p", 1)[-1]
+    try:
+        if len(digits) == 6:
+            return datetime.strptime(digits, "%Y%m").date()
+        return datetime.strptime(digits, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def usage_window(start: datetime | None, end: datetime | None):
+    """
+    Clamp an analytics query to a bounded time range so MySQL / PostgreSQL
+    only scan the partitions inside it. Defaults to the retention period.
+    """
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=settings.USAGE_LOG_RETENTION_DAYS)
+    return start, end
+
+
+# -------------------------
+# Partition manager
+# -------------------------
+class UsageLogPartitionManager:
+    """
+    Keeps usage_logs range-partitioned on `timestamp`.
+
+    * MySQL: RANGE (TO_DAYS(timestamp)) partitions with a trailing
+      p_future MAXVALUE partition, split off as periods are pre-created.
+    * PostgreSQL: declarative partitions usage_logs_pYYYYMMDD.
+    * SQLite: no native partitioning, expired rows are deleted by range
+      over the timestamp index instead.
+
+    Expired partitions are dropped whole (DROP PARTITION / DROP TABLE),
+    which is O(1) regardless of how many rows they hold.
+
+    Turning the plain table into a partitioned one is a one-off migration
+    (partition_table, run from POST /admin/analytics/partitions/convert);
+    the periodic maintain() only manages partitions of a table that is
+    already partitioned. Both run under a database lock, so concurrent
+    workers never interleave.
+    """
+
+    def __init__(
+        self,
+        interval: str = settings.USAGE_LOG_PARTITION_INTERVAL,
+        ahead: int = settings.USAGE_LOG_PARTITIONS_AHEAD,
+        retention_days: int = settings.USAGE_LOG_RETENTION_DAYS
+    ):
+        if interval not in ("day", "month"):
+            raise ValueError("interval must be 'day' or 'month'")
+
+        self.interval = interval
+        self.ahead = ahead
+        self.retention_days = retention_days
+
+    # ---------- public API ----------
+
+    async def maintain(self, db: AsyncSession, today: date | None = None):
+        """
+        Pre-create upcoming partitions and drop expired ones. Does nothing
+        (but says so) while the table is not partitioned yet.
+        """
+        today = today or datetime.utcnow().date()
+        dialect = db.bind.dialect.name
+
+        if dialect not in ("mysql", "postgresql"):
+            result = await self._prune_rows(db, today)
+            await db.commit()
+            return result
+
+        if not await self._lock(db, dialect):
+            # Another worker is maintaining right now
+            return {"created": [], "dropped": [], "skipped": "locked"}
+        try:
+            if not await self._is_partitioned(db, dialect):
+                print(
+                    f"WARNING: {TABLE} is not partitioned; partitions are not being "
+                    "maintained. Run POST /admin/analytics/partitions/convert once."
+                )
+                return {"created": [], "dropped": [], "skipped": "not_partitioned"}
+
+            if dialect == "mysql":
+                result = await self._maintain_mysql(db, today)
+            else:
+                result = await self._maintain_postgresql(db, today)
+        finally:
+            await self._unlock(db, dialect)
+
+        await db.commit()
+        return result
+
+    async def partition_table(self, db: AsyncSession, drop_foreign_keys: bool = False, today: date | None = None):
+        """
+        One-off conversion of a plain usage_logs into a partitioned table.
+
+        MySQL cannot partition a table with foreign keys, so they are only
+        dropped when `drop_foreign_keys` is set; otherwise ValueError names
+        them. Raises ValueError when the table is already partitioned.
+        """
+        today = today or datetime.utcnow().date()
+        dialect = db.bind.dialect.name
+        if dialect not in ("mysql", "postgresql"):
+            raise ValueError(f"{dialect} does not support table partitioning")
+
+        if not await self._lock(db, dialect):
+            raise ValueError("Partition maintenance is already running")
+        try:
+            if await self._is_partitioned(db, dialect):
+                raise ValueError(f"{TABLE} is already partitioned")
+
+            if dialect == "mysql":
+                await self._partition_mysql_table(db, today, drop_foreign_keys)
+            else:
+                await self._partition_postgresql_table(db, today)
+        finally:
+            await self._unlock(db, dialect)
+
+        await db.commit()
+        return await self.maintain(db, today)
+
+    def upcoming(self, today: date):
+        start = period_start(today, self.interval)
+        periods = []
+        for _ in range(self.ahead + 1):
+            periods.append(start)
+            start = next_period(start, self.interval)
+        return periods
+
+    def is_expired(self, start: date, today: date) -> bool:
+        cutoff = today - timedelta(days=self.retention_days)
+        # Only drop a partition once its whole range is past the cutoff
+        return next_period(start, self.interval) <= cutoff
+
+    # ---------- Locking ----------
+
+    async def _lock(self, db: AsyncSession, dialect: str) -> bool:
+        if dialect == "mysql":
+            # Session-scoped: survives the implicit commits of DDL
+            acquired = (await db.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME})).scalar()
+        else:
+            # Released with the transaction
+            acquired = (await db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID}
+            )).scalar()
+        return bool(acquired)
+
+    async def _unlock(self, db: AsyncSession, dialect: str):
+        # Before commit: the session may hand its connection back afterwards
+        if dialect == "mysql":
+            await db.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+
+    async def _is_partitioned(self, db: AsyncSession, dialect: str) -> bool:
+        if dialect == "mysql":
+            return bool(await self._mysql_partitions(db))
+        return bool((await db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"
+        ), {"table": TABLE})).scalar())
+
+    # ---------- MySQL ----------
+
+    async def _mysql_partitions(self, db: AsyncSession):
+        result = await db.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+            "AND PARTITION_NAME IS NOT NULL"
+        ), {"table": TABLE})
+        return [row[0] for row in result.all()]
+
+    async def _partition_mysql_table(self, db: AsyncSession, today: date, drop_foreign_keys: bool):
+        # Partitioned InnoDB tables cannot carry foreign keys and every
+        # unique key must include the partitioning column.
+        result = await db.execute(text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {"table": TABLE})
+        foreign_keys = [row[0] for row in result.all()]
+        if foreign_keys and not drop_foreign_keys:
+            raise ValueError(
+                f"{TABLE} has foreign keys ({', '.join(foreign_keys)}) that MySQL cannot "
+                "keep on a partitioned table; pass drop_foreign_keys to drop them"
+            )
+        for fk_name in foreign_keys:
+            print(f"Dropping foreign key {fk_name} on {TABLE} for partitioning")
+            await db.execute(text(f"ALTER TABLE {TABLE} DROP FOREIGN KEY `{fk_name}`"))
+
+        oldest = (await db.execute(text(f"SELECT MIN(`timestamp`) FROM {TABLE}"))).scalar()
+        start = period_start(oldest.date() if oldest else today, self.interval)
+
+        last = self.upcoming(today)[-1]
+        partitions = []
+        while start <= last:
+            end = next_period(start, self.interval)
+            partitions.append(
+                f"PARTITION {partition_name(start, self.interval)} "
+                f"VALUES LESS THAN (TO_DAYS('{end.isoformat()}'))"
+            )
+            start = end
+        partitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+
+        await db.execute(text(
+            f"ALTER TABLE {TABLE} "
+            "MODIFY `timestamp` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, `timestamp`)"
+        ))
+        await db.execute(text(
+            f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(`timestamp`)) "
+            f"({', '.join(partitions)})"
+        ))
+
+    async def _maintain_mysql(self, db: AsyncSession, today: date):
+        existing = await self._mysql_partitions(db)
+
+        created = []
+        for start in self.upcoming(today):
+            name = partition_name(start, self.interval)
+            if name in existing:
+                continue
+            end = next_period(start, self.interval)
+            # p_future is always empty ahead of "now", so this is a metadata-only split
+            await db.execute(text(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION p_future INTO ("
+                f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{end.isoformat()}')), "
+                "PARTITION p_future VALUES LESS THAN MAXVALUE)"
+            ))
+            created.append(name)
+
+        dropped = [
+            name for name in existing
+            if (start := partition_start(name)) and self.is_expired(start, today)
+        ]
+        if dropped:
+            await db.execute(text(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(dropped)}"))
+
+        return {"created": created, "dropped": dropped}
+
+    # ---------- PostgreSQL ----------
+
+    async def _postgresql_partitions(self, db: AsyncSession):
+        result = await db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ), {"table": TABLE})
+        return [row[0] for row in result.all()]
+
+    async def _create_postgresql_partition(self, db: AsyncSession, start: date):
+        name = f"{TABLE}_{partition_name(start, self.interval)}"
+        end = next_period(start, self.interval)
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        return name
+
+    async def _partition_postgresql_table(self, db: AsyncSession, today: date):
+        # A plain table cannot be turned into a partitioned one in place:
+        # swap in a partitioned copy and move the rows across once.
+        await db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}"))
+        await db.execute(text(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) "
+            'PARTITION BY RANGE ("timestamp")'
+        ))
+        await db.execute(text(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")'))
+        await db.execute(text(f'CREATE INDEX ON {TABLE} ("timestamp")'))
+        await db.execute(text(f'CREATE INDEX ON {TABLE} (api_id, "timestamp")'))
+
+        oldest = (await db.execute(text(f'SELECT MIN("timestamp") FROM {LEGACY_TABLE}'))).scalar()
+        start = period_start(oldest.date() if oldest else today, self.interval)
+        while start <= period_start(today, self.interval):
+            await self._create_postgresql_partition(db, start)
+            start = next_period(start, self.interval)
+
+        await db.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}"))
+        # Keep the id sequence alive when the legacy table goes away
+        await db.execute(text(
+            f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq OWNED BY {TABLE}.id"
+        ))
+        await db.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+
+    async def _maintain_postgresql(self, db: AsyncSession, today: date):
+        existing = await self._postgresql_partitions(db)
+
+        created = []
+        for start in self.upcoming(today):
+            name = f"{TABLE}_{partition_name(start, self.interval)}"
+            if name not in existing:
+                created.append(await self._create_postgresql_partition(db, start))
+
+        dropped = [
+            name for name in existing
+            if (start := partition_start(name)) and self.is_expired(start, today)
+        ]
+        for name in dropped:
+            await db.execute(text(f"DROP TABLE {name}"))
+
+        return {"created": created, "dropped": dropped}
+
+    # ---------- SQLite / fallback ----------
+
+    async def _prune_rows(self, db: AsyncSession, today: date):
+        cutoff = today - timedelta(days=self.retention_days)
+        result = await db.execute(
+            text(f"DELETE FROM {TABLE} WHERE timestamp < :cutoff"),
+            {"cutoff": datetime.combine(cutoff, datetime.min.time())}
+        )
+        return {"created": [], "dropped": [], "deleted_rows": result.rowcount}
+
+
+partition_manager = UsageLogPartitionManager()
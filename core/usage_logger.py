@@ -13,9 +13,11 @@ async def log_usage(
     endpoint: str,
     method: str,
     status_code: int,
-    response_time_ms: int
+    response_time_ms: int,
+    namespace: str = ""
 ):
-    log = models.UsageLog(
+    model = models.StressUsageLog if namespace else models.UsageLog
+    log = model(
         api_id=api_id,
         api_key_id=api_key_id,
         user_id=user_id,
@@ -4,13 +4,26 @@ from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
 
 
-engine = create_async_engine(settings.DATABASE_URL, connect_args={"ssl": False})
+# aiosqlite has no ssl argument; SQLite is used for local benchmarks
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    connect_args={} if settings.DATABASE_URL.startswith("sqlite") else {"ssl": False}
+)
 
 SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
 
 class Base(DeclarativeBase):
     pass
 
+def on_commit(session: AsyncSession, func, *args):
+    """
+    Run `await func(*args)` once db_commit has committed the session, e.g.
+    to invalidate caches only after other workers can read the new rows.
+    Dropped if the commit fails.
+    """
+    session.info.setdefault("on_commit", []).append((func, args))
+
+
 async def db_commit(session: AsyncSession):
     try:
         print(settings.DEBUG)
@@ -20,9 +33,13 @@ async def db_commit(session: AsyncSession):
         #     print("Database rollback successful")
         #     await session.rollback()
     except Exception as e:
+        session.info.pop("on_commit", None)
         await session.rollback()
         raise e
 
+    for func, args in session.info.pop("on_commit", ()):
+        await func(*args)
+
 
 
 async def get_db():
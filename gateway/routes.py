@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from app.core.response_cache import cached_forward
+
+router = APIRouter(
+    prefix="/gateway",
+    tags=["Gateway"]
+)
+
+# No OPTIONS: preflights carry no API key, so they cannot be authorised
+PROXY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"]
+
+
+# --------------------------------------------------
+# Reverse proxy to the registered API endpoint
+# --------------------------------------------------
+# rate_limit_middleware has already authenticated the key, checked it
+# belongs to {api_name}, and applied the limiter; the snapshot it resolved
+# carries the upstream endpoint, so no further lookups happen here.
+@router.api_route("/{api_name}", methods=PROXY_METHODS, include_in_schema=False)
+@router.api_route("/{api_name}/{path:path}", methods=PROXY_METHODS)
+async def proxy(request: Request, api_name: str, path: str = ""):
+    api_key = getattr(request.state, "api_key", None)
+    if api_key is None:
+        return JSONResponse(status_code=401, content={"detail": "API key missing"})
+    return await cached_forward(request, api_key, path)
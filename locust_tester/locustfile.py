@@ -1,22 +1,102 @@
+import itertools
+import json
 import os
-from locust import HttpUser, task, between
+import locust.stats
+from locust import HttpUser, LoadTestShape, between, constant_throughput
+
+# The runner tails the history CSV for live snapshots; locust only flushes
+# it every 10s by default
+locust.stats.CSV_STATS_FLUSH_INTERVAL_SEC = 1
+
+# Read config from Environment Variables (set by locust_tester/manager.py)
+STRESS_MODE = os.getenv("STRESS_MODE", "bypass")
+STRESS_TOKEN = os.getenv("STRESS_TOKEN", "")
+ENDPOINTS = json.loads(os.getenv("STRESS_ENDPOINTS") or "[]") or [
+    {"path": os.getenv("TARGET_ENDPOINT", "/"), "method": "GET", "weight": 1, "body": None}
+]
+API_KEYS = json.loads(os.getenv("STRESS_API_KEYS") or "[]") or (
+    [os.getenv("API_KEY")] if os.getenv("API_KEY") else []
+)
+USERS = int(os.getenv("STRESS_USERS", "10"))
+SPAWN_RATE = float(os.getenv("STRESS_SPAWN_RATE", "2"))
+DURATION = int(os.getenv("STRESS_DURATION", "10"))
+MIN_WAIT = float(os.getenv("STRESS_MIN_WAIT", "1"))
+MAX_WAIT = float(os.getenv("STRESS_MAX_WAIT", "2"))
+LOAD_SHAPE = json.loads(os.getenv("STRESS_LOAD_SHAPE") or "null")
+
+# Round-robin key assignment; with --processes each worker starts at a
+# different offset so the tiers still interleave
+_user_numbers = itertools.count(os.getpid())
+
+
+def _endpoint_task(endpoint):
+    method = endpoint["method"]
+    path = endpoint["path"]
+    body = endpoint.get("body")
+    name = f"{method} {path}"
+
+    def run(user):
+        user.client.request(method, path, name=name, json=body)
+
+    run.__name__ = f"{method.lower()}_{path.strip('/').replace('/', '_') or 'root'}"
+    return run
+
+
+def _wait_time():
+    if LOAD_SHAPE and LOAD_SHAPE["kind"] == "constant_rate":
+        # Open-model pacing: each user fires target_rps / USERS times per
+        # second regardless of latency (as long as latency stays below the
+        # per-user interval; size num_users >= target_rps x p99 seconds)
+        return constant_throughput(LOAD_SHAPE["target_rps"] / USERS)
+    return between(MIN_WAIT, MAX_WAIT)
 
-# Read config from Environment Variables
-TARGET_ENDPOINT = os.getenv("TARGET_ENDPOINT", "/")
-API_KEY = os.getenv("API_KEY", "")
 
 class DynamicApiUser(HttpUser):
-    wait_time = between(1, 2)
+    wait_time = _wait_time()
+    tasks = {_endpoint_task(endpoint): endpoint["weight"] for endpoint in ENDPOINTS}
 
     def on_start(self):
         # 1. Add standard API Key (Even if we bypass DB checks, it's good practice to send it)
-        if API_KEY:
-            self.client.headers.update({"X-API-KEY": API_KEY})
-        
-        # 2. INJECT BYPASS HEADER
-        # This tells the backend: "I am a stress test. Do not log me."
-        self.client.headers.update({"X-STRESS-TEST": "true"})
-
-    @task
-    def stress_test_endpoint(self):
-        self.client.get(TARGET_ENDPOINT, name=TARGET_ENDPOINT)
\ No newline at end of file
+        if API_KEYS:
+            self.client.headers.update({"X-API-KEY": API_KEYS[next(_user_numbers) % len(API_KEYS)]})
+
+        # 2. INJECT STRESS HEADER
+        # bypass  → "I am a stress test. Do not log me."
+        # gateway → "Measure the real path, but keep my data in the stress namespace."
+        self.client.headers.update({"X-STRESS-TEST": "gateway" if STRESS_MODE == "gateway" else "true"})
+        if STRESS_MODE == "gateway":
+            # Without it the gateway treats the run as production traffic
+            self.client.headers.update({"X-STRESS-TOKEN": STRESS_TOKEN})
+
+
+def target_users(shape: dict, elapsed: float) -> int:
+    """
+    User count a step/ramp/spike shape wants `elapsed` seconds into the run.
+    """
+    kind = shape["kind"]
+    if kind == "step":
+        steps = int(elapsed // shape["step_seconds"]) + 1
+        return min(USERS, steps * shape["step_users"])
+    if kind == "ramp":
+        ramp_seconds = shape.get("ramp_seconds") or DURATION
+        start = min(USERS, shape.get("start_users", 0))
+        progress = min(elapsed / ramp_seconds, 1.0)
+        return max(1, round(start + (USERS - start) * progress))
+    if kind == "spike":
+        spike_start = shape["spike_at_seconds"]
+        if spike_start <= elapsed < spike_start + shape["spike_seconds"]:
+            return USERS
+        return min(USERS, shape.get("base_users", 1))
+    return USERS
+
+
+if LOAD_SHAPE and LOAD_SHAPE["kind"] != "constant_rate":
+    class StressLoadShape(LoadTestShape):
+        def tick(self):
+            elapsed = self.get_run_time()
+            if elapsed >= DURATION:
+                return None
+            users = target_users(LOAD_SHAPE, elapsed)
+            # Spikes should arrive (and leave) at once rather than at spawn_rate
+            rate = USERS if LOAD_SHAPE["kind"] == "spike" else SPAWN_RATE
+            return users, rate
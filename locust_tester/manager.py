@@ -0,0 +1,350 @@
+# app/locust_tester/manager.py
+"""
+Owns every locust subprocess started by /stress/start.
+
+Runs execute as background tasks, not inside the HTTP response, so a
+client disconnect never orphans a load generator: the run finishes (or is
+cancelled via /stress/runs/{id}/cancel) and the stream can be re-attached.
+Admission is capped by STRESS_MAX_CONCURRENT_RUNS and STRESS_MAX_TOTAL_USERS;
+requests over the caps wait in a FIFO queue of STRESS_MAX_QUEUED_RUNS.
+
+The registry is per API worker process; serve /stress from one worker (or
+pin it with the proxy) if the caps must hold cluster-wide.
+"""
+import asyncio
+import json
+import os
+import shutil
+import signal
+import tempfile
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.database import SessionLocal
+from app.core.stress_token import STRESS_TOKEN
+from app.locust_tester.schemas import StressTestConfig
+from app.locust_tester.stats import HistoryTail, snapshot_from_history, read_final_stats
+from app.locust_tester import services
+
+LOCUST_FILE_PATH = "app/locust_tester/locustfile.py"
+
+# locust rewrites its CSVs once per second (CSV_STATS_INTERVAL_SEC)
+SNAPSHOT_INTERVAL_SECONDS = 1.0
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class StressRunState:
+    def __init__(self, config: StressTestConfig):
+        self.run_id = str(uuid.uuid4())
+        self.config = config
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.task = None
+        self.cancel_requested = False
+        self.last_snapshot = None
+        self.events = []
+        self.changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    async def emit(self, payload: dict):
+        payload = {"run_id": self.run_id, **payload}
+        async with self.changed:
+            self.events.append(payload)
+            self.changed.notify_all()
+
+    def describe(self):
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "mode": self.config.mode,
+            "target_endpoint": self.config.target_endpoint,
+            "num_users": self.config.num_users,
+            "processes": self.config.processes,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_snapshot": self.last_snapshot,
+        }
+
+
+class StressRunManager:
+    def __init__(self):
+        self.runs = OrderedDict()
+        self.queue = deque()
+        self.running = set()
+
+    # -------------------------
+    # Admission
+    # -------------------------
+    @property
+    def users_in_use(self):
+        return sum(self.runs[run_id].config.num_users for run_id in self.running)
+
+    def _fits(self, run: StressRunState):
+        return (
+            len(self.running) < settings.STRESS_MAX_CONCURRENT_RUNS
+            and self.users_in_use + run.config.num_users <= settings.STRESS_MAX_TOTAL_USERS
+        )
+
+    async def submit(self, config: StressTestConfig) -> StressRunState:
+        if config.num_users > settings.STRESS_MAX_TOTAL_USERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"num_users exceeds the limit of {settings.STRESS_MAX_TOTAL_USERS}"
+            )
+        if config.processes > settings.STRESS_MAX_PROCESSES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"processes exceeds the limit of {settings.STRESS_MAX_PROCESSES}"
+            )
+        if len(self.queue) >= settings.STRESS_MAX_QUEUED_RUNS:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many stress runs queued",
+                headers={"Retry-After": str(config.duration)}
+            )
+
+        run = StressRunState(config)
+        self.runs[run.run_id] = run
+        self.queue.append(run.run_id)
+        await run.emit({"type": "queued", "position": len(self.queue)})
+        self._dispatch()
+        return run
+
+    def _dispatch(self):
+        # Strict FIFO: a large run at the head is not overtaken by small ones
+        while self.queue:
+            run = self.runs[self.queue[0]]
+            if not self._fits(run):
+                break
+            self.queue.popleft()
+            self.running.add(run.run_id)
+            run.status = "running"
+            run.task = asyncio.create_task(self._execute(run), name=f"stress-run-{run.run_id}")
+
+    def _finished(self, run: StressRunState):
+        self.running.discard(run.run_id)
+        finished = [r for r in self.runs.values() if r.done]
+        for old in finished[:max(len(finished) - settings.STRESS_FINISHED_RUNS_KEPT, 0)]:
+            del self.runs[old.run_id]
+        self._dispatch()
+
+    # -------------------------
+    # Execution
+    # -------------------------
+    def _command(self, config: StressTestConfig, csv_prefix: str):
+        cmd = [
+            "locust",
+            "-f", LOCUST_FILE_PATH,
+            "--headless",
+            "--host", config.target_host,
+            # Machine-readable stats instead of console tables
+            "--csv", csv_prefix,
+            # Full history makes the Aggregated row carry current-window
+            # percentiles instead of cumulative ones
+            "--csv-full-history",
+            "--only-summary",
+        ]
+        if config.load_shape is None or config.load_shape.kind == "constant_rate":
+            cmd += [
+                "--users", str(config.num_users),
+                "--spawn-rate", str(config.spawn_rate),
+                "--run-time", f"{config.duration}s",
+            ]
+        # Otherwise the locustfile's LoadTestShape drives users and stops the run
+        if config.processes:
+            # Local master + N forked workers; stats are still written by the master
+            cmd += ["--processes", str(config.processes)]
+        return cmd
+
+    def _environment(self, config: StressTestConfig):
+        env = os.environ.copy()
+        env["STRESS_MODE"] = config.mode
+        # Admits "gateway" traffic to the stress: namespace, see app/core/stress_token.py
+        env["STRESS_TOKEN"] = STRESS_TOKEN if config.mode == "gateway" else ""
+        env["STRESS_ENDPOINTS"] = json.dumps([e.model_dump() for e in config.endpoint_mix()])
+        env["STRESS_API_KEYS"] = json.dumps(config.all_api_keys())
+        env["STRESS_USERS"] = str(config.num_users)
+        env["STRESS_SPAWN_RATE"] = str(config.spawn_rate)
+        env["STRESS_DURATION"] = str(config.duration)
+        env["STRESS_MIN_WAIT"] = str(config.min_wait)
+        env["STRESS_MAX_WAIT"] = str(config.max_wait)
+        env["STRESS_LOAD_SHAPE"] = config.load_shape.model_dump_json() if config.load_shape else ""
+        return env
+
+    async def _execute(self, run: StressRunState):
+        config = run.config
+        run.started_at = datetime.utcnow()
+        csv_dir = tempfile.mkdtemp(prefix="stress-run-")
+        csv_prefix = os.path.join(csv_dir, "run")
+
+        env = self._environment(config)
+
+        run_status = "failed"
+        reader = None
+        try:
+            run.process = await asyncio.create_subprocess_exec(
+                *self._command(config, csv_prefix),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=env,
+                # Own process group so cancel/shutdown also reaps --processes workers
+                start_new_session=True
+            )
+            if run.cancel_requested:
+                # Cancelled while spawning: cancel() had no process to signal yet
+                os.killpg(run.process.pid, signal.SIGTERM)
+            await run.emit({"type": "started", "mode": config.mode})
+
+            reader = asyncio.create_task(self._forward_output(run))
+            history = HistoryTail(f"{csv_prefix}_stats_history.csv")
+            while not reader.done():
+                await asyncio.wait({reader}, timeout=SNAPSHOT_INTERVAL_SECONDS)
+                await self._emit_snapshots(run, history)
+            await self._emit_snapshots(run, history)
+
+            exit_code = await run.process.wait()
+            aggregated, endpoints = read_final_stats(f"{csv_prefix}_stats.csv")
+            # locust exits 1 when any request failed; that is still a finished run
+            if run.cancel_requested:
+                run_status = "cancelled"
+            elif aggregated is not None:
+                run_status = "completed"
+
+            async with SessionLocal() as db:
+                record = await services.save_run(
+                    db, run.run_id, config, run.started_at, run_status, aggregated, endpoints
+                )
+            await run.emit({"type": "summary", "exit_code": exit_code, "run": record})
+
+        except asyncio.CancelledError:
+            run_status = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Stress run {run.run_id} failed:", e)
+            await run.emit({"type": "error", "error": str(e)})
+
+        finally:
+            if reader is not None:
+                reader.cancel()
+            await self._reap(run)
+            shutil.rmtree(csv_dir, ignore_errors=True)
+            run.status = run_status
+            run.finished_at = datetime.utcnow()
+            async with run.changed:
+                run.changed.notify_all()
+            self._finished(run)
+
+    async def _forward_output(self, run: StressRunState):
+        # Always drain stdout so locust never blocks on a full pipe
+        while True:
+            line = await run.process.stdout.readline()
+            if not line:
+                break
+            if run.config.include_logs:
+                text = line.decode("utf-8").strip()
+                if text:
+                    await run.emit({"type": "log", "log": text})
+
+    async def _emit_snapshots(self, run: StressRunState, history: HistoryTail):
+        for row in history.read_new_rows():
+            if row.get("Name") == "Aggregated":
+                run.last_snapshot = snapshot_from_history(row)
+                await run.emit(run.last_snapshot)
+
+    async def _reap(self, run: StressRunState):
+        process = run.process
+        if process is None or process.returncode is not None:
+            return
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(process.wait(), timeout=settings.STRESS_KILL_GRACE_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    # -------------------------
+    # Control
+    # -------------------------
+    def get(self, run_id: str) -> StressRunState | None:
+        return self.runs.get(run_id)
+
+    async def cancel(self, run_id: str):
+        run = self.runs.get(run_id)
+        if run is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stress run {run_id} is not active")
+        if run.done:
+            return run
+
+        run.cancel_requested = True
+        if run.status == "queued":
+            self.queue.remove(run_id)
+            run.status = "cancelled"
+            run.finished_at = datetime.utcnow()
+            await run.emit({"type": "cancelled"})
+            self._finished(run)
+        elif run.process is not None and run.process.returncode is None:
+            # SIGTERM lets locust write its final CSVs; _execute records the run
+            try:
+                os.killpg(run.process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        return run
+
+    async def stream(self, run: StressRunState, start: int = 0):
+        """
+        Replays the run's events from `start`, then follows it live. Leaving
+        the stream never affects the run itself.
+        """
+        index = start
+        while True:
+            async with run.changed:
+                await run.changed.wait_for(lambda: index < len(run.events) or run.done)
+                pending = run.events[index:]
+            for event in pending:
+                yield event
+            index += len(pending)
+            if run.done and index >= len(run.events):
+                return
+
+    def overview(self):
+        return {
+            "running": [self.runs[run_id].describe() for run_id in self.running],
+            "queued": [self.runs[run_id].describe() for run_id in self.queue],
+            "users_in_use": self.users_in_use,
+            "limits": {
+                "max_concurrent_runs": settings.STRESS_MAX_CONCURRENT_RUNS,
+                "max_total_users": settings.STRESS_MAX_TOTAL_USERS,
+                "max_queued_runs": settings.STRESS_MAX_QUEUED_RUNS,
+                "max_processes": settings.STRESS_MAX_PROCESSES,
+            },
+        }
+
+    async def shutdown(self):
+        self.queue.clear()
+        tasks = []
+        for run in list(self.runs.values()):
+            if run.task is not None and not run.task.done():
+                run.cancel_requested = True
+                run.task.cancel()
+                tasks.append(run.task)
+        # Each task reaps its own process group in its finally block
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+stress_runs = StressRunManager()
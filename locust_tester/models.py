@@ -0,0 +1,34 @@
+# app/locust_tester/models.py
+from sqlalchemy import Column, String, Integer, Float, DateTime, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+# -------------------------
+# Stress Run (final locust stats per run)
+# -------------------------
+class StressRun(Base):
+    __tablename__ = "stress_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String(36), unique=True, index=True, nullable=False)
+    status = Column(String(20), nullable=False)
+    mode = Column(String(20))
+    target_endpoint = Column(String(255))
+    num_users = Column(Integer)
+    duration = Column(Integer)
+    config = Column(JSON)
+
+    total_requests = Column(Integer, default=0)
+    total_failures = Column(Integer, default=0)
+    rps = Column(Float)
+    avg_response_time_ms = Column(Float)
+    max_response_time_ms = Column(Float)
+    p50_ms = Column(Float)
+    p95_ms = Column(Float)
+    p99_ms = Column(Float)
+    endpoints = Column(JSON)
+
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    created_at = Column(DateTime, server_default=func.now())
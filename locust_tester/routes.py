@@ -1,68 +1,69 @@
-import subprocess
-import asyncio
 import os
-import signal
 import json
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
 from app.locust_tester.schemas import StressTestConfig
+from app.locust_tester.manager import stress_runs, LOCUST_FILE_PATH
+from app.locust_tester import services
 
 router = APIRouter(prefix="/stress", tags=["Stress Testing"])
-LOCUST_FILE_PATH = "app/locust_tester/locustfile.py"
-
-async def run_locust_process(config: StressTestConfig):
-    # 1. Prepare Environment Variables
-    env = os.environ.copy()
-    env["TARGET_ENDPOINT"] = config.target_endpoint
-    env["API_KEY"] = config.api_key  # <--- Pass Key to Subprocess
-
-    cmd = [
-        "locust",
-        "-f", LOCUST_FILE_PATH,
-        "--headless",
-        "--host", config.target_host,
-        "--users", str(config.num_users),
-        "--spawn-rate", str(config.spawn_rate),
-        "--run-time", f"{config.duration}s"
-    ]
-
-    process = None
-    try:
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
-            env=env # <--- Inject the environment here
-        )
-
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-            
-            text = line.decode("utf-8").strip()
-            if text:
-                yield json.dumps({"log": text}) + "\n"
-
-        await process.wait()
-        yield json.dumps({"status": "completed"}) + "\n"
-
-    except Exception as e:
-        yield json.dumps({"error": str(e)}) + "\n"
-        
-    finally:
-        if process and process.returncode is None:
-            try:
-                os.kill(process.pid, signal.SIGTERM)
-            except ProcessLookupError:
-                pass
+
+
+async def _ndjson(events):
+    async for event in events:
+        yield json.dumps(event, default=str) + "\n"
+
 
 @router.post("/start")
 async def start_stress_test(config: StressTestConfig):
     if not os.path.exists(LOCUST_FILE_PATH):
         raise HTTPException(status_code=500, detail="Locustfile not found")
 
+    # The run is owned by the manager; disconnecting only stops this stream
+    run = await stress_runs.submit(config)
     return StreamingResponse(
-        run_locust_process(config),
+        _ndjson(stress_runs.stream(run)),
         media_type="application/x-ndjson"
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/status")
+async def stress_status():
+    return {"data": stress_runs.overview(), "message": "Stress runner status fetched successfully"}
+
+
+@router.get("/runs")
+async def list_stress_runs(limit: int = 50, db: AsyncSession = Depends(get_db)):
+    return await services.list_runs(db, limit)
+
+
+@router.get("/runs/compare")
+async def compare_stress_runs(base: str, candidate: str, db: AsyncSession = Depends(get_db)):
+    return await services.compare_runs(db, base, candidate)
+
+
+@router.get("/runs/{run_id}")
+async def get_stress_run(run_id: str, db: AsyncSession = Depends(get_db)):
+    run = stress_runs.get(run_id)
+    if run is not None and not run.done:
+        return {"data": run.describe(), "message": "Stress run fetched successfully"}
+    return await services.get_run(db, run_id)
+
+
+@router.get("/runs/{run_id}/events")
+async def stream_stress_run(run_id: str, since: int = 0):
+    run = stress_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Stress run {run_id} is not active")
+    return StreamingResponse(
+        _ndjson(stress_runs.stream(run, since)),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_stress_run(run_id: str):
+    run = await stress_runs.cancel(run_id)
+    return {"data": run.describe(), "message": "Stress run cancellation requested"}
@@ -1,10 +1,115 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+class EndpointMix(BaseModel):
+    path: str
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    weight: int = Field(1, ge=1)
+    # Optional JSON body for write methods
+    body: Optional[Dict[str, Any]] = None
+
+
+class LoadShape(BaseModel):
+    """
+    Peak users is always StressTestConfig.num_users, so the runner's user
+    caps hold for every shape.
+    """
+    # constant_rate: open-model pacing at target_rps across num_users
+    # step:  +step_users every step_seconds up to num_users
+    # ramp:  start_users -> num_users linearly over ramp_seconds
+    # spike: base_users, num_users for spike_seconds starting at spike_at_seconds
+    kind: Literal["constant_rate", "step", "ramp", "spike"]
+    target_rps: Optional[float] = Field(None, gt=0)
+    step_users: Optional[int] = Field(None, ge=1)
+    step_seconds: Optional[int] = Field(None, ge=1)
+    start_users: int = Field(0, ge=0)
+    ramp_seconds: Optional[int] = Field(None, ge=1)
+    base_users: int = Field(1, ge=0)
+    spike_at_seconds: Optional[int] = Field(None, ge=0)
+    spike_seconds: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def check_parameters(self):
+        required = {
+            "constant_rate": ("target_rps",),
+            "step": ("step_users", "step_seconds"),
+            "ramp": (),
+            "spike": ("spike_at_seconds", "spike_seconds"),
+        }[self.kind]
+        missing = [name for name in required if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"{self.kind} load shape requires {', '.join(missing)}")
+        return self
+
 
 class StressTestConfig(BaseModel):
     target_host: str 
-    target_endpoint: str
-    api_key: str  # <--- NEW: Accept the key in the config
+    # Single-endpoint shorthand; `endpoints` takes precedence when given
+    target_endpoint: Optional[str] = None
+    endpoints: Optional[List[EndpointMix]] = None
+
+    api_key: Optional[str] = None  # <--- NEW: Accept the key in the config
+    # Keys (e.g. from different tiers) assigned round-robin to simulated users
+    api_keys: List[str] = []
+
+    # "bypass": skip the gateway entirely (handler cost only)
+    # "gateway": real auth / limiter / analytics path, isolated stress: namespace
+    mode: Literal["bypass", "gateway"] = "bypass"
     
     num_users: int = 10
     spawn_rate: int = 2
-    duration: int = 10
\ No newline at end of file
+    duration: int = 10
+
+    # Per-user think time (closed model); ignored by constant_rate shapes
+    min_wait: float = Field(1.0, ge=0)
+    max_wait: float = Field(2.0, ge=0)
+    load_shape: Optional[LoadShape] = None
+
+    # >0 runs locust as a local master with N worker processes (--processes)
+    processes: int = Field(0, ge=0)
+    # Forward raw locust console lines as {"type": "log"} events as well
+    include_logs: bool = False
+
+    @model_validator(mode="after")
+    def check_targets(self):
+        if not self.target_endpoint and not self.endpoints:
+            raise ValueError("Either target_endpoint or endpoints is required")
+        if self.max_wait < self.min_wait:
+            raise ValueError("max_wait must be >= min_wait")
+        # num_users is what admission (STRESS_MAX_TOTAL_USERS) checks
+        shape = self.load_shape
+        if shape and (shape.start_users > self.num_users or shape.base_users > self.num_users):
+            raise ValueError("load_shape start_users and base_users must be <= num_users")
+        return self
+
+    def all_api_keys(self) -> List[str]:
+        keys = [self.api_key] if self.api_key else []
+        return keys + [key for key in self.api_keys if key != self.api_key]
+
+    def endpoint_mix(self) -> List[EndpointMix]:
+        return self.endpoints or [EndpointMix(path=self.target_endpoint)]
+
+
+class StressRunOut(BaseModel):
+    run_id: str
+    status: str
+    mode: Optional[str] = None
+    target_endpoint: Optional[str] = None
+    num_users: Optional[int] = None
+    duration: Optional[int] = None
+    config: Optional[Dict[str, Any]] = None
+    total_requests: int = 0
+    total_failures: int = 0
+    rps: Optional[float] = None
+    avg_response_time_ms: Optional[float] = None
+    max_response_time_ms: Optional[float] = None
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    endpoints: Optional[List[Dict[str, Any]]] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
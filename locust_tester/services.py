@@ -0,0 +1,128 @@
+# app/locust_tester/services.py
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from fastapi import HTTPException, status
+
+from app.locust_tester import models, schemas
+
+
+COMPARED_METRICS = (
+    "rps", "p50_ms", "p95_ms", "p99_ms",
+    "avg_response_time_ms", "max_response_time_ms", "total_failures",
+)
+
+
+# -------------------------
+# Run records
+# -------------------------
+async def save_run(
+    db: AsyncSession,
+    run_id: str,
+    config: schemas.StressTestConfig,
+    started_at: datetime,
+    run_status: str,
+    aggregated: dict | None,
+    endpoints: list,
+):
+    aggregated = aggregated or {}
+    run = models.StressRun(
+        run_id=run_id,
+        status=run_status,
+        mode=config.mode,
+        target_endpoint=config.target_endpoint,
+        num_users=config.num_users,
+        duration=config.duration,
+        # Keys are credentials; keep them out of the run history
+        config=config.model_dump(exclude={"api_key", "api_keys"}),
+        total_requests=aggregated.get("requests", 0),
+        total_failures=aggregated.get("failures", 0),
+        rps=aggregated.get("rps"),
+        avg_response_time_ms=aggregated.get("avg_ms"),
+        max_response_time_ms=aggregated.get("max_ms"),
+        p50_ms=aggregated.get("p50_ms"),
+        p95_ms=aggregated.get("p95_ms"),
+        p99_ms=aggregated.get("p99_ms"),
+        endpoints=endpoints,
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+    )
+    db.add(run)
+    await db.commit()
+    return schemas.StressRunOut.model_validate(run).model_dump(mode="json")
+
+
+async def list_runs(db: AsyncSession, limit: int = 50):
+    result = await db.execute(
+        select(models.StressRun).order_by(models.StressRun.id.desc()).limit(limit)
+    )
+    runs = result.scalars().all()
+    return {
+        "data": [schemas.StressRunOut.model_validate(r).model_dump() for r in runs],
+        "message": "Stress runs fetched successfully"
+    }
+
+
+async def _get_run(db: AsyncSession, run_id: str):
+    result = await db.execute(
+        select(models.StressRun).where(models.StressRun.run_id == run_id)
+    )
+    run = result.scalar_one_or_none()
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stress run {run_id} not found")
+    return run
+
+
+async def get_run(db: AsyncSession, run_id: str):
+    run = await _get_run(db, run_id)
+    return {
+        "data": schemas.StressRunOut.model_validate(run).model_dump(),
+        "message": "Stress run fetched successfully"
+    }
+
+
+def _delta(old, new):
+    if old is None or new is None:
+        return {"base": old, "candidate": new, "change": None, "change_pct": None}
+    change = new - old
+    return {
+        "base": old,
+        "candidate": new,
+        "change": round(change, 3),
+        "change_pct": round(change / old * 100, 1) if old else None,
+    }
+
+
+async def compare_runs(db: AsyncSession, base_id: str, candidate_id: str):
+    base = await _get_run(db, base_id)
+    candidate = await _get_run(db, candidate_id)
+
+    overall = {
+        metric: _delta(getattr(base, metric), getattr(candidate, metric))
+        for metric in COMPARED_METRICS
+    }
+
+    base_endpoints = {(e["method"], e["name"]): e for e in base.endpoints or []}
+    endpoints = []
+    for endpoint in candidate.endpoints or []:
+        before = base_endpoints.get((endpoint["method"], endpoint["name"]))
+        if not before:
+            continue
+        endpoints.append({
+            "method": endpoint["method"],
+            "name": endpoint["name"],
+            **{
+                metric: _delta(before.get(metric), endpoint.get(metric))
+                for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "failures")
+            },
+        })
+
+    return {
+        "data": {
+            "base": base_id,
+            "candidate": candidate_id,
+            "overall": overall,
+            "endpoints": endpoints,
+        },
+        "message": "Stress runs compared successfully"
+    }
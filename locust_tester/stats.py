@@ -0,0 +1,106 @@
+# app/locust_tester/stats.py
+"""
+Readers for locust's --csv output, so the runner can stream numbers
+instead of forwarding human-readable console tables.
+
+<prefix>_stats_history.csv gains one row per endpoint (plus "Aggregated")
+every second while the run is active; <prefix>_stats.csv holds the final
+per-endpoint totals.
+"""
+import csv
+import io
+import os
+
+
+def _number(value):
+    if value in (None, "", "N/A"):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class HistoryTail:
+    """
+    Incrementally reads complete rows appended to a stats_history CSV.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.fieldnames = None
+
+    def read_new_rows(self):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, "r", newline="") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+
+        # Only consume whole lines; locust may be mid-write
+        end = chunk.rfind("\n")
+        if end < 0:
+            return []
+        complete = chunk[:end + 1]
+        self.offset += len(complete.encode("utf-8"))
+
+        reader = csv.reader(io.StringIO(complete))
+        rows = []
+        for values in reader:
+            if self.fieldnames is None:
+                self.fieldnames = values
+                continue
+            rows.append(dict(zip(self.fieldnames, values)))
+        return rows
+
+
+def snapshot_from_history(row: dict):
+    return {
+        "type": "snapshot",
+        "timestamp": int(_number(row.get("Timestamp")) or 0),
+        "users": int(_number(row.get("User Count")) or 0),
+        "rps": _number(row.get("Requests/s")),
+        "failures_per_s": _number(row.get("Failures/s")),
+        "p50_ms": _number(row.get("50%")),
+        "p95_ms": _number(row.get("95%")),
+        "p99_ms": _number(row.get("99%")),
+        "total_requests": int(_number(row.get("Total Request Count")) or 0),
+        "total_failures": int(_number(row.get("Total Failure Count")) or 0),
+    }
+
+
+def _summary_row(row: dict):
+    return {
+        "method": row.get("Type") or None,
+        "name": row.get("Name"),
+        "requests": int(_number(row.get("Request Count")) or 0),
+        "failures": int(_number(row.get("Failure Count")) or 0),
+        "rps": _number(row.get("Requests/s")),
+        "avg_ms": _number(row.get("Average Response Time")),
+        "max_ms": _number(row.get("Max Response Time")),
+        "p50_ms": _number(row.get("50%")),
+        "p95_ms": _number(row.get("95%")),
+        "p99_ms": _number(row.get("99%")),
+    }
+
+
+def read_final_stats(path: str):
+    """
+    Returns (aggregated, per_endpoint) from a final stats CSV.
+    """
+    if not os.path.exists(path):
+        return None, []
+
+    with open(path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    aggregated = None
+    endpoints = []
+    for row in rows:
+        if row.get("Name") == "Aggregated":
+            aggregated = _summary_row(row)
+        else:
+            endpoints.append(_summary_row(row))
+    return aggregated, endpoints
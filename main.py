@@ -1,18 +1,102 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
-from app.database import get_db, Base
+from fastapi.responses import PlainTextResponse
+from app.database import get_db, Base, SessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.auth.routes import router as auth_router
 from app.api.routes import api_router, tier_router, key_router
 from app.internal.routes import router as internal_router
+from app.gateway.routes import router as gateway_router
 from app.analytics.routes import router as analytics_router
 from app.middleware.rate_limit import rate_limit_middleware
 from fastapi.middleware.cors import CORSMiddleware
 from app.admin.routes import router as admin_router
 from app.locust_tester.routes import router as stress_router
+from app.locust_tester.manager import stress_runs
+from app.core.usage_log_partitions import partition_manager
+from app.core.token_revocation import sync_revocations, purge_expired_revocations
+from app.core.periodic import start_periodic, stop_tasks
+from app.core import cache_invalidation
+from app.auth.utils import shutdown_password_pool
+from app.core.api_key_cache import load_revoked_keys, load_legacy_key_state
+from app.core import metrics
+from app.core.upstream import close_upstream_clients
+from app.core import concurrency_limiter
+from app.core import heavy_hitters
+from app.core import quota_ledger
+from app.core.health_prober import health_prober
+from app.core.live_analytics import live_analytics
+import asyncio
+from app.config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        async with SessionLocal() as db:
+            await sync_revocations(db)
+    except Exception as e:
+        print("Token revocation sync failed:", e)
+
+    try:
+        async with SessionLocal() as db:
+            # Hashing legacy keys is an explicit admin step:
+            # POST /admin/analytics/api-keys/backfill-hashes
+            await load_legacy_key_state(db)
+            await load_revoked_keys(db)
+    except Exception as e:
+        print("API key startup load failed:", e)
+
+    tasks = [
+        asyncio.create_task(cache_invalidation.listen(), name="cache-invalidation"),
+        asyncio.create_task(metrics.publish_loop(), name="metrics-publisher"),
+        asyncio.create_task(concurrency_limiter.sync_loop(), name="concurrency-sync"),
+        asyncio.create_task(heavy_hitters.flush_loop(), name="heavy-hitters-flush"),
+        # Pre-create upcoming usage_logs partitions and drop expired ones
+        start_periodic(
+            "usage-log-partitions",
+            settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+            partition_manager.maintain
+        ),
+        start_periodic(
+            "revocation-purge",
+            settings.REVOCATION_PURGE_INTERVAL_SECONDS,
+            purge_expired_revocations
+        ),
+        start_periodic(
+            "revocation-resync",
+            settings.REVOCATION_RESYNC_INTERVAL_SECONDS,
+            sync_revocations
+        ),
+        start_periodic(
+            "usage-ledger-checkpoint",
+            settings.QUOTA_CHECKPOINT_INTERVAL_SECONDS,
+            quota_ledger.checkpoint
+        ),
+    ]
+    if settings.PROBE_ENABLED:
+        # Every worker runs it; only the Redis lease holder actually probes
+        tasks.append(asyncio.create_task(health_prober.run(), name="health-prober"))
+
+    yield
+
+    await stop_tasks(tasks)
+    try:
+        await heavy_hitters.flush()
+    except Exception as e:
+        print("Heavy hitter flush failed:", e)
+    await health_prober.stop()
+    await live_analytics.shutdown()
+    # Never leave locust process groups behind a restart
+    await stress_runs.shutdown()
+    await close_upstream_clients()
+    shutdown_password_pool()
+
 
 app = FastAPI(
-    root_path="/"
+    root_path="/",
+    lifespan=lifespan
 )
 
 
@@ -30,6 +114,7 @@ app.include_router(key_router)
 app.include_router(tier_router)
 app.include_router(admin_router)
 app.include_router(internal_router)
+app.include_router(gateway_router)
 app.include_router(analytics_router)
 
 
@@ -46,4 +131,12 @@ async def check_health(db: AsyncSession = Depends(get_db)):
         return {"status": "Healthy"}
     except Exception as e:
         print(e)
-        return {"status": "Unhealthy"}
\ No newline at end of file
+        return {"status": "Unhealthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(
+        await metrics.render_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
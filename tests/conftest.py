@@ -0,0 +1,55 @@
+# app/tests/conftest.py
+"""
+Run from the directory that contains the `app` package:
+    python -m pytest app/tests
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("fakeredis")
+
+from app.benchmarks.common import boot
+
+# Before any other app module is imported: settings, engine and Redis
+boot()
+
+from sqlalchemy import event
+
+from app.auth.models import Role, User
+from app.benchmarks.common import create_schema
+from app.database import Base, SessionLocal, engine
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # Off by default in SQLite; MySQL / PostgreSQL always enforce them
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+async def _reset():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await create_schema()
+    async with SessionLocal() as db:
+        db.add_all([Role(id=1, name="admin"), Role(id=2, name="user")])
+        db.add(User(id=1, role_id=1, username="admin", email="admin@example.com", password="x"))
+        await db.commit()
+
+
+def run_scenario(scenario):
+    """
+    Run `await scenario()` against a fresh schema, in its own event loop.
+    """
+    async def main():
+        await _reset()
+        try:
+            await scenario()
+        finally:
+            # Pooled connections belong to this loop
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+# app/tests/test_bulk_delete.py
+"""
+Bulk deletes use Core statements, so they must detach child rows the way
+the single-row ORM deletes do, or the foreign keys reject them.
+"""
+from sqlalchemy.future import select
+
+from app.api import models, schemas, services
+from app.core.principal_cache import Principal
+from app.database import SessionLocal, db_commit
+from conftest import run_scenario
+
+ADMIN = Principal(id=1, role_id=1, is_active=True)
+
+
+async def _seed_api_with_children():
+    async with SessionLocal() as db:
+        db.add(models.API(id=1, name="svc", endpoint="http://upstream/svc"))
+        db.add(models.Tier(id=1, name="free"))
+        db.add(models.RateLimitRules(tier_id=1, requests_per_minute=60))
+        db.add(models.APIKey(id=1, user_id=1, api_id=1, tier_id=1, key_prefix="k1"))
+        db.add(models.UsageLog(api_key_id=1, user_id=1, api_id=1, endpoint="/svc", method="GET", status_code=200))
+        await db.commit()
+
+
+def test_bulk_delete_api_with_keys_and_usage_logs():
+    async def scenario():
+        await _seed_api_with_children()
+        async with SessionLocal() as db:
+            result = await services.bulk_delete_apis(db, schemas.BulkIds(ids=[1]))
+            await db_commit(db)
+        assert result["data"] == {"ids": [1], "not_found": []}
+
+        async with SessionLocal() as db:
+            assert (await db.execute(select(models.API))).first() is None
+            assert (await db.execute(select(models.APIKey.api_id))).scalar_one() is None
+            assert (await db.execute(select(models.UsageLog.api_id))).scalar_one() is None
+
+    run_scenario(scenario)
+
+
+def test_bulk_delete_api_key_with_usage_logs():
+    async def scenario():
+        await _seed_api_with_children()
+        async with SessionLocal() as db:
+            result = await services.bulk_delete_api_keys(db, schemas.BulkIds(ids=[1]), ADMIN)
+            await db_commit(db)
+        assert result["data"] == {"ids": [1], "not_found": []}
+
+        async with SessionLocal() as db:
+            assert (await db.execute(select(models.APIKey))).first() is None
+            assert (await db.execute(select(models.UsageLog.api_key_id))).scalar_one() is None
+
+    run_scenario(scenario)
@@ -0,0 +1,44 @@
+# app/tests/test_concurrency_limiter.py
+"""
+A slow endpoint must not read as congestion of a fast one on the same API.
+"""
+from types import SimpleNamespace
+
+from app.config import settings
+from app.core import concurrency_limiter
+
+
+def _key(api_id: int):
+    return SimpleNamespace(api_id=api_id, api_max_concurrency=None, tier_priority=settings.CONCURRENCY_TOP_PRIORITY)
+
+
+def test_slow_route_does_not_cut_limit_of_fast_route():
+    key = _key(9001)
+    state = concurrency_limiter.AdaptiveLimit("", key.api_id)
+    concurrency_limiter._limits[("", key.api_id)] = state
+
+    now = 0.0
+    for _ in range(50):
+        now += 0.01
+        state.on_sample("GET /internal/ping", 0.005, False, now)
+    # 8 concurrent calls to an endpoint 40x slower than the ping baseline
+    for _ in range(5):
+        state.in_flight = 7
+        for _ in range(8):
+            now += 0.25
+            state.on_sample("POST /internal/process", 0.2, False, now)
+
+    assert state.limit >= settings.CONCURRENCY_INITIAL_LIMIT
+    state.in_flight = 0
+    slots = [concurrency_limiter.acquire(key, "POST /internal/process") for _ in range(8)]
+    assert all(slots)
+
+
+def test_limit_not_cut_at_trivial_concurrency():
+    state = concurrency_limiter.AdaptiveLimit("", 9002)
+    now = 0.0
+    for _ in range(20):
+        now += 1
+        # Upstream errors with a single request in flight
+        state.on_sample("GET /internal/flaky", 0.01, True, now)
+    assert state.limit == settings.CONCURRENCY_INITIAL_LIMIT
@@ -0,0 +1,40 @@
+# app/tests/test_quota_ledger.py
+"""
+Losing the Redis month counter must not reset quota enforcement.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.api import models
+from app.core import quota_ledger
+from app.core.rate_limiter import QuotaExceeded, check_rate_limit
+from app.core.redis import redis_client
+from app.database import SessionLocal
+from conftest import run_scenario
+
+
+def test_lost_month_counter_is_seeded_from_ledger():
+    async def scenario():
+        month = datetime.utcnow().date().replace(day=1)
+        async with SessionLocal() as db:
+            db.add(models.UsageLedger(api_key_id=7, period="month", period_start=month, request_count=99))
+            await db.commit()
+        await redis_client.delete(quota_ledger.month_key(7, month))
+
+        assert await check_rate_limit(key_id=7, limit=1000, monthly_quota=100) == 100
+        with pytest.raises(QuotaExceeded):
+            await check_rate_limit(key_id=7, limit=1000, monthly_quota=100)
+
+    run_scenario(scenario)
+
+
+def test_first_request_of_month_starts_at_one():
+    async def scenario():
+        month = datetime.utcnow().date().replace(day=1)
+        await redis_client.delete(quota_ledger.month_key(8, month))
+
+        assert await check_rate_limit(key_id=8, limit=1000, monthly_quota=100) == 1
+        assert await check_rate_limit(key_id=8, limit=1000, monthly_quota=100) == 2
+
+    run_scenario(scenario)